@@ -10,6 +10,7 @@ from typing import Optional
 from sqlalchemy import text
 from sqlalchemy.orm import Session
 
+from app.core.config import get_settings
 from app.core.database import SessionLocal
 from app.models.etl_watermark import ETLWatermark
 from app.repositories.product_staging_repository import ProductStagingRepository
@@ -38,7 +39,15 @@ class ETLProductWorker:
         """
         self.db = db
         self.limit = limit
-        self.staging_repo = ProductStagingRepository(db)
+        staging_columns = get_settings().etl_staging_columns
+        self.staging_repo = ProductStagingRepository(
+            db,
+            known_columns=(
+                [column.strip() for column in staging_columns.split(",") if column.strip()]
+                if staging_columns
+                else None
+            ),
+        )
         self.upsert_service = ProductUpsertService(db)
 
     def validate_prerequisites(self) -> None:
@@ -230,7 +239,7 @@ class ETLProductWorker:
         limit = batch_limit if batch_limit is not None else self.limit
         
         # Fetch batch
-        records = self.staging_repo.fetch_batch_by_watermark(
+        records, (max_at, max_key) = self.staging_repo.fetch_batch_with_watermark(
             self.TABLE_NAME, last_at, last_key, limit
         )
         
@@ -240,14 +249,16 @@ class ETLProductWorker:
         
         logger.info(f"[ETL_WORKER] Processing batch of {len(records)} records...")
         
-        # Process each record
+        # Process each record (one SAVEPOINT per record: a failing record only
+        # rolls back its own writes; the whole batch is committed once below)
         for record in records:
             try:
-                # Normalize
-                normalized = ProductNormalizer.normalize_staging_record(record)
-                
-                # Upsert
-                changed, data_version = self.upsert_service.upsert_product(normalized)
+                with self.db.begin_nested():
+                    # Normalize
+                    normalized = ProductNormalizer.normalize_staging_record(record)
+                    
+                    # Upsert
+                    changed, data_version = self.upsert_service.upsert_product(normalized)
                 
                 stats["processed"] += 1
                 if changed:
@@ -264,10 +275,11 @@ class ETLProductWorker:
                 )
                 continue
         
-        # Update watermark
-        max_at, max_key = self.staging_repo.get_max_updated_at_and_key(records)
+        # Update watermark (commits the batch's upserts and change logs together)
         if max_at and max_key:
             self.update_watermark(max_at, max_key)
+        else:
+            self.db.commit()
         
         logger.info(
             f"[ETL_WORKER] Batch processed: "
@@ -15,7 +15,6 @@ from app.core.database import get_db
 from app.schemas.agent_sales_flow_schemas import (
     AgentSalesFlowRequest,
     AgentSalesFlowResponse,
-    MessageItem,
 )
 
 logger = logging.getLogger(__name__)
@@ -211,11 +210,12 @@ async def execute_agent_sales_flow(
             }
         
         # Add messages
+        # data 为 dict[str, Any]，直接构造 MessageItem 结构的 dict，不经过模型实例化再 model_dump
         messages = [
-            MessageItem(role=msg.get("role", "unknown"), content=msg.get("content", ""))
+            {"role": msg.get("role", "unknown"), "content": msg.get("content", "")}
             for msg in result_context.messages
         ]
-        response_data["messages"] = [msg.model_dump() for msg in messages]
+        response_data["messages"] = messages
         
         # Add execution plan (must be List[str])
         response_data["plan_used"] = final_plan
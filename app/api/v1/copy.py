@@ -16,7 +16,7 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 
 from app.core.database import get_db
-from app.repositories.product_repository import get_product_by_sku
+from app.repositories.product_repository import get_product_full
 from app.schemas.copy_schemas import (
     CopyCandidateSchema,
     CopyRequest,
@@ -78,7 +78,7 @@ async def generate_copy(
     try:
         # Step 1: Load product
         logger.info("[API] Step 1: Loading product from database...")
-        product = get_product_by_sku(db, request.sku)
+        product = get_product_full(db, request.sku)
         if not product:
             logger.error(f"[API] ✗ Product not found: sku={request.sku}")
             raise HTTPException(
@@ -8,7 +8,7 @@ from sqlalchemy.orm import Session
 
 from app.core.database import get_db
 from app.repositories.behavior_repository import get_recent_behavior
-from app.repositories.product_repository import get_product_by_sku
+from app.repositories.product_repository import get_product_full
 from app.schemas.followup_schemas import FollowupRequest, FollowupResponse, FollowupResponseData
 from app.services.followup_service import generate_followup_suggestion
 from app.services.intent_engine import classify_intent
@@ -84,7 +84,7 @@ async def suggest_followup(
     try:
         # Step 1: Validate product exists
         logger.info("[API] Step 1: Validating product exists...")
-        product = get_product_by_sku(db, request.sku)
+        product = get_product_full(db, request.sku)
         if not product:
             logger.warning(f"[API] Product not found: sku={request.sku}")
             raise HTTPException(
@@ -3,41 +3,60 @@ from __future__ import annotations
 
 import logging
 import time
-from typing import Any
+from typing import Any, Final, Iterator
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+import orjson
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
 
 from app.agents.context import AgentContext
 from app.agents.graph.sales_graph import BusinessLogicError, run_sales_graph
 from app.agents.planner_agent import build_final_plan, plan_sales_flow
-from app.core.database import get_db
 from app.schemas.sales_graph_schemas import (
-    FollowupPlaybookItemSchema,
-    MessageItemSchema,
     SalesGraphRequest,
     SalesGraphResponse,
     SalesSuggestionSchema,
-    SendRecommendationSchema,
-)
-from app.services.sales_suggestion_service import (
-    MessageItem,
-    SalesSuggestion,
-    SendRecommendation,
-    build_suggestion_pack,
 )
+from app.services.sales_suggestion_service import build_suggestion_pack
+
+__all__ = ["router"]
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/ai", tags=["ai"])
 
+# 完整图流程执行的节点（未使用自定义计划时返回，只读共享）
+_FULL_GRAPH_PLAN: Final[tuple[str, ...]] = (
+    "fetch_product",
+    "fetch_behavior_summary",
+    "classify_intent",
+    "anti_disturb_check",
+    "retrieve_rag",
+    "generate_copy",
+)
+
+# 默认 RAG 诊断信息骨架（retrieved_count / safe_count 按实际 chunk 数填充）
+# 只含不可变值；filter_reasons 列表每个响应单独创建，避免响应之间共享可变对象
+_DEFAULT_RAG_DIAGNOSTICS: Final[dict[str, Any]] = {
+    "retrieved_count": 0,
+    "filtered_count": 0,
+    "safe_count": 0,
+}
+
+
+def _elapsed_ms(start_ns: int) -> int:
+    """计算从 start_ns（time.perf_counter_ns）到现在的耗时（毫秒）。"""
+    return (time.perf_counter_ns() - start_ns) // 1_000_000
 
 
 @router.post("/sales/graph", response_model=SalesGraphResponse)
 async def execute_sales_graph(
     request: SalesGraphRequest,
-    db: Session = Depends(get_db),
-) -> SalesGraphResponse:
+    stream: bool = Query(
+        False,
+        description="是否以 NDJSON 流式返回（首行为决策结果，后续每行一个 RAG chunk）",
+    ),
+) -> SalesGraphResponse | StreamingResponse:
     """
     执行销售流程图。
     
@@ -53,10 +72,12 @@ async def execute_sales_graph(
     
     参数说明:
         request: 销售图执行请求
-        db: 数据库会话
+        stream: 是否以 NDJSON 流式返回（默认 False，保持原有 JSON 响应）
         
     返回值:
         SalesGraphResponse: 执行结果，包含意图级别、生成的文案等信息
+        stream=true 时返回 application/x-ndjson：首行为不含 rag_chunks 的
+        {"success", "message", "data"}，后续每行一个 RAG chunk 字符串
         
     请求示例:
         ```json
@@ -75,7 +96,7 @@ async def execute_sales_graph(
         f"guide_id={request.guide_id}, use_custom_plan={request.use_custom_plan}"
     )
     
-    start_time = time.time()
+    start_ns = time.perf_counter_ns()
     
     try:
         # 创建初始上下文
@@ -108,7 +129,7 @@ async def execute_sales_graph(
             context, plan=final_plan, enforce_mandatory=True
         )
         
-        execution_time = time.time() - start_time
+        execution_time = round(_elapsed_ms(start_ns) / 1000, 3)
         
         # 构建响应数据
         rag_used = len(result_context.rag_chunks) > 0
@@ -122,7 +143,7 @@ async def execute_sales_graph(
             "rag_used": rag_used,  # RAG 是否被使用（True/False）
             "rag_chunks_count": len(result_context.rag_chunks),
             "rag_chunks": result_context.rag_chunks,  # 返回实际的 RAG chunks 内容
-            "execution_time_seconds": round(execution_time, 3),
+            "execution_time_seconds": execution_time,
         }
         
         # Add RAG diagnostics (if available)
@@ -131,26 +152,16 @@ async def execute_sales_graph(
             response_data["rag_diagnostics"] = rag_diagnostics
         else:
             # Default diagnostics if not available
+            chunks_count = len(result_context.rag_chunks)
             response_data["rag_diagnostics"] = {
-                "retrieved_count": len(result_context.rag_chunks),
-                "filtered_count": 0,
-                "safe_count": len(result_context.rag_chunks),
+                **_DEFAULT_RAG_DIAGNOSTICS,
+                "retrieved_count": chunks_count,
+                "safe_count": chunks_count,
                 "filter_reasons": [],
             }
         
-        # 添加计划信息（必须为 List[str]）
-        if final_plan:
-            response_data["plan_used"] = final_plan
-        else:
-            # 完整图流程：返回所有执行的节点
-            response_data["plan_used"] = [
-                "fetch_product",
-                "fetch_behavior_summary",
-                "classify_intent",
-                "anti_disturb_check",
-                "retrieve_rag",
-                "generate_copy",
-            ]
+        # 添加计划信息（必须为 List[str]；完整图流程返回所有执行的节点）
+        response_data["plan_used"] = final_plan or list(_FULL_GRAPH_PLAN)
         
         # 添加决策原因（decision_reason）
         decision_reason = _generate_decision_reason(
@@ -177,35 +188,9 @@ async def execute_sales_graph(
                 logger.info("[API] Building sales suggestion pack...")
                 suggestion = await build_suggestion_pack(result_context)
                 
-                # 转换为 schema
-                suggestion_schema = SalesSuggestionSchema(
-                    intent_level=suggestion.intent_level,
-                    confidence=suggestion.confidence,
-                    why_now=suggestion.why_now,
-                    recommended_action=suggestion.recommended_action,
-                    action_explanation=suggestion.action_explanation,
-                    message_pack=[
-                        MessageItemSchema(
-                            type=msg.type,
-                            strategy=msg.strategy,
-                            message=msg.message,
-                        )
-                        for msg in suggestion.message_pack
-                    ],
-                    send_recommendation=SendRecommendationSchema(
-                        suggested=suggestion.send_recommendation.suggested,
-                        best_timing=suggestion.send_recommendation.best_timing,
-                        note=suggestion.send_recommendation.note,
-                        risk_level=suggestion.send_recommendation.risk_level,
-                        next_step=suggestion.send_recommendation.next_step,
-                    ),
-                    followup_playbook=[
-                        FollowupPlaybookItemSchema(
-                            condition=item.condition,
-                            reply=item.reply,
-                        )
-                        for item in suggestion.followup_playbook
-                    ],
+                # 转换为 schema（按属性读取嵌套 dataclass，一次校验完成）
+                suggestion_schema = SalesSuggestionSchema.model_validate(
+                    suggestion, from_attributes=True
                 )
                 response_data["sales_suggestion"] = suggestion_schema.model_dump()
                 
@@ -258,6 +243,12 @@ async def execute_sales_graph(
             logger.info("[API] No RAG chunks retrieved (may have been skipped due to low intent or RAG service unavailable)")
         logger.info("=" * 80)
         
+        if stream:
+            return StreamingResponse(
+                _iter_ndjson(response_data),
+                media_type="application/x-ndjson",
+            )
+        
         return SalesGraphResponse(
             success=True,
             message="Sales graph executed successfully",
@@ -265,7 +256,7 @@ async def execute_sales_graph(
         )
         
     except BusinessLogicError as e:
-        execution_time = time.time() - start_time
+        execution_time = round(_elapsed_ms(start_ns) / 1000, 3)
         
         logger.error(
             f"[API] ✗ Business logic error after {execution_time:.3f}s: {e.message}",
@@ -282,7 +273,7 @@ async def execute_sales_graph(
             },
         )
     except Exception as e:
-        execution_time = time.time() - start_time
+        execution_time = round(_elapsed_ms(start_ns) / 1000, 3)
         
         logger.error(
             f"[API] ✗ Sales graph execution failed after {execution_time:.3f}s: {e}",
@@ -296,6 +287,31 @@ async def execute_sales_graph(
         )
 
 
+def _iter_ndjson(response_data: dict[str, Any]) -> Iterator[bytes]:
+    """
+    以 NDJSON 输出销售图结果：先输出决策结果，再逐行输出 RAG chunks。
+    
+    客户端可以在大体积的 rag_chunks 传输完成前先渲染决策结果。
+    
+    Args:
+        response_data: 完整的响应数据（包含 rag_chunks）
+    
+    Yields:
+        每行一个 JSON 文档（以换行结尾）
+    """
+    head = {key: value for key, value in response_data.items() if key != "rag_chunks"}
+    yield orjson.dumps(
+        {
+            "success": True,
+            "message": "Sales graph executed successfully",
+            "data": head,
+        },
+        option=orjson.OPT_APPEND_NEWLINE,
+    )
+    for chunk in response_data.get("rag_chunks", []):
+        yield orjson.dumps(chunk, option=orjson.OPT_APPEND_NEWLINE)
+
+
 def _generate_decision_reason(
     intent_level: str | None,
     allowed: bool,
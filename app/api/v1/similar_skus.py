@@ -22,6 +22,12 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/ai/product", tags=["ai"])
 
+
+def _elapsed_ms(start_ns: int) -> int:
+    """计算从 start_ns（time.perf_counter_ns）到现在的耗时（毫秒）。"""
+    return (time.perf_counter_ns() - start_ns) // 1_000_000
+
+
 # Global service instance
 _similar_skus_service: Optional[SimilarSKUsService] = None
 
@@ -68,7 +74,7 @@ async def search_similar_skus(
         SimilarSKUsResponse，包含：
         - similar_skus: SKU列表（最多5个）
     """
-    start_time = time.time()
+    start_ns = time.perf_counter_ns()
 
     logger.info("=" * 80)
     logger.info("[API] POST /ai/product/similar_skus - Request received")
@@ -80,60 +86,43 @@ async def search_similar_skus(
     )
 
     try:
-        # Validate mode
-        if request.mode not in ("rule", "vector"):
-            logger.warning(f"[API] ✗ Invalid mode: {request.mode}, using 'rule'")
-            request.mode = "rule"
-
         # Convert vision_features to dict (if provided)
-        vision_features_dict = None
-        if request.vision_features:
-            vision_features_dict = {
-                "category": request.vision_features.category,
-                "style": request.vision_features.style or [],
-                "color": request.vision_features.color,
-                "colors": [],  # Will be populated from vision_features if available
-                "season": request.vision_features.season,
-                "keywords": request.vision_features.keywords or [],
-            }
-            # If vision_features has colors, use it
-            if hasattr(request.vision_features, "colors") and request.vision_features.colors:
-                vision_features_dict["colors"] = request.vision_features.colors
+        vision_features_dict = (
+            request.vision_features.to_service_dict()
+            if request.vision_features
+            else None
+        )
 
         # Get service
         service = get_similar_skus_service()
 
         # Search
         logger.info("[API] Step 1: Calling similar SKUs service...")
-        try:
-            skus, fallback_used = await service.search_similar_skus(
-                db=db,
-                brand_code=request.brand_code,
-                vision_features=vision_features_dict,
-                trace_id=request.trace_id,
-                top_k=request.top_k,
-                mode=request.mode,
+        outcome = await service.search_similar_skus(
+            db=db,
+            brand_code=request.brand_code,
+            vision_features=vision_features_dict,
+            trace_id=request.trace_id,
+            top_k=request.top_k,
+            mode=request.mode,
+        )
+        if outcome.status == "trace_miss":
+            logger.warning(f"[API] ✗ Trace ID resolution failed: {request.trace_id}")
+            await log_similar_skus_traceid_miss(
+                trace_id=request.trace_id or "",
+                latency_ms=_elapsed_ms(start_ns),
+            )
+            return SimilarSKUsResponse(
+                success=False,
+                data=None,
+                message="trace_id not found or expired",
             )
-        except ValueError as e:
-            # Handle trace_id resolution failure
-            if "trace_id" in str(e).lower() or "not found" in str(e).lower():
-                logger.warning(f"[API] ✗ Trace ID resolution failed: {e}")
-                latency_ms = int((time.time() - start_time) * 1000)
-                await log_similar_skus_traceid_miss(
-                    trace_id=request.trace_id or "",
-                    latency_ms=latency_ms,
-                )
-                return SimilarSKUsResponse(
-                    success=False,
-                    data=None,
-                    message="trace_id not found or expired",
-                )
-            raise
-        
+
+        skus, fallback_used = outcome.skus, outcome.fallback
         logger.info(f"[API] ✓ Search completed: {len(skus)} SKUs")
 
         # Calculate latency
-        latency_ms = int((time.time() - start_time) * 1000)
+        latency_ms = _elapsed_ms(start_ns)
 
         # Log events
         logger.info("[API] Step 2: Logging events...")
@@ -13,16 +13,20 @@
 """
 from __future__ import annotations
 
+import asyncio
+import heapq
 import logging
 import re
+from functools import lru_cache
 from typing import List, Tuple
 
+import numpy as np
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel, Field
 from sqlalchemy.orm import Session
 
 from app.core.database import get_db
-from app.repositories.product_repository import get_product_by_sku
+from app.repositories.product_repository import get_product_full
 from app.schemas.base_schemas import BaseResponse
 from app.services.vector_store import VectorStore
 
@@ -33,9 +37,11 @@ router = APIRouter(prefix="/ai", tags=["vector-search"])
 
 # 全局向量存储实例（懒加载）
 _vector_store: VectorStore | None = None
+# 保证冷启动时并发请求只加载一次索引
+_vector_store_lock = asyncio.Lock()
 
 
-def get_vector_store() -> VectorStore:
+async def get_vector_store() -> VectorStore:
     """
     获取向量存储实例（单例模式）
     
@@ -51,17 +57,22 @@ def get_vector_store() -> VectorStore:
     - 此函数只在向量搜索接口被调用时才会执行
     - 不会影响其他接口（如 /health）的启动和响应
     - 如果索引未加载，搜索时会返回空结果或错误
+    - 首次加载加锁（双重检查），冷启动时的并发请求等待同一次加载，
+      加载在线程中执行，不阻塞事件循环；加载完成后才对其他请求可见
     """
     global _vector_store
     if _vector_store is None:
-        _vector_store = VectorStore()
-        # 尝试加载索引，但不抛出异常（避免阻塞服务启动）
-        loaded = _vector_store.load()
-        if not loaded:
-            logger.warning(
-                "[VECTOR_SEARCH] 向量索引未初始化，向量搜索功能将不可用。"
-                "请运行 python app/db/init_vector_store.py 初始化索引"
-            )
+        async with _vector_store_lock:
+            if _vector_store is None:
+                vector_store = VectorStore()
+                # 尝试加载索引，但不抛出异常（避免阻塞服务启动）
+                loaded = await asyncio.to_thread(vector_store.load)
+                if not loaded:
+                    logger.warning(
+                        "[VECTOR_SEARCH] 向量索引未初始化，向量搜索功能将不可用。"
+                        "请运行 python app/db/init_vector_store.py 初始化索引"
+                    )
+                _vector_store = vector_store
     return _vector_store
 
 
@@ -110,6 +121,58 @@ class VectorSearchResponse(BaseModel):
 
 # ==================== 辅助函数 ====================
 
+# 关键词表在模块加载时按长度降序排好（更长、更具体的词在前），请求路径上不再排序
+# 常见颜色
+_COLOR_KEYWORDS: Tuple[str, ...] = tuple(sorted(
+    ("白色", "黑色", "红色", "蓝色", "绿色", "黄色", "粉色", "棕色", "灰色", "米色", "紫色", "橙色"),
+    key=len, reverse=True,
+))
+# 常见商品类型
+_TYPE_KEYWORDS: Tuple[str, ...] = tuple(sorted(
+    ("运动鞋", "跑鞋", "高跟鞋", "平底鞋", "靴子", "短靴", "长靴", "凉鞋", "单鞋", "帆布鞋",
+     "板鞋", "休闲鞋", "皮鞋", "牛津鞋", "切尔西靴", "马丁靴", "芭蕾舞鞋", "玛丽珍鞋"),
+    key=len, reverse=True,
+))
+# 常见属性关键词
+_ATTRIBUTE_KEYWORDS: Tuple[str, ...] = tuple(sorted(
+    ("舒适", "时尚", "轻便", "透气", "百搭", "复古", "优雅", "甜美", "经典", "限量"),
+    key=len, reverse=True,
+))
+
+
+# SKU格式：8个字符，前3个字母+2个数字+2个字母+1个数字，例如：8WZ76CM6
+# 忽略大小写匹配（仅限ASCII），无需先对整个查询做 upper()
+_SKU_PATTERN = re.compile(r'([A-Z0-9]{2}[A-Z][0-9]{2}[A-Z]{2}[0-9])', re.IGNORECASE | re.ASCII)
+# 两种SKU格式都需要ASCII字母或数字；纯中文查询可直接跳过
+_ASCII_ALNUM_PATTERN = re.compile(r'[A-Za-z0-9]')
+# "SKU：" 后面的内容
+_SKU_KEYWORD_PATTERN = re.compile(r'SKU[：:]\s*([A-Z0-9]+)', re.IGNORECASE)
+
+
+def _consume_keywords(keywords: Tuple[str, ...], query: str) -> Tuple[Tuple[str, ...], str]:
+    """
+    按关键词表顺序（更长、更具体的词在前）逐个判断是否出现在查询中，命中后从查询中去掉该词一次。
+    
+    避免重叠的词重复命中（如"短靴子"先命中"靴子"后不再命中"短靴"）；返回命中的词和剩余查询。
+    """
+    found = []
+    for keyword in keywords:
+        if keyword in query:
+            found.append(keyword)
+            query = query.replace(keyword, "", 1)
+    return tuple(found), query
+
+
+@lru_cache(maxsize=2048)
+def _extract_keywords_cached(query: str) -> Tuple[Tuple[str, ...], Tuple[str, ...], Tuple[str, ...]]:
+    """按查询文本缓存关键词提取结果（返回不可变元组，避免调用方修改缓存内容）。"""
+    # 颜色、类型依次在去掉已命中词后的查询上匹配；属性不再消耗查询
+    colors, query = _consume_keywords(_COLOR_KEYWORDS, query)
+    types, query = _consume_keywords(_TYPE_KEYWORDS, query)
+    attributes = tuple(attr for attr in _ATTRIBUTE_KEYWORDS if attr in query)
+    return colors, types, attributes
+
+
 def extract_keywords_from_query(query: str) -> dict[str, list[str]]:
     """
     从查询文本中提取关键词
@@ -119,91 +182,153 @@ def extract_keywords_from_query(query: str) -> dict[str, list[str]]:
     - types: 商品类型（运动鞋、高跟鞋、靴子等）
     - attributes: 其他属性（舒适、时尚等）
     
+    结果按关键词表顺序排列（更长、更具体的词在前），不按在查询中出现的位置。
+    
     返回：
     - 包含各类关键词的字典
     """
-    # 常见颜色
-    colors = ["白色", "黑色", "红色", "蓝色", "绿色", "黄色", "粉色", "棕色", "灰色", "米色", "紫色", "橙色"]
-    # 常见商品类型（按优先级排序，更具体的在前）
-    types = ["运动鞋", "跑鞋", "高跟鞋", "平底鞋", "靴子", "短靴", "长靴", "凉鞋", "单鞋", "帆布鞋", 
-             "板鞋", "休闲鞋", "皮鞋", "牛津鞋", "切尔西靴", "马丁靴", "芭蕾舞鞋", "玛丽珍鞋"]
-    # 常见属性关键词
-    attributes = ["舒适", "时尚", "轻便", "透气", "百搭", "复古", "优雅", "甜美", "经典", "限量"]
-    
-    found_keywords = {
-        "colors": [],
-        "types": [],
-        "attributes": []
+    colors, types, attributes = _extract_keywords_cached(query)
+    return {
+        "colors": list(colors),
+        "types": list(types),
+        "attributes": list(attributes),
     }
+
+
+@lru_cache(maxsize=256)
+def _query_keyword_pattern(words: Tuple[str, ...]) -> re.Pattern[str]:
+    """
+    将一次查询的关键词编译为单个正则（按关键词组合缓存）。
     
-    # 提取颜色（优先匹配更长的词）
-    for color in sorted(colors, key=len, reverse=True):
-        if color in query:
-            found_keywords["colors"].append(color)
-            # 避免重复匹配（如"红色"和"粉红色"）
-            query = query.replace(color, "", 1)
-    
-    # 提取商品类型（优先匹配更具体的类型）
-    for type_name in sorted(types, key=len, reverse=True):
-        if type_name in query:
-            found_keywords["types"].append(type_name)
-            # 避免重复匹配
-            query = query.replace(type_name, "", 1)
+    使用零宽前瞻在每个位置尝试匹配，重叠的关键词（如"短靴"与"靴子"）都能命中，
+    与逐个做子串判断的结果一致（关键词表中没有互为前缀的词，同一位置至多命中一个）。
+    """
+    ordered = sorted(set(words), key=len, reverse=True)
+    return re.compile("(?=(" + "|".join(re.escape(word) for word in ordered) + "))")
+
+
+# 全部关键词表（类型/颜色/属性）中每个词对应的位，用于chunk的关键词命中位图
+_KEYWORD_BITS: dict[str, int] = {
+    word: 1 << bit
+    for bit, word in enumerate(dict.fromkeys((*_TYPE_KEYWORDS, *_COLOR_KEYWORDS, *_ATTRIBUTE_KEYWORDS)))
+}
+
+
+@lru_cache(maxsize=8192)
+def _chunk_keyword_mask(chunk: str) -> int:
+    """
+    计算chunk对全部关键词表的命中位图（按chunk文本缓存）。
     
-    # 提取属性关键词
-    for attr in attributes:
-        if attr in query:
-            found_keywords["attributes"].append(attr)
+    候选chunk在不同请求间高度重复，每个chunk只需扫描一次；
+    之后任意查询的命中个数都是一次按位与 + popcount。
+    """
+    mask = 0
+    for word in _query_keyword_pattern(tuple(_KEYWORD_BITS)).findall(chunk):
+        mask |= _KEYWORD_BITS[word]
+    return mask
+
+
+def _keyword_query_mask(words: List[str]) -> int:
+    """将一类查询关键词合并为位图（调用方保证关键词都在 _KEYWORD_BITS 中）。"""
+    mask = 0
+    for word in words:
+        mask |= _KEYWORD_BITS[word]
+    return mask
+
+
+def _score_keyword_hits(
+    type_hits: np.ndarray,
+    color_hits: np.ndarray,
+    attr_hits: np.ndarray,
+    has_types: bool,
+    has_colors: bool,
+) -> np.ndarray:
+    """
+    根据各类关键词命中个数计算分数（纯数值运算，不涉及字符串）。
     
-    return found_keywords
+    类型不匹配扣10分、颜色不匹配扣1分仅在查询指定了该类关键词时生效。
+    """
+    scores = 10.0 * type_hits + 5.0 * color_hits + 2.0 * attr_hits
+    if has_types:
+        scores -= 10.0 * (type_hits == 0)
+    if has_colors:
+        scores -= 1.0 * (color_hits == 0)
+    return scores
 
 
-def keyword_match_score(chunk: str, keywords: dict[str, list[str]]) -> float:
+def keyword_match_scores(chunks: List[str], keywords: dict[str, list[str]]) -> np.ndarray:
     """
-    计算chunk与关键词的匹配分数
+    批量计算多个chunk与关键词的匹配分数
     
     分数计算规则：
     - 类型匹配：+10.0分（最重要）
     - 颜色匹配：+5.0分（重要）
     - 属性匹配：+2.0分（加分项）
     - 类型不匹配：-10.0分（扣分，但不扣太多，避免过滤掉所有结果）
+    - 颜色不匹配：-1.0分（轻微扣分）
     - 分数越高，匹配度越高
     
+    关键词都来自关键词表时，复用按chunk缓存的关键词命中位图；否则对候选chunk
+    只扫描一次，构建 (chunk数, 关键词数) 的命中矩阵。各类命中个数交给
+    _score_keyword_hits 计算分数。
+    
     返回：
-    - 匹配分数（0.0表示无匹配，分数越高匹配越好）
+    - 与 chunks 一一对应的分数数组（0.0表示无匹配，分数越高匹配越好）
     """
-    score = 0.0
-    
-    # 类型匹配（最重要，权重最高）
     types = keywords.get("types", [])
-    if types:
-        type_matched = False
-        for type_name in types:
-            if type_name in chunk:
-                score += 10.0  # 类型匹配权重很高
-                type_matched = True
-        # 如果查询指定了类型但chunk中没有，扣分（但不扣太多，避免过滤掉所有结果）
-        if not type_matched:
-            score -= 10.0  # 扣分，但比之前的-20.0更温和
-    
-    # 颜色匹配（重要）
     colors = keywords.get("colors", [])
-    if colors:
-        color_matched = False
-        for color in colors:
-            if color in chunk:
-                score += 5.0
-                color_matched = True
-        # 如果查询指定了颜色但chunk中没有，轻微扣分
-        if not color_matched:
-            score -= 1.0  # 轻微扣分
+    attributes = keywords.get("attributes", [])
+    words = [*types, *colors, *attributes]
+    if not chunks or not words:
+        return np.zeros(len(chunks), dtype=np.float64)
+    
+    # 常见情况：查询关键词都来自关键词表，使用缓存的chunk命中位图，
+    # 各类命中个数 = popcount(chunk位图 & 该类查询位图)
+    if all(word in _KEYWORD_BITS for word in words):
+        chunk_masks = [_chunk_keyword_mask(chunk) for chunk in chunks]
+        
+        def count_hits(category_words: List[str]) -> np.ndarray:
+            query_mask = _keyword_query_mask(category_words)
+            return np.fromiter(
+                ((mask & query_mask).bit_count() for mask in chunk_masks),
+                dtype=np.int64,
+                count=len(chunk_masks),
+            )
+        
+        return _score_keyword_hits(
+            count_hits(types),
+            count_hits(colors),
+            count_hits(attributes),
+            has_types=bool(types),
+            has_colors=bool(colors),
+        )
     
-    # 属性匹配（加分项）
-    for attr in keywords.get("attributes", []):
-        if attr in chunk:
-            score += 2.0
+    # 其他关键词：每个chunk只用查询关键词组成的正则扫描一次，再按关键词列展开为命中矩阵
+    pattern = _query_keyword_pattern(tuple(words))
+    presence = np.zeros((len(chunks), len(words)), dtype=np.bool_)
+    column_of = {word: column for column, word in enumerate(words)}
+    for row, chunk in enumerate(chunks):
+        for word in pattern.findall(chunk):
+            presence[row, column_of[word]] = True
+    color_start = len(types)
+    attr_start = color_start + len(colors)
+    return _score_keyword_hits(
+        presence[:, :color_start].sum(axis=1),
+        presence[:, color_start:attr_start].sum(axis=1),
+        presence[:, attr_start:].sum(axis=1),
+        has_types=bool(types),
+        has_colors=bool(colors),
+    )
+
+
+def keyword_match_score(chunk: str, keywords: dict[str, list[str]]) -> float:
+    """
+    计算单个chunk与关键词的匹配分数（规则见 keyword_match_scores）
     
-    return score
+    返回：
+    - 匹配分数（0.0表示无匹配，分数越高匹配越好）
+    """
+    return float(keyword_match_scores([chunk], keywords)[0])
 
 
 def extract_sku_from_query(query: str) -> str | None:
@@ -220,33 +345,33 @@ def extract_sku_from_query(query: str) -> str | None:
     - 如果找到SKU，返回SKU字符串（如 "8WZ76CM6"）
     - 如果未找到，返回 None
     """
-    # SKU格式：8个字符，前3个字母+2个数字+2个字母+1个数字
-    # 例如：8WZ76CM6
-    sku_pattern = r'([A-Z0-9]{2}[A-Z][0-9]{2}[A-Z]{2}[0-9])'
+    # 纯中文等不含ASCII字母/数字的查询（最常见的情况）不可能包含SKU
+    if not _ASCII_ALNUM_PATTERN.search(query):
+        return None
     
-    # 尝试从查询中提取SKU
-    matches = re.findall(sku_pattern, query.upper())
-    if matches:
-        # 返回第一个匹配的SKU
-        return matches[0]
+    # 尝试从查询中提取标准格式SKU（返回第一个匹配）
+    match = _SKU_PATTERN.search(query)
+    if match:
+        return match.group(1).upper()
     
     # 如果没有找到标准格式，尝试查找 "SKU：" 后面的内容
-    sku_keyword_pattern = r'SKU[：:]\s*([A-Z0-9]+)'
-    matches = re.findall(sku_keyword_pattern, query, re.IGNORECASE)
-    if matches:
-        return matches[0].upper()
+    match = _SKU_KEYWORD_PATTERN.search(query)
+    if match:
+        return match.group(1).upper()
     
     return None
 
 
-def _calculate_match_info(chunk: str, query: str) -> str:
+def _calculate_match_info(chunk: str, keywords: dict[str, list[str]]) -> str:
     """
-    计算chunk与query的匹配信息（用于调试和日志）
+    计算chunk与查询关键词的匹配信息（用于调试和日志）
+    
+    参数：
+    - keywords: extract_keywords_from_query 的结果（每个请求只提取一次）
     
     返回：
     - 匹配信息字符串，例如："类型匹配✓ 颜色匹配✓ 属性匹配✓"
     """
-    keywords = extract_keywords_from_query(query)
     match_parts = []
     
     # 检查类型匹配
@@ -267,7 +392,9 @@ def _calculate_match_info(chunk: str, query: str) -> str:
     return " ".join(match_parts) if match_parts else "无关键词"
 
 
-def exact_sku_search(sku: str, chunks: List[str], top_k: int = 5) -> List[Tuple[str, float]]:
+def exact_sku_search(
+    sku: str, vector_store: VectorStore, top_k: int = 5
+) -> List[Tuple[str, float]]:
     """
     精确SKU搜索
     
@@ -278,29 +405,23 @@ def exact_sku_search(sku: str, chunks: List[str], top_k: int = 5) -> List[Tuple[
     
     参数：
     - sku: 要搜索的SKU
-    - chunks: 所有文本块列表
+    - vector_store: 已加载的向量存储（使用其 chunks 及 SKU 索引）
     - top_k: 返回结果数量
     
+    查找方式：
+    - SKU 索引（vector_store.sku_to_chunk_ids）非空时直接查表
+    - 否则（不带 `[SKU:xxx]` 标识的旧索引）在连续文本缓冲区中扫描包含SKU的块；
+      `SKU：xxx`、`商品编号：xxx` 等格式都包含SKU字符串本身，只需查找SKU
+    
     返回：
-    - (chunk, score) 元组列表，score=0表示精确匹配
+    - (chunk, score) 元组列表，按原始顺序，score=0表示精确匹配
     """
-    results = []
-    # 支持多种SKU格式：`[SKU:xxx]` 或 `SKU：xxx` 或直接包含SKU
-    sku_patterns = [
-        f"[SKU:{sku}]",
-        f"SKU：{sku}",
-        f"SKU:{sku}",
-        f"商品编号：{sku}",
-        sku  # 直接匹配SKU字符串
-    ]
-    
-    for chunk in chunks:
-        # 检查是否包含任一SKU格式
-        if any(pattern in chunk for pattern in sku_patterns):
-            results.append((chunk, 0.0))  # 精确匹配，分数为0
+    if vector_store.sku_to_chunk_ids:
+        chunk_ids = vector_store.sku_to_chunk_ids.get(sku, [])[:top_k]
+    else:
+        chunk_ids = vector_store.find_chunk_ids(sku, top_k)
     
-    # 按原始顺序返回，限制数量
-    return results[:top_k]
+    return [(vector_store.chunks[i], 0.0) for i in chunk_ids]
 
 
 # ==================== API 接口 ====================
@@ -357,9 +478,7 @@ async def vector_search(
     - 使用 L2（欧氏距离）计算相似度
     - 支持批量查询和结果排序
     """
-    logger.info(
-        f"[API] 向量搜索请求: query='{request.query}', top_k={request.top_k}"
-    )
+    logger.info("[API] 向量搜索请求: query='%s', top_k=%d", request.query, request.top_k)
     
     # 检查索引是否已加载
     if vector_store.index is None or len(vector_store.chunks) == 0:
@@ -369,25 +488,42 @@ async def vector_search(
         )
     
     try:
+        # 关键词每个请求只提取一次，供混合搜索打分和匹配度日志复用
+        keywords = extract_keywords_from_query(request.query)
+        
+        # 查询向量按需计算且每个请求最多计算一次，供各分支的向量检索复用
+        query_vector: np.ndarray | None = None
+        
+        async def search_by_query(top_k: int) -> List[Tuple[str, float]]:
+            nonlocal query_vector
+            if not request.query.strip():
+                return []
+            if query_vector is None:
+                query_vector = await vector_store.aembed_query(request.query)
+                if query_vector is None:
+                    logger.warning("[API] 查询向量生成失败，向量搜索返回空结果")
+                    return []
+            return await vector_store.asearch_by_embedding(query_vector, top_k)
+        
         # 步骤1: 检测查询中是否包含SKU
         extracted_sku = extract_sku_from_query(request.query)
         
         search_results: List[Tuple[str, float]] = []
         
         if extracted_sku:
-            logger.info(f"[API] 检测到SKU查询: {extracted_sku}")
+            logger.info("[API] 检测到SKU查询: %s", extracted_sku)
             
             # 步骤2: 先进行精确SKU匹配
-            exact_results = exact_sku_search(extracted_sku, vector_store.chunks, top_k=request.top_k)
+            exact_results = exact_sku_search(extracted_sku, vector_store, top_k=request.top_k)
             
             if exact_results:
-                logger.info(f"[API] 精确匹配找到 {len(exact_results)} 个结果")
+                logger.info("[API] 精确匹配找到 %d 个结果", len(exact_results))
                 search_results = exact_results
                 
                 # 如果精确匹配结果不足，用向量搜索补充
                 if len(exact_results) < request.top_k:
-                    logger.info(f"[API] 精确匹配结果不足，使用向量搜索补充")
-                    vector_results = vector_store.search(request.query, top_k=request.top_k - len(exact_results))
+                    logger.info("[API] 精确匹配结果不足，使用向量搜索补充")
+                    vector_results = await search_by_query(top_k=request.top_k - len(exact_results))
                     
                     # 过滤掉已经包含在精确匹配中的结果
                     exact_chunks = {chunk for chunk, _ in exact_results}
@@ -398,8 +534,8 @@ async def vector_search(
                                 break
             else:
                 # 精确匹配未找到，尝试从数据库查询
-                logger.info(f"[API] 精确匹配未找到，尝试从数据库查询SKU")
-                product = get_product_by_sku(db, extracted_sku)
+                logger.info("[API] 精确匹配未找到，尝试从数据库查询SKU")
+                product = get_product_full(db, extracted_sku)
                 if product:
                     # 构建商品文本块
                     text_parts = [f"商品名称：{product.name}", f"商品SKU：{product.sku}"]
@@ -416,96 +552,94 @@ async def vector_search(
                     
                     chunk = f"[商品：{product.name}（SKU：{product.sku}）] {'。'.join(text_parts)}"
                     search_results = [(chunk, 0.0)]
-                    logger.info(f"[API] 从数据库找到商品: {product.name}")
+                    logger.info("[API] 从数据库找到商品: %s", product.name)
                 else:
                     # 数据库也未找到，使用向量搜索
-                    logger.info(f"[API] 数据库未找到SKU，使用向量搜索")
-                    search_results = vector_store.search(request.query, top_k=request.top_k)
+                    logger.info("[API] 数据库未找到SKU，使用向量搜索")
+                    search_results = await search_by_query(top_k=request.top_k)
         else:
             # 步骤3: 没有SKU，使用混合搜索（关键词匹配 + 向量搜索）
-            logger.info(f"[API] 未检测到SKU，使用混合搜索")
+            logger.info("[API] 未检测到SKU，使用混合搜索")
             
-            # 提取关键词
-            keywords = extract_keywords_from_query(request.query)
-            logger.info(f"[API] 提取的关键词: {keywords}")
+            logger.info("[API] 提取的关键词: %s", keywords)
             
             # 先进行向量搜索
-            vector_results = vector_store.search(request.query, top_k=request.top_k * 2)  # 获取更多候选结果
+            vector_results = await search_by_query(top_k=request.top_k * 2)  # 获取更多候选结果
             
             # 如果有关键词，进行关键词匹配并重新排序
             if keywords["colors"] or keywords["types"] or keywords["attributes"]:
-                # 计算每个结果的匹配分数
-                scored_results = []
-                for chunk, vector_score in vector_results:
-                    keyword_score = keyword_match_score(chunk, keywords)
-                    # 综合分数 = 关键词匹配分数 - 向量距离（距离越小越好，所以用减法）
-                    # 关键词匹配分数越高越好，向量距离越小越好
-                    combined_score = keyword_score - vector_score
-                    scored_results.append((chunk, combined_score, keyword_score, vector_score))
+                # 批量计算所有候选结果的匹配分数
+                candidate_chunks = [chunk for chunk, _ in vector_results]
+                vector_scores = np.array([score for _, score in vector_results], dtype=np.float64)
+                keyword_scores = keyword_match_scores(candidate_chunks, keywords)
+                # 综合分数 = 关键词匹配分数 - 向量距离（距离越小越好，所以用减法）
+                # 关键词匹配分数越高越好，向量距离越小越好
+                combined_scores = keyword_scores - vector_scores
                 
-                # 按综合分数排序（降序）
-                scored_results.sort(key=lambda x: x[1], reverse=True)
-                
-                # 过滤和排序逻辑
+                # 过滤逻辑
                 # 策略：优先显示匹配的结果，但不完全过滤掉不匹配的结果（避免返回空结果）
-                filtered_results = []
-                for chunk, combined_score, keyword_score, vector_score in scored_results:
-                    # 只过滤掉严重不匹配且向量距离也很远的结果
-                    # 如果类型不匹配（keyword_score < 0）且综合分数非常低（< -18.0），才过滤
-                    # 这样可以保留一些相关但不完全匹配的结果
-                    if keywords.get("types") and keyword_score < -15.0 and combined_score < -18.0:
-                        logger.debug(
-                            f"[API] 过滤掉不匹配结果: keyword_score={keyword_score:.1f}, "
-                            f"combined_score={combined_score:.1f}, chunk_preview={chunk[:50]}"
-                        )
-                        continue
-                    filtered_results.append((chunk, vector_score, keyword_score, combined_score))
+                # 只过滤掉严重不匹配且向量距离也很远的结果：
+                # 类型不匹配（keyword_score < -15.0）且综合分数非常低（< -18.0）
+                keep_mask = np.ones(len(candidate_chunks), dtype=np.bool_)
+                if keywords.get("types"):
+                    keep_mask &= ~((keyword_scores < -15.0) & (combined_scores < -18.0))
+                kept_count = int(keep_mask.sum())
+                if kept_count < len(candidate_chunks):
+                    logger.debug("[API] 过滤掉 %d 个不匹配结果", len(candidate_chunks) - kept_count)
+                
+                # 只取综合分数最高的 top_k 个（降序，分数相同时保持原始顺序）
+                top_indices = heapq.nlargest(
+                    request.top_k,
+                    (i for i in range(len(candidate_chunks)) if keep_mask[i]),
+                    key=lambda i: combined_scores[i],
+                )
                 
                 # 如果过滤后结果为空，至少返回前几个结果（避免完全无结果）
-                if not filtered_results:
+                if not top_indices:
                     logger.warning(
-                        f"[API] 所有结果都被过滤，返回原始向量搜索结果的前{request.top_k}个"
+                        "[API] 所有结果都被过滤，返回原始向量搜索结果的前%d个", request.top_k
                     )
                     search_results = vector_results[:request.top_k]
                 else:
                     # 优先返回关键词匹配度高的结果
-                    search_results = [(chunk, vector_score) for chunk, vector_score, keyword_score, combined_score in filtered_results[:request.top_k]]
+                    search_results = [vector_results[i] for i in top_indices]
                 
-                logger.info(
-                    f"[API] 关键词匹配结果: "
-                    f"原始结果数={len(scored_results)}, 过滤后={len(filtered_results)}, "
-                    f"最终返回={len(search_results)}, "
-                    f"前3个结果的关键词分数 = {[f'{r[2]:.1f}' for r in filtered_results[:3]] if filtered_results else 'N/A'}, "
-                    f"综合分数 = {[f'{r[3]:.1f}' for r in filtered_results[:3]] if filtered_results else 'N/A'}"
-                )
+                if logger.isEnabledFor(logging.INFO):
+                    logger.info(
+                        "[API] 关键词匹配结果: 原始结果数=%d, 过滤后=%d, 最终返回=%d, "
+                        "前3个结果的关键词分数 = %s, 综合分数 = %s",
+                        len(candidate_chunks),
+                        kept_count,
+                        len(search_results),
+                        [f"{keyword_scores[i]:.1f}" for i in top_indices[:3]] if top_indices else "N/A",
+                        [f"{combined_scores[i]:.1f}" for i in top_indices[:3]] if top_indices else "N/A",
+                    )
             else:
                 # 没有关键词，直接使用向量搜索结果
                 search_results = vector_results[:request.top_k]
         
-        # 构建响应结果，并添加匹配度说明
+        # 构建响应结果
         results = []
         for i, (chunk, score) in enumerate(search_results[:request.top_k]):
-            # 计算匹配度说明
-            match_info = _calculate_match_info(chunk, request.query)
-            
             results.append(SearchResult(
                 chunk=chunk,
                 score=round(score, 4),  # 保留4位小数
                 rank=i + 1
             ))
         
-        # 如果有关键词，在日志中输出匹配度分析
-        keywords = extract_keywords_from_query(request.query)
-        if keywords["colors"] or keywords["types"] or keywords["attributes"]:
+        # 如果有关键词，在日志中输出匹配度分析（日志级别过滤掉 INFO 时不计算）
+        has_keywords = keywords["colors"] or keywords["types"] or keywords["attributes"]
+        if has_keywords and logger.isEnabledFor(logging.INFO):
             logger.info(
-                f"[API] 关键词匹配分析: "
-                f"查询关键词={keywords}, "
-                f"前3个结果的匹配情况: {[_calculate_match_info(r[0], request.query) for r in search_results[:3]]}"
+                "[API] 关键词匹配分析: 查询关键词=%s, 前3个结果的匹配情况: %s",
+                keywords,
+                [_calculate_match_info(r[0], keywords) for r in search_results[:3]],
             )
         
         logger.info(
-            f"[API] 搜索成功: 找到 {len(results)} 个结果 "
-            f"(精确匹配: {len([r for r in results if r.score == 0.0])} 个)"
+            "[API] 搜索成功: 找到 %d 个结果 (精确匹配: %d 个)",
+            len(results),
+            sum(1 for r in results if r.score == 0.0),
         )
         
         return BaseResponse(
@@ -518,7 +652,7 @@ async def vector_search(
         )
         
     except Exception as e:
-        logger.error(f"[API] 向量搜索失败: {e}", exc_info=True)
+        logger.error("[API] 向量搜索失败: %s", e, exc_info=True)
         raise HTTPException(
             status_code=500,
             detail=f"搜索失败: {str(e)}"
@@ -0,0 +1,23 @@
+"""Cache key derivation for request-derived in-process caches.
+
+所有基于请求参数的缓存 key 统一在此生成，保证相同语义的请求得到相同 key。
+"""
+from __future__ import annotations
+
+import hashlib
+
+import orjson
+
+
+def key_for(*parts: object) -> bytes:
+    """
+    根据若干请求片段生成 16 字节缓存 key。
+
+    dict 按 key 排序后序列化，字段顺序不同的相同请求得到相同 key；
+    无法直接序列化的对象按 str() 处理。
+
+    Example:
+        key_for("similar_skus", brand_code, mode, top_k, vision_features)
+    """
+    payload = orjson.dumps(parts, option=orjson.OPT_SORT_KEYS, default=str)
+    return hashlib.blake2b(payload, digest_size=16).digest()
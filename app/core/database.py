@@ -1,27 +1,43 @@
 """Database configuration using SQLAlchemy 2.0."""
 from __future__ import annotations
 
+import threading
 from typing import Generator
 
-from sqlalchemy import create_engine, text
+from sqlalchemy import Engine, create_engine, inspect, text
+from sqlalchemy.exc import NoSuchTableError
 from sqlalchemy.orm import DeclarativeBase, Session, sessionmaker
 
 from app.core.config import get_settings
 
-settings = get_settings()
+
+def _make_engine() -> Engine:
+    """按当前配置创建 engine（配置只在此处读取，不作为模块级全局保留）。"""
+    settings = get_settings()
+    # 连接池按并发请求量配置（默认 pool_size=5 在突发请求下会排队等待连接）
+    return create_engine(
+        settings.database_url,
+        pool_pre_ping=True,
+        pool_recycle=settings.db_pool_recycle,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        echo=False,  # Set to True for SQL query logging
+    )
+
 
 # Create SQLAlchemy 2.0 engine
-engine = create_engine(
-    settings.database_url,
-    pool_pre_ping=True,
-    pool_recycle=3600,
-    echo=False,  # Set to True for SQL query logging
-)
+engine = _make_engine()
 
 # Create SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
+# (数据库 URL, 表名) -> 字段名集合；表结构在进程生命周期内视为不变
+_table_columns_cache: dict[tuple[str, str], frozenset[str]] = {}
+_table_columns_lock = threading.Lock()
+
+
 class Base(DeclarativeBase):
     """Base class for all ORM models."""
     pass
@@ -42,3 +58,44 @@ def get_db() -> Generator[Session, None, None]:
     finally:
         db.close()
 
+
+
+def get_table_columns(bind: Engine, table_name: str) -> frozenset[str]:
+    """
+    获取表的实际字段名集合（每个数据库每张表只反射一次，之后为内存查找）。
+
+    用于 ORM 模型未声明、但部分部署中存在的可选字段（如 products.on_sale）。
+    表不存在时返回空集合。
+
+    Args:
+        bind: Engine（通常为 db.get_bind()）
+        table_name: 表名
+
+    Returns:
+        字段名集合
+    """
+    key = (str(bind.url), table_name)
+    columns = _table_columns_cache.get(key)
+    if columns is None:
+        try:
+            columns = frozenset(column["name"] for column in inspect(bind).get_columns(table_name))
+        except NoSuchTableError:
+            columns = frozenset()
+        with _table_columns_lock:
+            _table_columns_cache[key] = columns
+    return columns
+
+
+def invalidate_table_columns(table_name: str | None = None) -> None:
+    """
+    清除 get_table_columns 的缓存（表结构变更 / 迁移后调用）。
+
+    Args:
+        table_name: 只清除该表（所有数据库）；None 表示全部清除
+    """
+    with _table_columns_lock:
+        if table_name is None:
+            _table_columns_cache.clear()
+        else:
+            for key in [key for key in _table_columns_cache if key[1] == table_name]:
+                del _table_columns_cache[key]
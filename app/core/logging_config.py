@@ -4,19 +4,24 @@
 - 按天滚动生成日志文件（info 和 error 分离）
 - 支持 trace_id 链路追踪
 - 同时输出到文件和控制台
+- 通过 QueueHandler/QueueListener 在后台线程写日志，请求路径不阻塞在 I/O 上
 """
 from __future__ import annotations
 
+import atexit
 import logging
 import logging.handlers
 import os
+import queue
 from pathlib import Path
 from typing import Optional
 
 from app.core.config import get_settings
 from app.core.trace_context import get_trace_id
 
-settings = get_settings()
+
+# 后台写日志线程（重复初始化时先停止旧的 listener）
+_queue_listener: Optional[logging.handlers.QueueListener] = None
 
 
 class TraceIdFilter(logging.Filter):
@@ -37,6 +42,14 @@ class ErrorOnlyFilter(logging.Filter):
         return record.levelno >= logging.ERROR
 
 
+def _stop_queue_listener() -> None:
+    """进程退出时刷新并停止后台写日志线程。"""
+    global _queue_listener
+    if _queue_listener is not None:
+        _queue_listener.stop()
+        _queue_listener = None
+
+
 def init_logging() -> None:
     """
     初始化日志系统。
@@ -46,8 +59,14 @@ def init_logging() -> None:
     - error 日志文件：app-error-YYYY-MM-DD.log（ERROR 及以上）
     - 控制台输出：INFO 及以上
     - 日志格式：时间、级别、trace_id、模块、行号、消息
+    
+    根 logger 只挂一个 QueueHandler；文件和控制台 handler 由 QueueListener
+    在后台线程中调用。trace_id 在 QueueHandler 上注入（contextvars 只在
+    请求所在线程可见）。
     """
-    # 获取日志目录配置
+    global _queue_listener
+    # 获取日志目录配置（在初始化时读取，避免模块导入时解析配置）
+    settings = get_settings()
     log_dir = Path(settings.log_dir if hasattr(settings, "log_dir") else "logs")
     log_backup_count = (
         settings.log_backup_count if hasattr(settings, "log_backup_count") else 14
@@ -62,6 +81,7 @@ def init_logging() -> None:
 
     # 清除已有的 handlers（避免重复）
     root_logger.handlers.clear()
+    _stop_queue_listener()
 
     # 日志格式：时间、级别、trace_id、模块、行号、消息
     log_format = (
@@ -83,7 +103,6 @@ def init_logging() -> None:
     )
     info_handler.setLevel(logging.INFO)
     info_handler.setFormatter(formatter)
-    info_handler.addFilter(TraceIdFilter())
     # TimedRotatingFileHandler 会自动在文件名后添加日期后缀（如：app-info.log.2024-12-23）
     # 但我们需要 app-info-2024-12-23.log 格式，所以使用 namer 自定义
     def info_namer(name: str) -> str:
@@ -97,7 +116,6 @@ def init_logging() -> None:
             return f"{base.replace('.log', '')}-{date}.log"
         return name
     info_handler.namer = info_namer
-    root_logger.addHandler(info_handler)
 
     # 2. Error 日志文件处理器（ERROR 及以上）
     error_handler = logging.handlers.TimedRotatingFileHandler(
@@ -109,7 +127,6 @@ def init_logging() -> None:
     )
     error_handler.setLevel(logging.ERROR)
     error_handler.setFormatter(formatter)
-    error_handler.addFilter(TraceIdFilter())
     error_handler.addFilter(ErrorOnlyFilter())  # 只记录 ERROR 及以上
     # 自定义 error 日志文件名格式：app-error-YYYY-MM-DD.log
     def error_namer(name: str) -> str:
@@ -122,14 +139,26 @@ def init_logging() -> None:
             return f"{base.replace('.log', '')}-{date}.log"
         return name
     error_handler.namer = error_namer
-    root_logger.addHandler(error_handler)
 
     # 3. 控制台处理器（INFO 及以上）
     console_handler = logging.StreamHandler()
     console_handler.setLevel(logging.INFO)
     console_handler.setFormatter(formatter)
-    console_handler.addFilter(TraceIdFilter())
-    root_logger.addHandler(console_handler)
+
+    # 4. 队列处理器：请求线程只入队，由后台线程写文件/控制台
+    log_queue: queue.Queue = queue.Queue(-1)
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(TraceIdFilter())
+    root_logger.addHandler(queue_handler)
+
+    _queue_listener = logging.handlers.QueueListener(
+        log_queue,
+        info_handler,
+        error_handler,
+        console_handler,
+        respect_handler_level=True,
+    )
+    _queue_listener.start()
 
     # 记录初始化日志
     logger = logging.getLogger(__name__)
@@ -140,3 +169,5 @@ def init_logging() -> None:
         f"error_file={log_dir / 'app-error.log'}"
     )
 
+
+atexit.register(_stop_queue_listener)
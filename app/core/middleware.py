@@ -1,14 +1,14 @@
-"""FastAPI middleware for trace_id propagation and access logging."""
+"""ASGI middleware for trace_id propagation and access logging."""
 from __future__ import annotations
 
 import logging
+import random
 import time
-from typing import Callable
+from typing import Optional
 
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.types import ASGIApp
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
+from app.core.config import get_settings
 from app.core.trace_context import (
     clear_trace_id,
     generate_trace_id,
@@ -18,85 +18,130 @@ from app.core.trace_context import (
 
 logger = logging.getLogger(__name__)
 
+# 探活类路径的 access log 降级为 DEBUG，避免淹没业务日志
+_QUIET_PATHS = frozenset({"/health", "/"})
 
-class TraceIdMiddleware(BaseHTTPMiddleware):
-    """Trace ID 中间件：处理请求头 X-Trace-Id，并在响应头返回。"""
 
-    def __init__(self, app: ASGIApp) -> None:
+class TraceIdMiddleware:
+    """
+    Trace ID 中间件：处理请求头 X-Trace-Id，并在响应头返回。
+
+    纯 ASGI 实现（不继承 BaseHTTPMiddleware），避免每个请求创建 anyio 任务组
+    以及 Request/Response 对象。
+
+    access log 采用尾部采样：错误（>=400）和慢请求始终记录，
+    其余快速请求按 sample_rate 概率记录；异常请求始终记录。
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        slow_ms: Optional[int] = None,
+        sample_rate: Optional[float] = None,
+    ) -> None:
         """
         初始化中间件。
-        
+
         Args:
             app: ASGI 应用实例
+            slow_ms: 慢请求阈值（毫秒），默认读取 access_log_slow_ms 配置
+            sample_rate: 快速成功请求的采样率，默认读取 access_log_sample_rate 配置
         """
-        super().__init__(app)
+        self.app = app
+        settings = get_settings()
+        self.slow_ms = settings.access_log_slow_ms if slow_ms is None else slow_ms
+        self.sample_rate = (
+            settings.access_log_sample_rate if sample_rate is None else sample_rate
+        )
 
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
         """
         处理请求：提取/生成 trace_id，设置到上下文，记录 access log。
-        
+
         Args:
-            request: FastAPI 请求对象
-            call_next: 下一个中间件或路由处理器
-        
-        Returns:
-            FastAPI 响应对象
+            scope: ASGI scope
+            receive: ASGI receive 通道
+            send: ASGI send 通道
         """
-        # 1. 提取或生成 trace_id
-        trace_id_header = request.headers.get("X-Trace-Id") or request.headers.get(
-            "x-trace-id"
-        )
+        # 非 HTTP 请求（lifespan / websocket）直接透传
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # 1. 提取或生成 trace_id（ASGI 请求头名已是小写 bytes，单次扫描即可）
+        trace_id_header = None
+        for name, value in scope["headers"]:
+            if name == b"x-trace-id":
+                trace_id_header = value.decode("latin-1")
+                break
         trace_id = trace_id_header if trace_id_header else generate_trace_id()
 
         # 2. 设置到上下文
         set_trace_id(trace_id)
 
-        # 3. 记录请求开始时间
-        start_time = time.time()
+        # 3. 记录请求开始时间（单调时钟，整数纳秒）
+        start_ns = time.perf_counter_ns()
 
         # 4. 获取客户端 IP
-        client_ip = request.client.host if request.client else "unknown"
+        client = scope.get("client")
+        client_ip = client[0] if client else "unknown"
+        method = scope["method"]
+        path = scope["path"]
+        status_code = 500
+
+        async def send_with_trace_id(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                # 在响应头返回 trace_id
+                status_code = message["status"]
+                message.setdefault("headers", []).append(
+                    (b"x-trace-id", trace_id.encode("latin-1"))
+                )
+            await send(message)
 
         try:
             # 5. 调用下一个中间件或路由处理器
-            response = await call_next(request)
+            await self.app(scope, receive, send_with_trace_id)
 
             # 6. 计算耗时
-            latency_ms = int((time.time() - start_time) * 1000)
-
-            # 7. 在响应头返回 trace_id
-            response.headers["X-Trace-Id"] = trace_id
-
-            # 8. 记录 access log（成功）
-            logger.info(
-                f"ACCESS {request.method} {request.url.path} "
-                f"status={response.status_code} "
-                f"latency_ms={latency_ms} "
-                f"client_ip={client_ip} "
-                f"trace_id={trace_id}"
-            )
-
-            return response
+            latency_ms = (time.perf_counter_ns() - start_ns) // 1_000_000
+
+            # 7. 记录 access log（成功，尾部采样）
+            if (
+                status_code >= 400
+                or latency_ms > self.slow_ms
+                or random.random() < self.sample_rate
+            ):
+                logger.log(
+                    logging.DEBUG if path in _QUIET_PATHS else logging.INFO,
+                    "ACCESS %s %s status=%s latency_ms=%d client_ip=%s trace_id=%s",
+                    method,
+                    path,
+                    status_code,
+                    latency_ms,
+                    client_ip,
+                    trace_id,
+                )
 
         except Exception as e:
-            # 9. 计算耗时（异常情况）
-            latency_ms = int((time.time() - start_time) * 1000)
+            # 8. 计算耗时（异常情况）
+            latency_ms = (time.perf_counter_ns() - start_ns) // 1_000_000
 
-            # 10. 记录 access log（异常）
+            # 9. 记录 access log（异常）
             logger.error(
-                f"ACCESS {request.method} {request.url.path} "
-                f"status=500 "
-                f"latency_ms={latency_ms} "
-                f"client_ip={client_ip} "
-                f"trace_id={trace_id} "
-                f"error={str(e)}",
+                "ACCESS %s %s status=500 latency_ms=%d client_ip=%s trace_id=%s error=%s",
+                method,
+                path,
+                latency_ms,
+                client_ip,
+                trace_id,
+                e,
                 exc_info=True,  # 包含异常堆栈
             )
 
-            # 11. 重新抛出异常（让 FastAPI 的错误处理器处理）
+            # 10. 重新抛出异常（让 FastAPI 的错误处理器处理）
             raise
 
         finally:
-            # 12. 清理上下文（避免泄漏）
+            # 11. 清理上下文（避免泄漏）
             clear_trace_id()
-
@@ -0,0 +1,59 @@
+"""Shared Redis client for caches.
+
+商品缓存与视觉特征缓存共用一个连接池，连接参数和故障退避只在此处配置。
+未配置 redis_url、未安装 redis 或 Redis 不可用时返回 None，调用方降级为不使用 Redis。
+"""
+from __future__ import annotations
+
+import logging
+import time
+
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+# 连接池上限：并发请求各自取连接
+REDIS_MAX_CONNECTIONS = 32
+# Redis 连接失败后多久再重试（秒），故障期间调用方直接降级，不再等待连接超时
+REDIS_RETRY_SECONDS = 30
+
+# Redis client (lazy import)
+_redis_client = None
+_redis_retry_at = 0.0
+
+
+def get_redis_client():
+    """获取共享的 Redis 客户端（懒加载；不可用时返回 None，并在 REDIS_RETRY_SECONDS 内不再重试）。"""
+    global _redis_client, _redis_retry_at
+    if _redis_client is not None:
+        return _redis_client
+    if time.monotonic() < _redis_retry_at:
+        return None
+
+    settings = get_settings()
+    if not settings.redis_url:
+        logger.warning("[REDIS] Redis URL not configured, caches will use database only")
+        _redis_retry_at = float("inf")
+        return None
+
+    try:
+        import redis
+
+        # from_url 支持 rediss://（TLS）、用户名密码、查询参数和 IPv6 地址
+        pool = redis.ConnectionPool.from_url(
+            settings.redis_url,
+            # 缓存值均为 orjson bytes，读取时直接 orjson.loads(bytes)
+            decode_responses=False,
+            max_connections=REDIS_MAX_CONNECTIONS,
+            socket_connect_timeout=2,
+            socket_timeout=2,
+        )
+        client = redis.Redis(connection_pool=pool)
+        client.ping()
+        _redis_client = client
+        logger.info("[REDIS] ✓ Redis connected")
+        return _redis_client
+    except Exception as e:
+        logger.warning("[REDIS] Redis unavailable: %s, retrying in %ds", e, REDIS_RETRY_SECONDS)
+        _redis_retry_at = time.monotonic() + REDIS_RETRY_SECONDS
+        return None
@@ -5,7 +5,8 @@
 from __future__ import annotations
 
 import contextvars
-import uuid
+from os import urandom
+from time import time as _time
 from typing import Optional
 
 # 使用 contextvars 存储 trace_id（协程安全）
@@ -31,16 +32,17 @@ def set_trace_id(trace_id: Optional[str]) -> None:
     Args:
         trace_id: 追踪ID，如果为 None 则清除
     """
-    if trace_id:
-        _trace_id_var.set(trace_id)
-    else:
-        # contextvars 不支持直接删除，设置为 None
-        _trace_id_var.set(None)
+    # contextvars 不支持直接删除，清除时设置为 None
+    value = trace_id or None
+    # 值未变化时跳过写入（每次 set 都会分配 Token 并修改上下文）
+    if _trace_id_var.get() != value:
+        _trace_id_var.set(value)
 
 
 def clear_trace_id() -> None:
     """清除当前上下文的 trace_id。"""
-    _trace_id_var.set(None)
+    if _trace_id_var.get() is not None:
+        _trace_id_var.set(None)
 
 
 def generate_trace_id() -> str:
@@ -48,10 +50,7 @@ def generate_trace_id() -> str:
     生成新的 trace_id。
     
     Returns:
-        格式：uuid4 hex 前16位 + 时间戳后6位
+        格式：16位随机 hex（64 bit）+ 时间戳后6位
     """
-    import time
-    uuid_part = uuid.uuid4().hex[:16]
-    timestamp_part = str(int(time.time()))[-6:]
-    return f"{uuid_part}{timestamp_part}"
+    return urandom(8).hex() + str(int(_time()))[-6:]
 
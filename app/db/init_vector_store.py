@@ -2,13 +2,19 @@
 from __future__ import annotations
 
 import logging
+import re
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import Any, NamedTuple, Optional
 
 # Add parent directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 
-from app.core.database import SessionLocal
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import get_settings
 from app.models.product import Product
 from app.services.vector_store import VectorStore
 from app.utils.chunk_utils import chunk_text
@@ -19,6 +25,51 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# 一次性初始化脚本只占用一个连接：不复用 API 服务的连接池配置，也不做 pre-ping
+SessionLocal = sessionmaker(
+    autocommit=False,
+    autoflush=False,
+    bind=create_engine(
+        get_settings().database_url,
+        pool_pre_ping=False,
+        pool_size=1,
+        max_overflow=0,
+    ),
+)
+
+# 从数据库流式读取商品的批大小
+PRODUCT_BATCH_SIZE = 1000
+# 商品数达到该值时使用多进程转换自然语言描述（进程池启动有固定开销）
+PARALLEL_MIN_PRODUCTS = 5000
+# 每个子进程任务处理的商品数
+PARALLEL_CHUNKSIZE = 256
+
+# 商品类型关键词（按优先级排列，名称中同时出现多个时取靠前的）
+_TYPE_KEYWORDS = (
+    "运动鞋", "跑鞋", "高跟鞋", "平底鞋", "靴子", "短靴", "长靴", "凉鞋",
+    "单鞋", "帆布鞋", "板鞋", "休闲鞋", "皮鞋", "牛津鞋", "切尔西靴",
+    "马丁靴", "芭蕾舞鞋", "玛丽珍鞋",
+)
+_TYPE_KEYWORD_PRIORITY = {keyword: i for i, keyword in enumerate(_TYPE_KEYWORDS)}
+# 前瞻匹配：单次扫描名称即可找出所有（包括重叠的）类型关键词
+_TYPE_KEYWORD_PATTERN = re.compile(
+    "(?=(" + "|".join(map(re.escape, _TYPE_KEYWORDS)) + "))"
+)
+
+# 写入描述的商品标签（其余标签忽略）
+_ALLOWED_TAGS = frozenset({"舒适", "时尚", "轻便", "透气", "百搭", "复古", "优雅", "甜美"})
+
+
+class ProductFields(NamedTuple):
+    """转换自然语言描述所需的商品字段（纯数据，可跨进程传递）。"""
+    
+    sku: str
+    name: str
+    attributes: Optional[Any]
+    tags: Optional[Any]
+    description: Optional[str]
+    price: Optional[Any]
+
 
 def load_products_from_db() -> list[dict]:
     """
@@ -27,28 +78,38 @@ def load_products_from_db() -> list[dict]:
     Returns:
         List of product data dictionaries
     """
-    db = SessionLocal()
-    try:
-        products = db.query(Product).all()
-        logger.info(f"[INIT] Loaded {len(products)} products from database")
-        
-        product_data = []
-        for product in products:
-            # Convert structured product data to natural language description
-            natural_text = _product_to_natural_language(product)
-            
-            if natural_text:
-                product_data.append({
-                    "sku": product.sku,
-                    "name": product.name,
-                    "text": natural_text,
-                })
-        
-        logger.info(f"[INIT] Prepared {len(product_data)} product texts")
-        return product_data
+    with SessionLocal() as db:
+        # 分批流式读取（服务端游标），只保留转换所需的字段
+        rows = [
+            ProductFields(
+                sku=product.sku,
+                name=product.name,
+                attributes=product.attributes,
+                tags=product.tags,
+                description=product.description,
+                price=product.price,
+            )
+            for product in db.query(Product).yield_per(PRODUCT_BATCH_SIZE)
+        ]
+    
+    logger.info(f"[INIT] Loaded {len(rows)} products from database")
+    
+    # Convert structured product data to natural language description
+    # 商品较多时用多进程并行转换（纯 CPU 字符串处理）
+    if len(rows) >= PARALLEL_MIN_PRODUCTS:
+        with ProcessPoolExecutor() as pool:
+            texts = list(pool.map(_product_to_natural_language, rows, chunksize=PARALLEL_CHUNKSIZE))
+    else:
+        texts = [_product_to_natural_language(row) for row in rows]
     
-    finally:
-        db.close()
+    product_data = [
+        {"sku": row.sku, "name": row.name, "text": natural_text}
+        for row, natural_text in zip(rows, texts)
+        if natural_text
+    ]
+    
+    logger.info(f"[INIT] Prepared {len(product_data)} product texts")
+    return product_data
 
 
 def _product_to_natural_language(product) -> str:
@@ -66,21 +127,19 @@ def _product_to_natural_language(product) -> str:
     if product.name:
         parts.append(product.name)
     
+    # 属性只读取一次（ORM 属性访问有额外开销）
+    attributes = product.attributes
+    attrs = attributes if isinstance(attributes, dict) else {}
+    
     # 颜色信息（从attributes中提取）
-    color = None
-    if product.attributes and isinstance(product.attributes, dict):
-        color = product.attributes.get("color")
+    color = attrs.get("color")
     
     # 商品类型（从名称中提取，或从tags中推断）
     product_type = None
-    type_keywords = ["运动鞋", "跑鞋", "高跟鞋", "平底鞋", "靴子", "短靴", "长靴", "凉鞋", 
-                     "单鞋", "帆布鞋", "板鞋", "休闲鞋", "皮鞋", "牛津鞋", "切尔西靴", 
-                     "马丁靴", "芭蕾舞鞋", "玛丽珍鞋"]
     if product.name:
-        for keyword in type_keywords:
-            if keyword in product.name:
-                product_type = keyword
-                break
+        matched_types = _TYPE_KEYWORD_PATTERN.findall(product.name)
+        if matched_types:
+            product_type = min(matched_types, key=_TYPE_KEYWORD_PRIORITY.__getitem__)
     
     # 构建自然语言描述
     description_parts = []
@@ -101,51 +160,23 @@ def _product_to_natural_language(product) -> str:
     # 重要：始终包含完整商品名称，确保关键词匹配能工作
     # 即使已经用类型描述了，也要包含完整名称（因为名称可能包含更多信息，如"运动鞋女2024新款"）
     if product.name:
-        # 检查名称是否已经包含在描述中
-        name_already_included = False
-        for part in description_parts:
-            if product.name in part:
-                name_already_included = True
-                break
-        
-        # 如果名称还没有包含，添加它
-        if not name_already_included:
+        # 检查名称是否已经包含在描述中，如果还没有包含，添加它
+        if not any(product.name in part for part in description_parts):
             description_parts.append(f"商品名称：{product.name}")
     
     # 标签特征
     if product.tags:
         tags_list = product.tags if isinstance(product.tags, list) else [product.tags]
-        tag_descriptions = []
-        for tag in tags_list:
-            if tag == "舒适":
-                tag_descriptions.append("舒适")
-            elif tag == "时尚":
-                tag_descriptions.append("时尚")
-            elif tag == "轻便":
-                tag_descriptions.append("轻便")
-            elif tag == "透气":
-                tag_descriptions.append("透气")
-            elif tag == "百搭":
-                tag_descriptions.append("百搭")
-            elif tag == "复古":
-                tag_descriptions.append("复古")
-            elif tag == "优雅":
-                tag_descriptions.append("优雅")
-            elif tag == "甜美":
-                tag_descriptions.append("甜美")
+        tag_descriptions = [tag for tag in tags_list if tag in _ALLOWED_TAGS]
         
         if tag_descriptions:
             description_parts.append(f"具有{'、'.join(tag_descriptions)}的特点")
     
     # 适用场景
-    scene = None
-    if product.attributes and isinstance(product.attributes, dict):
-        scene = product.attributes.get("scene")
+    scene = attrs.get("scene")
     
     # 适用季节
-    season = None
-    if product.attributes and isinstance(product.attributes, dict):
-        season = product.attributes.get("season")
+    season = attrs.get("season")
     
     if scene and season:
         description_parts.append(f"适合{season}{scene}穿着")
@@ -155,9 +186,7 @@ def _product_to_natural_language(product) -> str:
         description_parts.append(f"适合{season}穿着")
     
     # 材质
-    material = None
-    if product.attributes and isinstance(product.attributes, dict):
-        material = product.attributes.get("material")
+    material = attrs.get("material")
     
     if material:
         description_parts.append(f"材质为{material}")
@@ -170,14 +199,9 @@ def _product_to_natural_language(product) -> str:
     if product.price:
         description_parts.append(f"价格为{product.price}元")
     
-    # 组合成自然语言文本
-    natural_text = "，".join(description_parts) + "。"
-    
-    # 在末尾添加SKU（用于索引，但不影响主要语义）
-    if product.sku:
-        natural_text += f"商品编号：{product.sku}。"
-    
-    return natural_text
+    # 组合成自然语言文本，在末尾添加SKU（用于索引，但不影响主要语义）
+    suffix = f"。商品编号：{product.sku}。" if product.sku else "。"
+    return "，".join(description_parts) + suffix
 
 
 def chunk_product_texts(product_data: list[dict], chunk_size: int = 300, overlap: int = 50) -> list[str]:
@@ -197,37 +221,40 @@ def chunk_product_texts(product_data: list[dict], chunk_size: int = 300, overlap
     Returns:
         List of text chunks
     """
-    all_chunks = []
+    # 绝大多数商品只产生一个chunk：按商品数预分配并按下标填充，避免逐个 append 扩容；
+    # 少数长文本商品先在对应位置放入chunk列表，最后按原顺序展开
+    all_chunks: list = [None] * len(product_data)
+    has_long_text = False
     
-    for product in product_data:
+    for i, product in enumerate(product_data):
         text = product["text"]
         sku = product.get("sku", "")
+        # 在末尾添加SKU标识（用于后续精确匹配），每个商品只构造一次
+        sku_suffix = f" [SKU:{sku}]" if sku else ""
         
         # 对于商品这种结构化数据，优先保持每个商品为一个完整chunk
         # 因为自然语言描述通常不会太长，且保持完整性有利于语义理解
         if len(text) <= chunk_size:
             # 文本较短，直接作为一个chunk
-            # 在末尾添加SKU标识（用于后续精确匹配）
-            if sku:
-                chunk_with_sku = f"{text} [SKU:{sku}]"
-            else:
-                chunk_with_sku = text
-            all_chunks.append(chunk_with_sku)
+            all_chunks[i] = text + sku_suffix
         else:
             # 文本较长，需要分块（这种情况应该很少）
             # 但确保每个chunk都包含SKU标识
             chunks = chunk_text(text, chunk_size=chunk_size - 50, overlap=overlap)  # 预留50字符给SKU标识
-            
-            for chunk in chunks:
-                if sku:
-                    chunk_with_sku = f"{chunk} [SKU:{sku}]"
-                else:
-                    chunk_with_sku = chunk
-                all_chunks.append(chunk_with_sku)
+            all_chunks[i] = [chunk + sku_suffix for chunk in chunks]
+            has_long_text = True
+    
+    if has_long_text:
+        all_chunks = [
+            chunk
+            for item in all_chunks
+            for chunk in (item if isinstance(item, list) else (item,))
+        ]
     
+    chunks_per_product = len(all_chunks) / len(product_data) if product_data else 0.0
     logger.info(
         f"[INIT] Processed {len(product_data)} products into {len(all_chunks)} chunks "
-        f"(平均每个商品 {len(all_chunks)/len(product_data):.1f} 个chunks)"
+        f"(平均每个商品 {chunks_per_product:.1f} 个chunks)"
     )
     
     return all_chunks
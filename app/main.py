@@ -1,6 +1,12 @@
 """FastAPI application entry point."""
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 
 from app.api.v1 import (
     agent_sales_flow as agent_sales_flow_router,
@@ -16,14 +22,54 @@ from app.api.v1 import (
 )
 from app.api.v1.router import router as v1_router
 from app.core.config import get_settings
+from app.core.database import SessionLocal
 from app.core.logging_config import init_logging
 from app.core.middleware import TraceIdMiddleware
+from app.repositories.product_repository import warm_products_schema
+from app.repositories.vision_feature_cache_repository import wait_for_pending_writes
+from app.services.vector_store import configure_faiss_threads
 
 # Initialize logging system (must be called before creating FastAPI app)
 init_logging()
 
+logger = logging.getLogger(__name__)
+
 settings = get_settings()
+# 探活接口直接返回启动时读取的常量，不在每次请求时访问配置对象
+_APP_NAME = settings.app_name
+_APP_VERSION = settings.app_version
+
+
+def _warm_products_schema() -> None:
+    with SessionLocal() as db:
+        warm_products_schema(db)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """应用启动 / 关闭钩子。"""
+    # 记录当前事件循环实现，便于确认 uvloop 是否生效
+    loop = asyncio.get_running_loop()
+    logger.info("[STARTUP] Event loop: %s.%s", type(loop).__module__, type(loop).__name__)
+
+    # 按配置设置 FAISS OpenMP 线程数（只在启动时设置一次）
+    configure_faiss_threads(settings.faiss_omp_threads)
+
+    # 预热 products 表结构缓存，请求路径上的可选字段检查不再访问数据库
+    try:
+        await asyncio.to_thread(_warm_products_schema)
+    except Exception as e:
+        # 数据库暂不可用时不阻止启动，首次使用时再反射
+        logger.warning("[STARTUP] Products schema warm-up failed: %s", e)
+
+    yield
+
+    # 等待视觉特征缓存的后台 MySQL 写入完成
+    await asyncio.to_thread(wait_for_pending_writes, 10)
+
+
 app = FastAPI(
+    lifespan=lifespan,
     title=settings.app_name,
     version=settings.app_version,
     description="""
@@ -96,39 +142,42 @@ app.add_middleware(
         "http://localhost:3000",
     ],
     allow_credentials=True,
-    allow_methods=["*"],
+    allow_methods=["GET", "POST"],  # 只开放实际使用的方法，预检请求按固定列表校验
     allow_headers=["*"],
 )
 
 # Add Trace ID middleware (after CORS, before routers)
 app.add_middleware(TraceIdMiddleware)
 
-# Include routers
-app.include_router(v1_router)
-app.include_router(copy_router.router)
-app.include_router(product_router.router)
-app.include_router(product_vision_router.router)  # V6.0.0: 拍照识图API
-app.include_router(similar_skus_router.router)  # V6.0.0: 相似SKU检索API
-app.include_router(vector_search_router.router)  # V2: 向量搜索API
-app.include_router(rag_debug_router.router)  # V2: RAG 调试端点（仅 DEBUG 模式）
-app.include_router(intent_router.router)  # V3: 意图分析API
-app.include_router(followup_router.router)  # V3: 跟进建议API
-app.include_router(sales_graph_router.router)  # V4: 销售流程图API
-app.include_router(agent_sales_flow_router.router)  # V4: AI智能销售Agent API（最终产物）
-
-
-@app.get("/health")
+# Include routers（每个路由只注册一次；Starlette 按顺序逐个匹配路由）
+for router in (
+    v1_router,
+    copy_router.router,
+    product_router.router,
+    product_vision_router.router,  # V6.0.0: 拍照识图API
+    similar_skus_router.router,  # V6.0.0: 相似SKU检索API
+    vector_search_router.router,  # V2: 向量搜索API
+    rag_debug_router.router,  # V2: RAG 调试端点（仅 DEBUG 模式）
+    intent_router.router,  # V3: 意图分析API
+    followup_router.router,  # V3: 跟进建议API
+    sales_graph_router.router,  # V4: 销售流程图API
+    agent_sales_flow_router.router,  # V4: AI智能销售Agent API（最终产物）
+):
+    app.include_router(router)
+
+
+@app.get("/health", response_class=ORJSONResponse)
 async def health_check() -> dict[str, str]:
     """Health check endpoint."""
-    return {"status": "ok", "version": settings.app_version}
+    return {"status": "ok", "version": _APP_VERSION}
 
 
-@app.get("/")
+@app.get("/", response_class=ORJSONResponse)
 async def root() -> dict[str, str]:
     """Root endpoint."""
     return {
-        "name": settings.app_name,
-        "version": settings.app_version,
+        "name": _APP_NAME,
+        "version": _APP_VERSION,
         "status": "running",
     }
 
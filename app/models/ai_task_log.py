@@ -2,8 +2,9 @@
 from __future__ import annotations
 
 from datetime import datetime
+from typing import Any
 
-from sqlalchemy import Boolean, DateTime, Index, Integer, String, Text, func
+from sqlalchemy import JSON, Boolean, DateTime, Index, Integer, String, func
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.core.database import Base
@@ -29,13 +30,13 @@ class AITaskLog(Base):
         nullable=False,
         comment="场景类型：copy-文案生成, product_analyze-商品分析, intent-意图分析",
     )
-    input_data: Mapped[str] = mapped_column(
-        Text,
+    input_data: Mapped[dict[str, Any]] = mapped_column(
+        JSON,
         nullable=False,
         comment="输入数据（JSON格式）",
     )
-    output_result: Mapped[str | None] = mapped_column(
-        Text,
+    output_result: Mapped[dict[str, Any] | None] = mapped_column(
+        JSON,
         nullable=True,
         comment="输出结果（JSON格式）",
     )
@@ -68,6 +69,11 @@ class AITaskLog(Base):
             "scene_type",
             "created_at",
         ),
+        Index(
+            "idx_ai_log_guide_time",
+            "guide_id",
+            "created_at",
+        ),
         {"comment": "AI调用任务日志表"},
     )
 
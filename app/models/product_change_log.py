@@ -4,7 +4,7 @@ from __future__ import annotations
 from datetime import datetime
 from enum import Enum
 
-from sqlalchemy import DateTime, Integer, String, Text, UniqueConstraint, func
+from sqlalchemy import DateTime, Index, Integer, String, Text, UniqueConstraint, func
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.core.database import Base
@@ -94,6 +94,8 @@ class ProductChangeLog(Base):
         UniqueConstraint(
             "brand_code", "sku", "data_version", name="uq_change_log_brand_sku_version"
         ),
+        # fetch_pending_changes: WHERE status = ? AND id > ? ORDER BY id LIMIT ?
+        Index("idx_pcl_status_id", "status", "id"),
         {"comment": "商品变更日志表，记录数据版本变更"},
     )
 
@@ -53,12 +53,6 @@ class UserBehaviorLog(Base):
     )
 
     __table_args__ = (
-        Index(
-            "idx_ubl_user_sku",
-            "user_id",
-            "sku",
-            "occurred_at",
-        ),
         Index(
             "idx_ubl_event_time",
             "event_type",
@@ -73,3 +67,12 @@ class UserBehaviorLog(Base):
             f"event_type='{self.event_type}', sku='{self.sku}')>"
         )
 
+
+# 用户-商品-时间复合索引：occurred_at 降序，与 get_recent_behavior 的
+# ORDER BY occurred_at DESC LIMIT N 一致（MySQL 8 原生降序索引，正向扫描）
+Index(
+    "idx_ubl_user_sku",
+    UserBehaviorLog.user_id,
+    UserBehaviorLog.sku,
+    UserBehaviorLog.occurred_at.desc(),
+)
@@ -1,11 +1,14 @@
 """User behavior repository for database access."""
 from __future__ import annotations
 
+import asyncio
 import logging
-from typing import List
+from collections import Counter
+from operator import attrgetter
+from typing import Dict, List
 
-from sqlalchemy import desc
-from sqlalchemy.orm import Session
+from sqlalchemy import desc, func, select
+from sqlalchemy.orm import Session, aliased
 
 from app.models.user_behavior_log import UserBehaviorLog
 
@@ -34,54 +37,32 @@ async def get_recent_behavior(
     Raises:
         Exception: Re-raises any database exceptions for caller to handle
     """
-    logger.info(
-        f"[BEHAVIOR_REPOSITORY] Querying recent behavior: user_id={user_id}, "
-        f"sku={sku}, limit={limit}"
+    logger.debug(
+        "[BEHAVIOR_REPOSITORY] Querying recent behavior: user_id=%s, sku=%s, limit=%s",
+        user_id,
+        sku,
+        limit,
     )
     
     try:
-        # Query user_behavior_logs table
-        # Filter by user_id and sku
-        # Sort by occurred_at DESC (newest first)
-        # Limit to latest `limit` logs
-        logs = (
-            db.query(UserBehaviorLog)
-            .filter(
-                UserBehaviorLog.user_id == user_id,
-                UserBehaviorLog.sku == sku,
-            )
-            .order_by(desc(UserBehaviorLog.occurred_at))
-            .limit(limit)
-            .all()
+        # 同步 Session 的查询在线程池中执行，避免数据库 I/O 阻塞事件循环
+        logs = await asyncio.to_thread(_query_recent_behavior, db, user_id, sku, limit)
+        
+        logger.debug(
+            "[BEHAVIOR_REPOSITORY] Found %d behavior logs (user_id=%s, sku=%s)",
+            len(logs),
+            user_id,
+            sku,
         )
         
-        if logs:
-            logger.info(
-                f"[BEHAVIOR_REPOSITORY] ✓ Found {len(logs)} behavior logs "
-                f"(user_id={user_id}, sku={sku})"
-            )
-            
-            # Log summary of event types
-            event_counts = {}
-            for log in logs:
-                event_type = log.event_type
-                event_counts[event_type] = event_counts.get(event_type, 0) + 1
-            
+        # 事件分布和时间范围仅用于调试，未开启 DEBUG 时跳过统计
+        if logs and logger.isEnabledFor(logging.DEBUG):
+            event_counts = Counter(map(attrgetter("event_type"), logs))
             logger.debug(
-                f"[BEHAVIOR_REPOSITORY] Event type distribution: {event_counts}"
-            )
-            
-            # Log time range
-            if len(logs) > 0:
-                oldest = logs[-1].occurred_at
-                newest = logs[0].occurred_at
-                logger.debug(
-                    f"[BEHAVIOR_REPOSITORY] Time range: {oldest} to {newest}"
-                )
-        else:
-            logger.info(
-                f"[BEHAVIOR_REPOSITORY] No behavior logs found "
-                f"(user_id={user_id}, sku={sku})"
+                "[BEHAVIOR_REPOSITORY] Event type distribution: %s, time range: %s to %s",
+                event_counts,
+                logs[-1].occurred_at,
+                logs[0].occurred_at,
             )
         
         return logs
@@ -94,3 +75,117 @@ async def get_recent_behavior(
         # Re-raise exception for caller to handle
         raise
 
+
+def _query_recent_behavior(
+    db: Session,
+    user_id: str,
+    sku: str,
+    limit: int,
+) -> List[UserBehaviorLog]:
+    """同步查询用户对某商品的最近行为日志（供 get_recent_behavior 在线程池中调用）。"""
+    # Query user_behavior_logs table
+    # Filter by user_id and sku
+    # Sort by occurred_at DESC (newest first)
+    # Limit to latest `limit` logs
+    stmt = (
+        select(UserBehaviorLog)
+        .where(
+            UserBehaviorLog.user_id == user_id,
+            UserBehaviorLog.sku == sku,
+        )
+        .order_by(desc(UserBehaviorLog.occurred_at))
+        .limit(limit)
+    )
+    return list(db.execute(stmt).scalars().all())
+
+
+async def get_recent_behavior_bulk(
+    db: Session,
+    user_id: str,
+    skus: List[str],
+    per_sku_limit: int = 50,
+) -> Dict[str, List[UserBehaviorLog]]:
+    """
+    Get recent behavior logs for one user across many products in a single query.
+    
+    Replaces one get_recent_behavior call per SKU: a ROW_NUMBER() window
+    (MySQL 8.0+) keeps the newest `per_sku_limit` logs of each SKU.
+    
+    Args:
+        db: Database session
+        user_id: User ID to filter by
+        skus: Product SKUs to fetch logs for
+        per_sku_limit: Maximum number of logs per SKU (default: 50)
+        
+    Returns:
+        Dict mapping every requested SKU to its logs, ordered by occurred_at DESC
+        (empty list when the SKU has no logs)
+        
+    Raises:
+        Exception: Re-raises any database exceptions for caller to handle
+    """
+    result: Dict[str, List[UserBehaviorLog]] = {sku: [] for sku in skus}
+    if not result:
+        return result
+    
+    logger.debug(
+        "[BEHAVIOR_REPOSITORY] Querying recent behavior in bulk: user_id=%s, skus=%d, per_sku_limit=%s",
+        user_id,
+        len(result),
+        per_sku_limit,
+    )
+    
+    try:
+        logs = await asyncio.to_thread(
+            _query_recent_behavior_bulk, db, user_id, list(result), per_sku_limit
+        )
+    except Exception as e:
+        logger.error(
+            f"[BEHAVIOR_REPOSITORY] ✗ Error querying behavior logs in bulk: {e}",
+            exc_info=True,
+        )
+        raise
+    
+    for log in logs:
+        result[log.sku].append(log)
+    
+    logger.debug(
+        "[BEHAVIOR_REPOSITORY] Found %d behavior logs for %d SKUs (user_id=%s)",
+        len(logs),
+        len(result),
+        user_id,
+    )
+    return result
+
+
+def _query_recent_behavior_bulk(
+    db: Session,
+    user_id: str,
+    skus: List[str],
+    per_sku_limit: int,
+) -> List[UserBehaviorLog]:
+    """同步查询用户对多个商品的最近行为日志（供 get_recent_behavior_bulk 在线程池中调用）。"""
+    # sku IN (...) 使用 expanding 绑定参数，每个 sku 分区内按 occurred_at DESC 编号
+    ranked = (
+        select(
+            UserBehaviorLog,
+            func.row_number()
+            .over(
+                partition_by=UserBehaviorLog.sku,
+                order_by=desc(UserBehaviorLog.occurred_at),
+            )
+            .label("rn"),
+        )
+        .where(
+            UserBehaviorLog.user_id == user_id,
+            UserBehaviorLog.sku.in_(skus),
+        )
+        .subquery()
+    )
+    ranked_log = aliased(UserBehaviorLog, ranked)
+    stmt = (
+        select(ranked_log)
+        .where(ranked.c.rn <= per_sku_limit)
+        .order_by(ranked.c.sku, desc(ranked.c.occurred_at))
+    )
+    return list(db.execute(stmt).scalars().all())
@@ -0,0 +1,116 @@
+"""Redis read-through cache for candidate product lookups.
+
+多进程部署下进程内缓存无法共享，候选商品列表缓存到 Redis：
+- candidates:{brand_code}:{category}:{limit}:{on_sale}  候选商品列表（行列表）
+- candidates:{brand_code}:keys                       该品牌候选缓存 key 的集合（按品牌失效用）
+- brand_version:{brand_code}                         品牌商品版本号（各进程的结果缓存 key 包含该值）
+
+未配置 redis_url、未安装 redis 或 Redis 不可用时所有操作静默降级为未命中，
+调用方照常查询数据库。变更日志处理（向量同步）在提交后按品牌失效。
+"""
+from __future__ import annotations
+
+import logging
+from typing import Any, Iterable, Optional
+
+import orjson
+
+from app.core.redis_client import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+# 缓存 TTL（秒）
+PRODUCT_REDIS_TTL_SECONDS = 300
+
+
+def _candidates_tag_key(brand_code: str) -> str:
+    return f"candidates:{brand_code}:keys"
+
+
+def _brand_version_key(brand_code: str) -> str:
+    return f"brand_version:{brand_code}"
+
+
+def _candidates_key(
+    brand_code: str, category: Optional[str], limit: int, check_on_sale: bool
+) -> str:
+    return f"candidates:{brand_code}:{category or ''}:{limit}:{int(check_on_sale)}"
+
+
+def get_cached_candidates(
+    brand_code: str, category: Optional[str], limit: int, check_on_sale: bool
+) -> Optional[list[list[Any]]]:
+    """读取缓存的候选商品行列表，未命中返回 None。"""
+    client = get_redis_client()
+    if client is None:
+        return None
+    try:
+        payload = client.get(_candidates_key(brand_code, category, limit, check_on_sale))
+    except Exception as e:
+        logger.warning(f"[PRODUCT_CACHE] Redis read failed: {e}")
+        return None
+    return orjson.loads(payload) if payload is not None else None
+
+
+def set_cached_candidates(
+    brand_code: str,
+    category: Optional[str],
+    limit: int,
+    check_on_sale: bool,
+    rows: Iterable[Iterable[Any]],
+) -> None:
+    """缓存候选商品行列表，并把 key 记入品牌的 tag 集合。"""
+    client = get_redis_client()
+    if client is None:
+        return
+    key = _candidates_key(brand_code, category, limit, check_on_sale)
+    tag_key = _candidates_tag_key(brand_code)
+    try:
+        pipe = client.pipeline()
+        payload = orjson.dumps([list(row) for row in rows], default=str)
+        pipe.setex(key, PRODUCT_REDIS_TTL_SECONDS, payload)
+        pipe.sadd(tag_key, key)
+        pipe.expire(tag_key, PRODUCT_REDIS_TTL_SECONDS)
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"[PRODUCT_CACHE] Redis write failed: {e}")
+
+
+def invalidate_cached_candidates(brand_codes: Iterable[str]) -> None:
+    """删除品牌下所有候选商品缓存（通过 tag 集合定位 key，不做 KEYS/SCAN）。"""
+    client = get_redis_client()
+    if client is None:
+        return
+    try:
+        for brand_code in set(brand_codes):
+            tag_key = _candidates_tag_key(brand_code)
+            client.delete(*client.smembers(tag_key), tag_key)
+    except Exception as e:
+        logger.warning(f"[PRODUCT_CACHE] Redis invalidation failed: {e}")
+
+
+def get_brand_version(brand_code: str) -> int:
+    """读取品牌商品版本号（未设置或 Redis 不可用时返回 0）。"""
+    client = get_redis_client()
+    if client is None:
+        return 0
+    try:
+        version = client.get(_brand_version_key(brand_code))
+    except Exception as e:
+        logger.warning(f"[PRODUCT_CACHE] Redis read failed: {e}")
+        return 0
+    return int(version) if version is not None else 0
+
+
+def bump_brand_versions(brand_codes: Iterable[str]) -> None:
+    """递增品牌商品版本号，使所有进程中以旧版本号缓存的结果失效（须在变更提交后调用）。"""
+    client = get_redis_client()
+    if client is None:
+        return
+    try:
+        pipe = client.pipeline()
+        for brand_code in set(brand_codes):
+            pipe.incr(_brand_version_key(brand_code))
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"[PRODUCT_CACHE] Redis invalidation failed: {e}")
@@ -2,15 +2,18 @@
 from __future__ import annotations
 
 import logging
-from typing import Optional
+from typing import Iterator, Optional
 
-from sqlalchemy import text
+from sqlalchemy import Select, select, text
 from sqlalchemy.orm import Session
 
 from app.models.product_change_log import ChangeStatus, ProductChangeLog
 
 logger = logging.getLogger(__name__)
 
+# 流式读取待处理变更日志时每次从游标取回的行数
+PENDING_CHANGES_YIELD_PER = 500
+
 
 class ProductChangeLogRepository:
     """Repository for querying product change log records."""
@@ -33,6 +36,9 @@ class ProductChangeLogRepository:
         Uses cursor pagination (id > last_id) instead of offset to avoid
         performance issues with deep pagination.
         
+        Callers that commit while processing the batch (e.g. the vector sync
+        worker) need the materialized list; use iter_pending_changes to stream.
+        
         Args:
             limit: Maximum number of records to fetch
             last_id: Last processed ID (cursor for pagination)
@@ -40,20 +46,10 @@ class ProductChangeLogRepository:
         Returns:
             List of ProductChangeLog records with status='PENDING'
         """
-        query = (
-            self.db.query(ProductChangeLog)
-            .filter(ProductChangeLog.status == ChangeStatus.PENDING.value)
+        records = list(
+            self.db.execute(self._pending_changes_stmt(limit, last_id)).scalars()
         )
         
-        # Cursor pagination: WHERE id > last_id
-        if last_id is not None:
-            query = query.filter(ProductChangeLog.id > last_id)
-        
-        # Order by id ASC for consistent pagination
-        query = query.order_by(ProductChangeLog.id.asc()).limit(limit)
-        
-        records = query.all()
-        
         logger.info(
             f"[CHANGE_LOG_REPO] Fetched {len(records)} pending changes "
             f"(last_id={last_id}, limit={limit})"
@@ -61,6 +57,50 @@ class ProductChangeLogRepository:
         
         return records
 
+    def iter_pending_changes(
+        self,
+        limit: int = 1000,
+        last_id: Optional[int] = None,
+        yield_per: int = PENDING_CHANGES_YIELD_PER,
+    ) -> Iterator[ProductChangeLog]:
+        """
+        Stream pending change log records using cursor pagination.
+        
+        Same filter and order as fetch_pending_changes, but rows are pulled
+        from a server-side cursor `yield_per` at a time instead of being
+        materialized into a list.
+        
+        The session's connection is busy until the iterator is exhausted or
+        closed: do not commit or run other queries on this session while
+        consuming it.
+        
+        Args:
+            limit: Maximum number of records to fetch
+            last_id: Last processed ID (cursor for pagination)
+            yield_per: Rows fetched from the cursor per round trip
+            
+        Yields:
+            ProductChangeLog records with status='PENDING', ordered by id ASC
+        """
+        stmt = self._pending_changes_stmt(limit, last_id).execution_options(
+            yield_per=yield_per
+        )
+        yield from self.db.execute(stmt).scalars()
+
+    @staticmethod
+    def _pending_changes_stmt(limit: int, last_id: Optional[int]) -> Select:
+        """Build SELECT for pending changes: status = PENDING [AND id > last_id] ORDER BY id LIMIT."""
+        stmt = select(ProductChangeLog).where(
+            ProductChangeLog.status == ChangeStatus.PENDING.value
+        )
+        
+        # Cursor pagination: WHERE id > last_id
+        if last_id is not None:
+            stmt = stmt.where(ProductChangeLog.id > last_id)
+        
+        # Order by id ASC for consistent pagination
+        return stmt.order_by(ProductChangeLog.id.asc()).limit(limit)
+
     def get_max_id(self) -> Optional[int]:
         """
         Get the maximum ID from product_change_log table.
@@ -68,12 +108,10 @@ class ProductChangeLogRepository:
         Returns:
             Maximum ID, or None if table is empty
         """
-        result = self.db.execute(
-            text("SELECT MAX(id) as max_id FROM belle_ai.product_change_log")
-        ).first()
-        
-        if result and result.max_id is not None:
-            return int(result.max_id)
+        # 主键倒序取第一行：单行索引查找
+        max_id = self.db.execute(
+            text("SELECT id FROM belle_ai.product_change_log ORDER BY id DESC LIMIT 1")
+        ).scalar()
         
-        return None
+        return int(max_id) if max_id is not None else None
 
@@ -2,15 +2,46 @@
 from __future__ import annotations
 
 import logging
-from typing import Any, List, Optional
+from datetime import datetime
+from typing import Any, Iterable, List, NamedTuple, Optional
 
-from sqlalchemy import text
-from sqlalchemy.orm import Session
+import orjson
+from sqlalchemy import column, select, table, text
+from sqlalchemy.orm import Session, load_only
 
+from app.core.database import get_table_columns
 from app.models.product import Product
+from app.repositories import product_cache_repository as product_cache
 
 logger = logging.getLogger(__name__)
 
+# upsert 写入的字段（不含 id / created_at；on_sale 按表结构和数据动态追加）
+_UPSERT_FIELDS = (
+    "brand_code", "sku", "name", "price", "tags", "attributes",
+    "description", "image_url",
+)
+
+# 按 SKU 查询时加载的字段：description（Text 大字段）和时间戳延迟加载，
+# 需要描述的调用方使用 get_product_full
+_PRODUCT_LOOKUP_COLUMNS = (
+    Product.id, Product.brand_code, Product.sku, Product.name, Product.price,
+    Product.tags, Product.attributes, Product.image_url,
+)
+
+# 每个品牌物化的候选商品数（product_candidates_by_brand，见
+# sql/migrations/create_product_candidates_by_brand.sql）
+CANDIDATE_ROLLUP_SIZE = 300
+
+_candidate_rollup = table(
+    "product_candidates_by_brand",
+    column("brand_code"),
+    column("candidate_rank"),
+    column("product_id"),
+)
+
+# 批量 upsert 每条 INSERT 的行数（控制在 max_allowed_packet 和 65535 个占位符以内）
+BULK_UPSERT_CHUNK_SIZE = 500
+
 
 def get_product_by_sku(db: Session, sku: str) -> Optional[Product]:
     """
@@ -24,15 +55,21 @@ def get_product_by_sku(db: Session, sku: str) -> Optional[Product]:
         db: Database session
         sku: Product SKU identifier
         
+    Only the columns in ``_PRODUCT_LOOKUP_COLUMNS`` are loaded; ``description``
+    is deferred. Use get_product_full when the description is needed.
+    
     Returns:
         Product instance if found, None otherwise
     """
-    logger.info(f"[REPOSITORY] Querying product by SKU: {sku}")
-    product = db.query(Product).filter(Product.sku == sku).first()
-    if product:
-        logger.info(f"[REPOSITORY] ✓ Product found: id={product.id}, name={product.name}, price={product.price}, tags={product.tags}")
-    else:
-        logger.warning(f"[REPOSITORY] ✗ Product not found: sku={sku}")
+    logger.debug("[REPOSITORY] Querying product by SKU: %s", sku)
+    product = (
+        db.query(Product)
+        .options(load_only(*_PRODUCT_LOOKUP_COLUMNS))
+        .filter(Product.sku == sku)
+        .first()
+    )
+    if product is None:
+        logger.warning("[REPOSITORY] ✗ Product not found: sku=%s", sku)
     return product
 
 
@@ -47,22 +84,43 @@ def get_product_by_brand_and_sku(
         brand_code: Brand code
         sku: Product SKU identifier
         
+    Only the columns in ``_PRODUCT_LOOKUP_COLUMNS`` are loaded; ``description``
+    is deferred.
+    
     Returns:
         Product instance if found, None otherwise
     """
-    logger.info(f"[REPOSITORY] Querying product by brand_code={brand_code}, sku={sku}")
+    logger.debug(
+        "[REPOSITORY] Querying product by brand_code=%s, sku=%s", brand_code, sku
+    )
     product = (
         db.query(Product)
+        .options(load_only(*_PRODUCT_LOOKUP_COLUMNS))
         .filter(Product.brand_code == brand_code, Product.sku == sku)
         .first()
     )
-    if product:
-        logger.info(
-            f"[REPOSITORY] ✓ Product found: id={product.id}, "
-            f"brand_code={product.brand_code}, sku={product.sku}, name={product.name}"
+    if product is None:
+        logger.debug(
+            "[REPOSITORY] Product not found: brand_code=%s, sku=%s", brand_code, sku
         )
-    else:
-        logger.warning(f"[REPOSITORY] ✗ Product not found: brand_code={brand_code}, sku={sku}")
+    return product
+
+
+def get_product_full(db: Session, sku: str) -> Optional[Product]:
+    """
+    Get product by SKU with all columns loaded, including description.
+    
+    Args:
+        db: Database session
+        sku: Product SKU identifier
+        
+    Returns:
+        Product instance if found, None otherwise
+    """
+    logger.debug("[REPOSITORY] Querying full product by SKU: %s", sku)
+    product = db.query(Product).filter(Product.sku == sku).first()
+    if product is None:
+        logger.warning("[REPOSITORY] ✗ Product not found: sku=%s", sku)
     return product
 
 
@@ -76,6 +134,7 @@ def upsert_product_by_brand_and_sku(
     - Uses MySQL INSERT ... ON DUPLICATE KEY UPDATE
     - Does NOT overwrite id / created_at fields
     - Updates updated_at to current timestamp
+    - Does NOT commit: the caller owns the transaction (commit once per batch)
     
     Args:
         db: Database session
@@ -84,89 +143,243 @@ def upsert_product_by_brand_and_sku(
             - sku: str (required)
             - name: str (required)
             - price: Decimal or str (required)
-            - tags: list or None
-            - attributes: dict or None
+            - tags: list, JSON string (passed through unvalidated) or None
+            - attributes: dict, JSON string (passed through unvalidated) or None
             - description: str or None
             - image_url: str or None
             - on_sale: bool or None (if exists in model)
     
     Returns:
-        Product instance (created or updated)
+        Product instance (created or updated), built from product_data and the
+        row id reported by MySQL; not loaded from the database or attached to the session
     """
     brand_code = product_data["brand_code"]
     sku = product_data["sku"]
     
-    logger.info(f"[REPOSITORY] Upserting product: brand_code={brand_code}, sku={sku}")
+    logger.debug("[REPOSITORY] Upserting product: brand_code=%s, sku=%s", brand_code, sku)
     
     # Check if on_sale column exists in products table
-    # Query table structure to determine available columns
-    result = db.execute(text("SHOW COLUMNS FROM products"))
-    available_columns = {row.Field for row in result}
+    available_columns = _get_products_columns(db)
     
     # Use MySQL INSERT ... ON DUPLICATE KEY UPDATE (as required)
     # Build field list (exclude id, created_at from update)
-    insert_fields = [
-        "brand_code", "sku", "name", "price", "tags", "attributes",
-        "description", "image_url"
-    ]
+    insert_fields = list(_UPSERT_FIELDS)
     
     # Add on_sale only if it exists in table AND is provided in data
     if "on_sale" in product_data and "on_sale" in available_columns:
         insert_fields.append("on_sale")
     
-    # Build SQL with JSON handling
+    # id = LAST_INSERT_ID(id)：更新已有行时也能通过 lastrowid 拿到该行 id，无需回查
+    sql = _build_upsert_sql(insert_fields, num_rows=1, return_id=True)
+    
+    # Prepare values (handle JSON fields)
+    values = {
+        f"{field}_0": _prepare_upsert_value(field, product_data.get(field))
+        for field in insert_fields
+    }
+    
+    # Execute
+    result = db.execute(text(sql), values)
+    
+    row_id = result.lastrowid
+    if not row_id:
+        raise RuntimeError(f"Failed to upsert product: brand_code={brand_code}, sku={sku}")
+    
+    product = Product(
+        id=row_id,
+        **{field: product_data.get(field) for field in _UPSERT_FIELDS},
+    )
+    
+    logger.debug("[REPOSITORY] ✓ Product upserted: id=%s", product.id)
+    return product
+
+
+def upsert_products_bulk(
+    db: Session,
+    rows: Iterable[dict[str, Any]],
+    chunk_size: int = BULK_UPSERT_CHUNK_SIZE,
+) -> int:
+    """
+    Batch upsert products by (brand_code, sku) with multi-row INSERT ... ON DUPLICATE KEY UPDATE.
+    
+    每 chunk_size 行一条 INSERT 语句，所有语句在同一个事务中执行，最后只提交一次；
+    不回查商品记录。字段规则与 upsert_product_by_brand_and_sku 相同，
+    on_sale 仅在表中存在且所有行都提供时写入。
+    
+    Args:
+        db: Database session
+        rows: Product data dictionaries (same keys as upsert_product_by_brand_and_sku)
+        chunk_size: Rows per INSERT statement
+    
+    Returns:
+        Total affected row count reported by MySQL
+        (1 per inserted row, 2 per updated row, 0 per unchanged row)
+    """
+    rows = list(rows)
+    if not rows:
+        return 0
+    
+    logger.info(f"[REPOSITORY] Bulk upserting {len(rows)} products (chunk_size={chunk_size})")
+    
+    available_columns = _get_products_columns(db)
+    
+    insert_fields = list(_UPSERT_FIELDS)
+    if "on_sale" in available_columns and all("on_sale" in row for row in rows):
+        insert_fields.append("on_sale")
+    
+    affected_rows = 0
+    try:
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start:start + chunk_size]
+            values = {
+                f"{field}_{i}": _prepare_upsert_value(field, row.get(field))
+                for i, row in enumerate(chunk)
+                for field in insert_fields
+            }
+            result = db.execute(text(_build_upsert_sql(insert_fields, len(chunk))), values)
+            affected_rows += result.rowcount
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    
+    logger.info(f"[REPOSITORY] ✓ Bulk upserted {len(rows)} products (affected_rows={affected_rows})")
+    return affected_rows
+
+
+def _get_products_columns(db: Session) -> frozenset[str]:
+    """
+    获取 products 表的字段名集合（启动时预热，见 warm_products_schema；之后为内存查找）。
+    """
+    return get_table_columns(db.get_bind(), "products")
+
+
+def _has_candidate_rollup(db: Session) -> bool:
+    """
+    product_candidates_by_brand 表是否存在（同上，按数据库缓存）。
+    """
+    return bool(get_table_columns(db.get_bind(), "product_candidates_by_brand"))
+
+
+def warm_products_schema(db: Session) -> None:
+    """
+    预先反射 products 和 product_candidates_by_brand 的表结构，
+    使请求路径上的字段检查不再访问数据库（应用启动时调用）。
+    """
+    _get_products_columns(db)
+    _has_candidate_rollup(db)
+
+
+def refresh_candidate_rollup(db: Session, brand_code: str) -> int:
+    """
+    重建某品牌的候选商品物化表（product_candidates_by_brand）。
+    
+    取该品牌在售商品（表中有 on_sale 字段时）按 updated_at desc 的前
+    CANDIDATE_ROLLUP_SIZE 条，先删除旧排名再整体写入，在同一个事务中提交。
+    物化表不存在时直接返回 0。
+    
+    Args:
+        db: Database session
+        brand_code: Brand code
+    
+    Returns:
+        Number of candidate rows written
+    """
+    if not _has_candidate_rollup(db):
+        return 0
+    
+    on_sale_filter = " AND on_sale = 1" if "on_sale" in _get_products_columns(db) else ""
+    params = {"brand_code": brand_code, "limit": CANDIDATE_ROLLUP_SIZE}
+    try:
+        db.execute(
+            text("DELETE FROM product_candidates_by_brand WHERE brand_code = :brand_code"),
+            params,
+        )
+        result = db.execute(
+            text(
+                "INSERT INTO product_candidates_by_brand (brand_code, candidate_rank, product_id) "
+                "SELECT brand_code, ROW_NUMBER() OVER (ORDER BY updated_at DESC, id DESC), id "
+                f"FROM products WHERE brand_code = :brand_code{on_sale_filter} "
+                "ORDER BY updated_at DESC, id DESC LIMIT :limit"
+            ),
+            params,
+        )
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    
+    logger.debug(
+        "[REPOSITORY] Refreshed candidate rollup: brand_code=%s, rows=%d",
+        brand_code,
+        result.rowcount,
+    )
+    return result.rowcount
+
+
+def _build_upsert_sql(
+    insert_fields: List[str], num_rows: int, return_id: bool = False
+) -> str:
+    """
+    构建多行 INSERT ... ON DUPLICATE KEY UPDATE 语句。
+    
+    第 i 行的参数名为 `{field}_{i}`；更新时不覆盖 brand_code / sku（id、created_at 不在字段中）。
+    return_id=True 时追加 `id = LAST_INSERT_ID(id)`，使更新已有行时 lastrowid 也为该行 id。
+    """
     field_names = ", ".join(insert_fields)
-    placeholders = ", ".join([f":{field}" for field in insert_fields])
+    rows_sql = ", ".join(
+        "(" + ", ".join(f":{field}_{i}" for field in insert_fields) + ", NOW())"
+        for i in range(num_rows)
+    )
     
     # Update clause: update all fields except brand_code, sku (and id, created_at are auto-handled)
-    update_fields = [f for f in insert_fields if f not in ("brand_code", "sku")]
-    update_clause = ", ".join([
-        f"{field} = VALUES({field})" for field in update_fields
-    ])
+    update_clause = ", ".join(
+        f"{field} = VALUES({field})"
+        for field in insert_fields
+        if field not in ("brand_code", "sku")
+    )
     update_clause += ", updated_at = NOW()"
+    if return_id:
+        update_clause = "id = LAST_INSERT_ID(id), " + update_clause
     
-    sql = f"""
+    return f"""
     INSERT INTO products ({field_names}, updated_at)
-    VALUES ({placeholders}, NOW())
+    VALUES {rows_sql}
     ON DUPLICATE KEY UPDATE {update_clause}
     """
+
+
+def _prepare_upsert_value(field: str, value: Any) -> Any:
+    """
+    转换 upsert 参数值：tags / attributes 需以 JSON 字符串传给原生 SQL。
     
-    # Prepare values (handle JSON fields)
-    import json
-    values = {}
-    for field in insert_fields:
-        value = product_data.get(field)
-        # Convert dict/list to JSON string for MySQL JSON column
-        # MySQL JSON type accepts JSON string or native Python dict/list (SQLAlchemy handles it)
-        # For raw SQL, we need to pass as JSON string
-        if field in ("tags", "attributes") and value is not None:
-            if isinstance(value, (dict, list)):
-                # Convert to JSON string for raw SQL
-                values[field] = json.dumps(value, ensure_ascii=False)
-            elif isinstance(value, str):
-                # Already a JSON string, validate it
-                try:
-                    json.loads(value)  # Validate JSON
-                    values[field] = value
-                except json.JSONDecodeError:
-                    logger.warning(f"[REPOSITORY] Invalid JSON string for {field}: {value}")
-                    values[field] = None
-            else:
-                values[field] = value
-        else:
-            values[field] = value
-    
-    # Execute
-    db.execute(text(sql), values)
-    db.commit()
-    
-    # Fetch the product
-    product = get_product_by_brand_and_sku(db, brand_code, sku)
-    if not product:
-        raise RuntimeError(f"Failed to upsert product: brand_code={brand_code}, sku={sku}")
+    输入视为已校验：ETL 数据经 ProductNormalizer 解析为 list / dict，
+    已是 JSON 字符串的值原样透传，不再重复解析校验。
+    """
+    # MySQL JSON type accepts JSON string or native Python dict/list (SQLAlchemy handles it)
+    # For raw SQL, we need to pass as JSON string
+    if field in ("tags", "attributes") and isinstance(value, (dict, list)):
+        # Convert to JSON string for raw SQL (orjson 输出 UTF-8，中文不转义)
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS).decode()
+    return value
+
+
+class CandidateProduct(NamedTuple):
+    """候选商品只读记录（相似度检索只读取这些字段，不需要 ORM 对象）。"""
     
-    logger.info(f"[REPOSITORY] ✓ Product upserted: id={product.id}")
-    return product
+    id: int
+    brand_code: str
+    sku: str
+    name: str
+    tags: Any
+    attributes: Any
+    updated_at: Optional[datetime]
+
+
+# 候选商品查询的字段（与 CandidateProduct 字段顺序一致）
+_CANDIDATE_COLUMNS = tuple(
+    Product.__table__.c[field] for field in CandidateProduct._fields
+)
 
 
 def get_candidate_products_by_brand(
@@ -175,7 +388,8 @@ def get_candidate_products_by_brand(
     category: Optional[str] = None,
     limit: int = 300,
     check_on_sale: bool = True,
-) -> List[Product]:
+    use_cache: bool = True,
+) -> List[CandidateProduct]:
     """
     获取候选商品列表（用于相似度检索）。
     
@@ -184,7 +398,17 @@ def get_candidate_products_by_brand(
     2. 可选过滤：category 精确匹配（如果提供）
     3. on_sale 过滤：如果表中有 on_sale 字段且 check_on_sale=True
     4. 限制数量：limit（默认300，避免全表扫描）
-    5. 排序：按 updated_at desc 或 id desc
+    5. 排序：按 updated_at desc
+    
+    使用 Core select 只查询 CandidateProduct 需要的字段，跳过 ORM 对象构建
+    和 identity map（结果只读）。
+    
+    不按类目过滤、检查 on_sale 且 limit 不超过 CANDIDATE_ROLLUP_SIZE 时，
+    优先读取物化表 product_candidates_by_brand（由向量同步任务在处理变更日志后刷新）；
+    物化表不存在或该品牌尚无数据时回退到 products 表查询。
+    
+    结果按 (brand_code, category, limit, check_on_sale) 缓存到 Redis（如已配置），
+    由向量同步任务处理变更日志后按品牌失效。
     
     Args:
         db: Database session
@@ -192,68 +416,114 @@ def get_candidate_products_by_brand(
         category: Category filter (optional)
         limit: Maximum number of candidates (default 300)
         check_on_sale: Whether to filter by on_sale=1 (default True)
+        use_cache: Read through the Redis cache (default True)
     
     Returns:
-        List of Product instances
+        List of CandidateProduct records
     """
-    logger.info(
-        f"[REPOSITORY] Querying candidate products: brand_code={brand_code}, "
-        f"category={category}, limit={limit}, check_on_sale={check_on_sale}"
+    logger.debug(
+        "[REPOSITORY] Querying candidate products: brand_code=%s, category=%s, "
+        "limit=%s, check_on_sale=%s",
+        brand_code,
+        category,
+        limit,
+        check_on_sale,
     )
     
-    query = db.query(Product).filter(Product.brand_code == brand_code)
+    if use_cache:
+        rows = product_cache.get_cached_candidates(brand_code, category, limit, check_on_sale)
+        if rows is not None:
+            return [_candidate_from_cached_row(row) for row in rows]
+    
+    products = _query_candidate_products(db, brand_code, category, limit, check_on_sale)
+    
+    if use_cache:
+        product_cache.set_cached_candidates(brand_code, category, limit, check_on_sale, products)
+    return products
+
+
+def _candidate_from_cached_row(row: List[Any]) -> CandidateProduct:
+    """由 Redis 缓存的行还原 CandidateProduct（updated_at 以 ISO 字符串缓存）。"""
+    product = CandidateProduct._make(row)
+    if product.updated_at is not None:
+        product = product._replace(updated_at=datetime.fromisoformat(product.updated_at))
+    return product
+
+
+def _query_candidate_products(
+    db: Session,
+    brand_code: str,
+    category: Optional[str],
+    limit: int,
+    check_on_sale: bool,
+) -> List[CandidateProduct]:
+    """查询候选商品（规则见 get_candidate_products_by_brand）：优先物化表，否则查询 products 表。"""
+    products_table = Product.__table__
+    
+    if (
+        category is None
+        and check_on_sale
+        and limit <= CANDIDATE_ROLLUP_SIZE
+        and _has_candidate_rollup(db)
+    ):
+        rollup_stmt = (
+            select(*_CANDIDATE_COLUMNS)
+            .select_from(
+                _candidate_rollup.join(
+                    products_table, _candidate_rollup.c.product_id == products_table.c.id
+                )
+            )
+            .where(_candidate_rollup.c.brand_code == brand_code)
+            .order_by(_candidate_rollup.c.candidate_rank)
+            .limit(limit)
+        )
+        products = [CandidateProduct._make(row) for row in db.execute(rollup_stmt)]
+        if products:
+            logger.debug("[REPOSITORY] ✓ Found %d candidate products in rollup", len(products))
+            return products
+    
+    stmt = select(*_CANDIDATE_COLUMNS).where(products_table.c.brand_code == brand_code)
     
     # Category filter (if provided)
-    # Note: Product model doesn't have category column, we'll filter in Python
-    # This is handled in the service layer after fetching candidates
+    # products.category 是由 attributes 派生的生成列（见 sql/migrations/add_products_category_column.sql），
+    # 未映射到 ORM 模型；表中存在该列时在数据库侧精确过滤，否则取回后在 Python 中过滤
+    category_filtered_in_db = False
+    if category and "category" in _get_products_columns(db):
+        stmt = stmt.where(text("category = :category").bindparams(category=category))
+        category_filtered_in_db = True
+        logger.debug("[REPOSITORY] Applied category filter in database")
     
     # on_sale filter (if column exists and check_on_sale=True)
     if check_on_sale:
         try:
             # Check if on_sale column exists
-            result = db.execute(text("SHOW COLUMNS FROM products LIKE 'on_sale'"))
-            if result.fetchone():
-                query = query.filter(text("on_sale = 1"))
+            if "on_sale" in _get_products_columns(db):
+                stmt = stmt.where(text("on_sale = 1"))
                 logger.debug("[REPOSITORY] Applied on_sale=1 filter")
         except Exception as e:
-            logger.debug(f"[REPOSITORY] on_sale column check failed: {e}, skipping filter")
-    
-    # Order by updated_at desc (or id desc as fallback)
-    try:
-        query = query.order_by(Product.updated_at.desc())
-    except AttributeError:
-        query = query.order_by(Product.id.desc())
+            logger.debug("[REPOSITORY] on_sale column check failed: %s, skipping filter", e)
     
-    # Limit
-    products = query.limit(limit).all()
-    
-    # Log sample product info for debugging (after products is fetched)
-    if products:
-        sample_product = products[0]
-        logger.debug(
-            f"[REPOSITORY] Sample product: sku={sample_product.sku}, "
-            f"name={sample_product.name[:50] if sample_product.name else 'N/A'}, "
-            f"tags={sample_product.tags}, "
-            f"attributes_keys={list(sample_product.attributes.keys()) if sample_product.attributes else []}"
-        )
+    # Order by updated_at desc, limit
+    stmt = stmt.order_by(products_table.c.updated_at.desc()).limit(limit)
+    products = [CandidateProduct._make(row) for row in db.execute(stmt)]
     
     # If category filter was not applied at DB level, filter in Python
-    if category:
+    # 与生成列语义一致：COALESCE($.category, $."类目") 精确匹配
+    if category and not category_filtered_in_db:
         filtered_products = []
         for product in products:
-            # Check category from column or attributes
+            # Check category from attributes
             product_category = None
-            if hasattr(product, "category") and product.category:
-                product_category = product.category
-            elif product.attributes:
-                product_category = product.attributes.get("category") or product.attributes.get("类目")
+            if product.attributes:
+                product_category = product.attributes.get("category")
+                if product_category is None:
+                    product_category = product.attributes.get("类目")
             
-            if product_category and category in str(product_category):
+            if product_category is not None and str(product_category) == category:
                 filtered_products.append(product)
         
         products = filtered_products
-        logger.debug(f"[REPOSITORY] Filtered by category in Python: {len(products)} products")
+        logger.debug("[REPOSITORY] Filtered by category in Python: %d products", len(products))
     
-    logger.info(f"[REPOSITORY] ✓ Found {len(products)} candidate products")
+    logger.debug("[REPOSITORY] ✓ Found %d candidate products", len(products))
     return products
-
@@ -3,178 +3,385 @@ from __future__ import annotations
 
 import logging
 from datetime import datetime
-from typing import Any, Optional
+from functools import lru_cache
+from typing import Any, Iterable, Iterator, Optional
 
-from sqlalchemy import text
+from sqlalchemy import Result, TextClause, text
 from sqlalchemy.orm import Session
 
+from app.core.database import get_table_columns, invalidate_table_columns
+
 logger = logging.getLogger(__name__)
 
+# 流式读取时每次从服务端游标拉取的行数
+STAGING_YIELD_PER = 256
+
+# Required fields: style_brand_no, style_no, src_updated_at
+_REQUIRED_FIELDS = frozenset({"style_brand_no", "style_no", "src_updated_at"})
+
+# Optional fields with fallback (order matters - first match wins)
+_FIELD_MAPPING: tuple[tuple[str, tuple[str, ...]], ...] = (
+    ("name", ("commodity_name", "name", "product_name", "style_name", "prod_name", "item_name")),  # commodity_name is the actual field in products_staging
+    ("price", ("price", "sale_price", "retail_price")),
+    ("colors_concat", ("colors_concat", "colors", "color_concat")),
+    ("tags_json", ("tags_json", "tags", "tag_json")),
+    ("attrs_json", ("attrs_json", "attributes", "attrs", "attribute_json")),
+    ("description", ("description", "desc", "product_desc")),
+    ("image_url", ("image_url", "image", "img_url", "pic_url", "main_image")),
+    ("on_sale", ("on_sale", "onsale", "is_on_sale", "is_sale")),
+)
+
+
+@lru_cache(maxsize=32)
+def _resolve_field_aliases(
+    actual_columns: frozenset[str],
+) -> tuple[tuple[str, ...], Optional[dict[str, Optional[str]]]]:
+    """
+    Resolve SELECT fields and target field -> column aliases for a table schema.
+    
+    Memoized by column set, so the mapping (and its logging) runs once per
+    schema instead of once per batch. Callers must not mutate the result.
+    
+    Args:
+        actual_columns: Column names of the staging table
+        
+    Returns:
+        Tuple of (select_fields, field_aliases); field_aliases is None when
+        a required field is missing
+    """
+    if not _REQUIRED_FIELDS.issubset(actual_columns):
+        return (), None
+    
+    select_fields = ["style_brand_no", "style_no", "src_updated_at"]
+    field_aliases: dict[str, Optional[str]] = {
+        "style_brand_no": "style_brand_no",
+        "style_no": "style_no",
+        "src_updated_at": "src_updated_at",
+    }
+    
+    # Add optional fields if they exist
+    for target_field, possible_names in _FIELD_MAPPING:
+        for possible_name in possible_names:
+            if possible_name in actual_columns:
+                select_fields.append(possible_name)
+                field_aliases[target_field] = possible_name
+                logger.debug("[STAGING_REPO] Mapped %s -> %s", target_field, possible_name)
+                break
+        else:
+            logger.warning(f"[STAGING_REPO] Field {target_field} not found in table, will use None")
+            field_aliases[target_field] = None  # Mark as not found
+    
+    return tuple(select_fields), field_aliases
+
+
+@lru_cache(maxsize=32)
+def _build_batch_statement(
+    table_name: str,
+    select_fields: tuple[str, ...],
+    incremental: bool,
+    yield_per: int,
+) -> TextClause:
+    """
+    Build the streamed watermark batch query (memoized, parsed once per shape).
+    
+    Args:
+        table_name: Table name (e.g., 'products_staging')
+        select_fields: Columns to select, in record order
+        incremental: Whether to filter by the watermark (False for first run)
+        yield_per: Rows fetched from the server-side cursor per round-trip
+        
+    Returns:
+        Text statement binding :limit (and :last_at, :last_brand, :last_style
+        when incremental)
+    """
+    if incremental:
+        # Incremental: src_updated_at > last_at OR (src_updated_at = last_at AND key > last_key)
+        # 行值比较（而非 CONCAT 拼接 key）可走 (src_updated_at, style_brand_no, style_no) 索引范围扫描，
+        # 且与 ORDER BY 的排序语义一致
+        where_clause = (
+            "src_updated_at > :last_at OR "
+            "(src_updated_at = :last_at AND (style_brand_no, style_no) > (:last_brand, :last_style))"
+        )
+    else:
+        # First run: fetch all records
+        where_clause = "1=1"
+    
+    select_clause = ", ".join(select_fields)
+    sql = f"""
+    SELECT {select_clause}
+    FROM {table_name}
+    WHERE {where_clause}
+    ORDER BY src_updated_at ASC, style_brand_no ASC, style_no ASC
+    LIMIT :limit
+    """
+    return text(sql).execution_options(stream_results=True, yield_per=yield_per)
+
 
 class ProductStagingRepository:
     """Repository for querying products_staging table in batches."""
 
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, known_columns: Optional[Iterable[str]] = None):
         """
         Initialize repository.
         
         Args:
             db: Database session
+            known_columns: Pinned staging table columns (e.g. from the
+                etl_staging_columns setting); when given, the table schema is
+                never reflected
         """
         self.db = db
+        self.known_columns = frozenset(known_columns) if known_columns else None
 
-    def _get_table_columns(self, table_name: str) -> set[str]:
+    def _get_table_columns(self, table_name: str) -> frozenset[str]:
         """
         Get actual column names from table.
         
+        The schema is reflected once per database and table, then served from
+        memory for every later batch (see get_table_columns).
+        
         Args:
             table_name: Table name
             
         Returns:
             Set of column names
         """
-        sql = f"SHOW COLUMNS FROM {table_name}"
-        result = self.db.execute(text(sql))
-        return {row.Field for row in result}
+        if self.known_columns is not None:
+            return self.known_columns
+        return get_table_columns(self.db.get_bind(), table_name)
 
-    def fetch_batch_by_watermark(
+    @staticmethod
+    def invalidate_schema_cache(table_name: str) -> None:
+        """
+        Drop the cached columns of a table (call after migrating it).
+        
+        Args:
+            table_name: Table name
+        """
+        invalidate_table_columns(table_name)
+
+    def _execute_batch_query(
         self,
         table_name: str,
         last_processed_at: Optional[datetime],
         last_processed_key: Optional[str],
-        limit: int = 1000,
-    ) -> list[dict]:
+        limit: int,
+        yield_per: int,
+    ) -> tuple[Result, dict[str, Optional[str]]]:
         """
-        Fetch batch of records from products_staging using watermark.
-        
-        Supports "same-second no-miss" design:
-        - watermark: last_processed_at + last_processed_key (key = style_brand_no#style_no)
-        - Fetch condition: src_updated_at > last_at OR (src_updated_at = last_at AND key > last_key)
-        - Order by: src_updated_at, style_brand_no, style_no
+        Execute the watermark batch query as a streamed result.
         
         Args:
             table_name: Table name (e.g., 'products_staging')
             last_processed_at: Last processed timestamp (None for first run)
             last_processed_key: Last processed key (None for first run)
             limit: Batch size limit
+            yield_per: Rows fetched from the server-side cursor per round-trip
             
         Returns:
-            List of record dictionaries
+            Tuple of (result, field_aliases); result rows follow the order of
+            the mapped (non-None) entries in field_aliases
         """
         logger.info(
-            f"[STAGING_REPO] Fetching batch: table={table_name}, "
-            f"last_at={last_processed_at}, last_key={last_processed_key}, limit={limit}"
+            "[STAGING_REPO] Fetching batch: table=%s, last_at=%s, last_key=%s, limit=%d",
+            table_name,
+            last_processed_at,
+            last_processed_key,
+            limit,
         )
         
         # Get actual table columns
         actual_columns = self._get_table_columns(table_name)
-        logger.info(f"[STAGING_REPO] Actual columns in {table_name}: {sorted(actual_columns)}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("[STAGING_REPO] Actual columns in %s: %s", table_name, sorted(actual_columns))
         
-        # Build WHERE condition
-        if last_processed_at is None or last_processed_key is None:
-            # First run: fetch all records
-            where_clause = "1=1"
-            params: dict[str, Any] = {}
-        else:
-            # Incremental: src_updated_at > last_at OR (src_updated_at = last_at AND key > last_key)
-            where_clause = (
-                "src_updated_at > :last_at OR "
-                "(src_updated_at = :last_at AND CONCAT(style_brand_no, '#', style_no) > :last_key)"
-            )
-            params = {
-                "last_at": last_processed_at,
-                "last_key": last_processed_key,
-            }
-        
-        # Build SELECT fields dynamically based on actual columns
-        # Required fields: style_brand_no, style_no, src_updated_at
-        required_fields = {"style_brand_no", "style_no", "src_updated_at"}
-        if not required_fields.issubset(actual_columns):
-            missing = required_fields - actual_columns
+        select_fields, field_aliases = _resolve_field_aliases(actual_columns)
+        if field_aliases is None:
+            missing = _REQUIRED_FIELDS - actual_columns
             raise ValueError(
                 f"Missing required fields in {table_name}: {missing}. "
                 f"Available columns: {actual_columns}"
             )
         
-        # Optional fields with fallback (order matters - first match wins)
-        field_mapping = {
-            "name": ["commodity_name", "name", "product_name", "style_name", "prod_name", "item_name"],  # commodity_name is the actual field in products_staging
-            "price": ["price", "sale_price", "retail_price"],
-            "colors_concat": ["colors_concat", "colors", "color_concat"],
-            "tags_json": ["tags_json", "tags", "tag_json"],
-            "attrs_json": ["attrs_json", "attributes", "attrs", "attribute_json"],
-            "description": ["description", "desc", "product_desc"],
-            "image_url": ["image_url", "image", "img_url", "pic_url", "main_image"],
-            "on_sale": ["on_sale", "onsale", "is_on_sale", "is_sale"],
-        }
-        
-        select_fields = ["style_brand_no", "style_no", "src_updated_at"]
-        field_aliases = {
-            "style_brand_no": "style_brand_no",
-            "style_no": "style_no",
-            "src_updated_at": "src_updated_at",
-        }
-        
-        # Add optional fields if they exist
-        for target_field, possible_names in field_mapping.items():
-            found = False
-            for possible_name in possible_names:
-                if possible_name in actual_columns:
-                    select_fields.append(possible_name)
-                    field_aliases[target_field] = possible_name
-                    logger.debug(f"[STAGING_REPO] Mapped {target_field} -> {possible_name}")
-                    found = True
-                    break
-            if not found:
-                logger.warning(f"[STAGING_REPO] Field {target_field} not found in table, will use None")
-                field_aliases[target_field] = None  # Mark as not found
-        
-        # Build SQL query
-        select_clause = ", ".join(select_fields)
-        sql = f"""
-        SELECT {select_clause}
-        FROM {table_name}
-        WHERE {where_clause}
-        ORDER BY src_updated_at ASC, style_brand_no ASC, style_no ASC
-        LIMIT :limit
-        """
-        
-        params["limit"] = limit
-        
-        # Execute query
-        result = self.db.execute(text(sql), params)
-        records = []
-        for row in result:
-            record = {
-                "style_brand_no": getattr(row, "style_brand_no", None),
-                "style_no": getattr(row, "style_no", None),
-                "src_updated_at": getattr(row, "src_updated_at", None),
-            }
+        # Bind watermark params
+        incremental = last_processed_at is not None and last_processed_key is not None
+        params: dict[str, Any] = {"limit": limit}
+        if incremental:
+            last_brand, _, last_style = last_processed_key.partition("#")
+            params.update(
+                last_at=last_processed_at,
+                last_brand=last_brand,
+                last_style=last_style,
+            )
+        
+        statement = _build_batch_statement(table_name, select_fields, incremental, yield_per)
+        result = self.db.execute(statement, params)
+        return result, field_aliases
+
+    def iter_batch_by_watermark(
+        self,
+        table_name: str,
+        last_processed_at: Optional[datetime],
+        last_processed_key: Optional[str],
+        limit: int = 1000,
+        yield_per: int = STAGING_YIELD_PER,
+    ) -> Iterator[dict]:
+        """
+        Stream batch of records from products_staging using watermark.
+        
+        Rows are read through a server-side cursor, yield_per rows at a time,
+        so only a small window of the batch is held in memory. The session's
+        connection is busy until the generator is exhausted; do not run other
+        statements on the same session while consuming it.
+        
+        Supports "same-second no-miss" design:
+        - watermark: last_processed_at + last_processed_key (key = style_brand_no#style_no)
+        - Fetch condition: src_updated_at > last_at OR
+          (src_updated_at = last_at AND (style_brand_no, style_no) > (last_brand, last_style))
+        - Order by: src_updated_at, style_brand_no, style_no
+        
+        Args:
+            table_name: Table name (e.g., 'products_staging')
+            last_processed_at: Last processed timestamp (None for first run)
+            last_processed_key: Last processed key (None for first run)
+            limit: Batch size limit
+            yield_per: Rows fetched from the server-side cursor per round-trip
+            
+        Yields:
+            Record dictionaries
+        """
+        result, field_aliases = self._execute_batch_query(
+            table_name, last_processed_at, last_processed_key, limit, yield_per
+        )
+        count = 0
+        # 按位置取值：SELECT 字段顺序与 field_aliases 中已映射字段的顺序一致，
+        # 避免每行每字段 getattr / _mapping 查找；未映射字段保持 None
+        record_keys = tuple(
+            target_field for target_field, actual_field in field_aliases.items()
+            if actual_field is not None
+        )
+        # partitions() 每次 fetchmany(yield_per) 行，不依赖驱动默认的 arraysize
+        for rows in result.partitions():
+            for row in rows:
+                record = dict.fromkeys(field_aliases)
+                record.update(zip(record_keys, row))
+                
+                # Log first record structure for debugging
+                if count == 0 and logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("[STAGING_REPO] Sample record keys: %s", list(record.keys()))
+                    logger.debug("[STAGING_REPO] Sample record (first 3 fields): %s", dict(list(record.items())[:3]))
+                count += 1
+                yield record
+        
+        logger.info("[STAGING_REPO] ✓ Fetched %d records", count)
+
+    def fetch_batch_by_watermark(
+        self,
+        table_name: str,
+        last_processed_at: Optional[datetime],
+        last_processed_key: Optional[str],
+        limit: int = 1000,
+    ) -> list[dict]:
+        """
+        Fetch batch of records from products_staging using watermark.
+        
+        Materializes iter_batch_by_watermark, so the session is free again when
+        this returns (callers that write while iterating need this form).
+        
+        Args:
+            table_name: Table name (e.g., 'products_staging')
+            last_processed_at: Last processed timestamp (None for first run)
+            last_processed_key: Last processed key (None for first run)
+            limit: Batch size limit
+            
+        Returns:
+            List of record dictionaries
+        """
+        return list(
+            self.iter_batch_by_watermark(
+                table_name, last_processed_at, last_processed_key, limit
+            )
+        )
+
+    def fetch_batch_with_watermark(
+        self,
+        table_name: str,
+        last_processed_at: Optional[datetime],
+        last_processed_key: Optional[str],
+        limit: int = 1000,
+    ) -> tuple[list[dict], tuple[Optional[datetime], Optional[str]]]:
+        """
+        Fetch batch of records together with the watermark to store after it.
+        
+        The batch is ordered by (src_updated_at, style_brand_no, style_no), so
+        the new watermark is simply the last record, no extra pass needed.
+        
+        Args:
+            table_name: Table name (e.g., 'products_staging')
+            last_processed_at: Last processed timestamp (None for first run)
+            last_processed_key: Last processed key (None for first run)
+            limit: Batch size limit
             
-            # Add optional fields with fallback
-            for target_field, actual_field in field_aliases.items():
-                if target_field not in ("style_brand_no", "style_no", "src_updated_at"):
-                    if actual_field is None:
-                        # Field not found in table
-                        record[target_field] = None
-                    else:
-                        # Use row attribute access (works with both column names and aliases)
-                        # Try direct attribute access first
-                        value = getattr(row, actual_field, None)
-                        # If that fails, try dictionary access (for case-sensitive issues)
-                        if value is None and hasattr(row, '_mapping'):
-                            value = row._mapping.get(actual_field)
-                        record[target_field] = value
+        Returns:
+            Tuple of (records, (max_updated_at, max_key)); (None, None) when empty
+        """
+        records = self.fetch_batch_by_watermark(
+            table_name, last_processed_at, last_processed_key, limit
+        )
+        if not records:
+            return records, (None, None)
+        
+        last_record = records[-1]
+        return records, (
+            last_record["src_updated_at"],
+            f"{last_record['style_brand_no']}#{last_record['style_no']}",
+        )
+
+    def fetch_batch_columnar(
+        self,
+        table_name: str,
+        last_processed_at: Optional[datetime],
+        last_processed_key: Optional[str],
+        limit: int = 1000,
+        yield_per: int = STAGING_YIELD_PER,
+    ) -> dict[str, list]:
+        """
+        Fetch batch from products_staging as columns (field -> list of values).
+        
+        Same query and watermark semantics as iter_batch_by_watermark, but no
+        per-row dict is built: each fetched chunk is transposed into the column
+        lists. Unmapped fields are lists of None.
+        
+        Args:
+            table_name: Table name (e.g., 'products_staging')
+            last_processed_at: Last processed timestamp (None for first run)
+            last_processed_key: Last processed key (None for first run)
+            limit: Batch size limit
+            yield_per: Rows fetched from the server-side cursor per round-trip
             
-            records.append(record)
+        Returns:
+            Dict of field name -> list of values, all lists of equal length
+        """
+        result, field_aliases = self._execute_batch_query(
+            table_name, last_processed_at, last_processed_key, limit, yield_per
+        )
+        columns: dict[str, list] = {target_field: [] for target_field in field_aliases}
+        mapped_columns = [
+            columns[target_field] for target_field, actual_field in field_aliases.items()
+            if actual_field is not None
+        ]
+        count = 0
+        for rows in result.partitions():
+            for column, values in zip(mapped_columns, zip(*rows)):
+                column.extend(values)
+            count += len(rows)
         
-        # Log first record structure for debugging
-        if records:
-            logger.debug(f"[STAGING_REPO] Sample record keys: {list(records[0].keys())}")
-            logger.debug(f"[STAGING_REPO] Sample record (first 3 fields): {dict(list(records[0].items())[:3])}")
+        for target_field, actual_field in field_aliases.items():
+            if actual_field is None:
+                columns[target_field] = [None] * count
         
-        logger.info(f"[STAGING_REPO] ✓ Fetched {len(records)} records")
-        return records
+        logger.info("[STAGING_REPO] ✓ Fetched %d records (columnar)", count)
+        return columns
 
     def get_max_updated_at_and_key(
         self, records: list[dict]
@@ -182,6 +389,9 @@ class ProductStagingRepository:
         """
         Get maximum src_updated_at and corresponding key from records.
         
+        For batches returned by fetch_batch_with_watermark the watermark is
+        already known; this is for records in arbitrary order.
+        
         Args:
             records: List of record dictionaries
             
@@ -191,14 +401,10 @@ class ProductStagingRepository:
         if not records:
             return None, None
         
-        # Find max src_updated_at
-        max_updated_at = max(r["src_updated_at"] for r in records)
-        
-        # Find max key among records with max src_updated_at
-        max_records = [r for r in records if r["src_updated_at"] == max_updated_at]
-        max_key = max(
-            f"{r['style_brand_no']}#{r['style_no']}" for r in max_records
+        # Single pass over (src_updated_at, style_brand_no, style_no), the same
+        # order as the batch query; the key string is built once for the winner
+        max_updated_at, max_brand, max_style = max(
+            (r["src_updated_at"], r["style_brand_no"], r["style_no"]) for r in records
         )
         
-        return max_updated_at, max_key
-
+        return max_updated_at, f"{max_brand}#{max_style}"
@@ -1,72 +1,181 @@
 """Vision feature cache repository (V6.0.0+).
 
 支持 Redis 和 MySQL 两种存储方式，自动适配。
-优先级：Redis > MySQL
+优先级：Redis > MySQL（Redis 写入成功后，MySQL 备份在后台线程写入）
 """
 from __future__ import annotations
 
-import json
 import logging
-import uuid
-from datetime import datetime, timedelta
-from typing import Dict, Optional
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from datetime import datetime
+from functools import lru_cache
+from os import urandom
+from typing import Dict, List, Optional
 
-from sqlalchemy import text
+import orjson
+from sqlalchemy import TextClause, text
 from sqlalchemy.orm import Session
 
-from app.core.config import get_settings
+from app.core.database import SessionLocal
+from app.core.redis_client import get_redis_client
 
 logger = logging.getLogger(__name__)
 
-# Redis client (lazy import)
-_redis_client = None
+# SQL 语句在模块加载时构造一次，避免每次调用重复解析绑定参数
+_SAVE_SQL_PREFIX = """
+INSERT INTO vision_feature_cache
+(trace_id, brand_code, scene, vision_features_json, created_at, expires_at)
+VALUES
+"""
+_SAVE_SQL_SUFFIX = """
+ON DUPLICATE KEY UPDATE
+    brand_code = VALUES(brand_code),
+    scene = VALUES(scene),
+    vision_features_json = VALUES(vision_features_json),
+    created_at = NOW(),
+    expires_at = VALUES(expires_at)
+"""
 
 
-def _get_redis_client():
-    """获取 Redis 客户端（懒加载）。"""
-    global _redis_client
-    if _redis_client is not None:
-        return _redis_client
+@lru_cache(maxsize=32)
+def _build_save_sql(row_count: int) -> TextClause:
+    """
+    构造 row_count 行的多行 INSERT（按行数缓存，同样大小的批次复用语句）。
+    
+    VALUES 中含 NOW() 等表达式时驱动不会把 executemany 合并为多行 INSERT，
+    因此显式拼接 (...), (...)，绑定参数按行号后缀区分。
+    """
+    values = ",\n".join(
+        f"(:trace_id_{i}, :brand_code_{i}, :scene_{i}, :vision_features_json_{i}, "
+        "NOW(), DATE_ADD(NOW(), INTERVAL :ttl_hours HOUR))"
+        for i in range(row_count)
+    )
+    return text(_SAVE_SQL_PREFIX + values + _SAVE_SQL_SUFFIX)
 
-    try:
-        import redis
-        settings = get_settings()
-        if not settings.redis_url:
-            logger.warning("[CACHE] Redis URL not configured, will use MySQL fallback")
-            return None
 
-        # 解析 Redis URL: redis://host:port/db
-        redis_url = settings.redis_url
-        if redis_url.startswith("redis://"):
-            redis_url = redis_url[8:]  # 去掉 redis:// 前缀
-
-        parts = redis_url.split("/")
-        host_port = parts[0]
-        db = int(parts[1]) if len(parts) > 1 else 0
-
-        if ":" in host_port:
-            host, port = host_port.split(":")
-            port = int(port)
-        else:
-            host = host_port
-            port = 6379
-
-        _redis_client = redis.Redis(
-            host=host,
-            port=port,
-            db=db,
-            decode_responses=True,
-            socket_connect_timeout=2,
-            socket_timeout=2,
+_GET_SQL = text("""
+SELECT brand_code, scene, vision_features_json, expires_at
+FROM vision_feature_cache
+WHERE trace_id = :trace_id AND expires_at > NOW()
+""")
+
+_DELETE_SQL = text("DELETE FROM vision_feature_cache WHERE trace_id = :trace_id")
+
+# Redis 写入成功后，MySQL 备份由后台线程写入（write-behind）
+# 积压超过 MYSQL_WRITE_BEHIND_MAX_PENDING 批时改为同步写入
+MYSQL_WRITE_BEHIND_MAX_PENDING = 256
+_mysql_writer = ThreadPoolExecutor(max_workers=2, thread_name_prefix="vision-cache-writer")
+# 未完成的后台写入 -> 其包含的 trace_id
+_pending_writes: Dict[Future, frozenset[str]] = {}
+_pending_writes_lock = threading.Lock()
+
+def _serialize_entries(entries: List[Dict]) -> List[tuple[str, str, str, str]]:
+    """
+    序列化条目为 (trace_id, brand_code, scene, vision_features_json) 行。
+    
+    在调用方线程中完成，后台写入不再引用调用方的 vision_features 对象。
+    """
+    return [
+        (
+            entry["trace_id"],
+            entry["brand_code"],
+            entry["scene"],
+            orjson.dumps(entry["vision_features"]).decode(),
         )
-        # 测试连接
-        _redis_client.ping()
-        logger.info(f"[CACHE] ✓ Redis connected: {host}:{port}/{db}")
-        return _redis_client
+        for entry in entries
+    ]
+
+
+def _write_to_mysql(db: Session, rows: List[tuple[str, str, str, str]], ttl_hours: int) -> bool:
+    """
+    写入 MySQL（一条多行 INSERT，只提交一次）。
+    
+    Args:
+        db: Database session
+        rows: _serialize_entries 生成的行
+        ttl_hours: 过期时间（小时）
+    
+    Returns:
+        True if successful, False otherwise
+    """
+    try:
+        params: Dict[str, object] = {"ttl_hours": ttl_hours}
+        for i, (trace_id, brand_code, scene, vision_features_json) in enumerate(rows):
+            params[f"trace_id_{i}"] = trace_id
+            params[f"brand_code_{i}"] = brand_code
+            params[f"scene_{i}"] = scene
+            params[f"vision_features_json_{i}"] = vision_features_json
+        db.execute(_build_save_sql(len(rows)), params)
+        db.commit()
+        logger.debug("[CACHE] ✓ Saved %d entries to MySQL", len(rows))
+        return True
     except Exception as e:
-        logger.warning(f"[CACHE] Redis connection failed: {e}, will use MySQL fallback")
-        _redis_client = None
-        return None
+        logger.error(f"[CACHE] ✗ MySQL save failed: {e}", exc_info=True)
+        db.rollback()
+        return False
+
+
+def _write_behind(rows: List[tuple[str, str, str, str]], ttl_hours: int) -> None:
+    """后台线程中使用独立会话写入 MySQL。"""
+    with SessionLocal() as db:
+        _write_to_mysql(db, rows, ttl_hours)
+
+
+def _submit_mysql_write_behind(rows: List[tuple[str, str, str, str]], ttl_hours: int) -> bool:
+    """
+    提交后台 MySQL 写入。
+    
+    Returns:
+        True if queued, False if the queue is full (caller writes synchronously)
+    """
+    with _pending_writes_lock:
+        if len(_pending_writes) >= MYSQL_WRITE_BEHIND_MAX_PENDING:
+            return False
+        future = _mysql_writer.submit(_write_behind, rows, ttl_hours)
+        _pending_writes[future] = frozenset(row[0] for row in rows)
+    future.add_done_callback(_discard_pending_write)
+    return True
+
+
+def _discard_pending_write(future: Future) -> None:
+    with _pending_writes_lock:
+        _pending_writes.pop(future, None)
+
+
+def _drop_pending_writes(trace_id: str) -> None:
+    """
+    删除前处理该 trace_id 尚未落库的后台写入，避免写入在删除之后到达而"复活"记录。
+    
+    只包含该 trace_id 的写入直接取消；与其他条目同批的写入无法单独取消，等待其完成。
+    """
+    with _pending_writes_lock:
+        pending = [
+            (future, trace_ids)
+            for future, trace_ids in _pending_writes.items()
+            if trace_id in trace_ids
+        ]
+    to_wait = [
+        future for future, trace_ids in pending
+        if not (trace_ids == {trace_id} and future.cancel())
+    ]
+    if to_wait:
+        wait(to_wait)
+
+
+def wait_for_pending_writes(timeout: Optional[float] = None) -> None:
+    """
+    等待后台 MySQL 写入完成（应用关闭时调用）。
+    
+    Args:
+        timeout: 最长等待秒数，None 表示一直等待
+    """
+    with _pending_writes_lock:
+        pending = list(_pending_writes)
+    if pending:
+        logger.info(f"[CACHE] Waiting for {len(pending)} pending MySQL writes")
+        wait(pending, timeout=timeout)
 
 
 class VisionFeatureCacheRepository:
@@ -74,8 +183,8 @@ class VisionFeatureCacheRepository:
 
     @staticmethod
     def generate_trace_id() -> str:
-        """生成全局唯一的 trace_id。"""
-        return f"vision_{uuid.uuid4().hex[:16]}_{int(datetime.now().timestamp())}"
+        """生成全局唯一的 trace_id（格式：vision_{16位随机hex}_{秒级时间戳}）。"""
+        return f"vision_{urandom(8).hex()}_{int(time.time())}"
 
     @staticmethod
     def save(
@@ -100,62 +209,76 @@ class VisionFeatureCacheRepository:
         Returns:
             True if successful, False otherwise
         """
-        logger.info(f"[CACHE] Saving trace_id={trace_id}, brand_code={brand_code}, scene={scene}")
-
-        # 尝试使用 Redis
-        redis_client = _get_redis_client()
-        if redis_client:
-            try:
-                cache_data = {
+        logger.debug(
+            "[CACHE] Saving trace_id=%s, brand_code=%s, scene=%s", trace_id, brand_code, scene
+        )
+        return VisionFeatureCacheRepository.save_many(
+            db,
+            [
+                {
+                    "trace_id": trace_id,
                     "brand_code": brand_code,
                     "scene": scene,
                     "vision_features": vision_features,
-                    "created_at": datetime.now().isoformat(),
                 }
-                redis_key = f"vision_feature:{trace_id}"
-                redis_client.setex(
-                    redis_key,
-                    ttl_hours * 3600,  # TTL in seconds
-                    json.dumps(cache_data, ensure_ascii=False),
-                )
-                logger.info(f"[CACHE] ✓ Saved to Redis: {trace_id}")
+            ],
+            ttl_hours=ttl_hours,
+        )
+
+    @staticmethod
+    def save_many(
+        db: Session,
+        entries: List[Dict],
+        ttl_hours: int = 24,
+    ) -> bool:
+        """
+        批量保存 trace_id -> vision_features 映射。
+        
+        Redis 通过 pipeline 一次往返写入全部条目，成功后 MySQL 备份在后台写入；
+        Redis 不可用时同步写入 MySQL（一条多行 INSERT，只提交一次）。
+        
+        Args:
+            db: Database session
+            entries: 条目列表，每项包含 trace_id, brand_code, scene, vision_features
+            ttl_hours: 过期时间（小时，默认24）
+        
+        Returns:
+            True if successful, False otherwise
+        """
+        if not entries:
+            return True
+
+        # 尝试使用 Redis
+        redis_client = get_redis_client()
+        if redis_client:
+            try:
+                created_at = datetime.now().isoformat()
+                pipe = redis_client.pipeline()
+                for entry in entries:
+                    cache_data = {
+                        "brand_code": entry["brand_code"],
+                        "scene": entry["scene"],
+                        "vision_features": entry["vision_features"],
+                        "created_at": created_at,
+                    }
+                    pipe.setex(
+                        f"vision_feature:{entry['trace_id']}",
+                        ttl_hours * 3600,  # TTL in seconds
+                        orjson.dumps(cache_data),
+                    )
+                pipe.execute()
+                logger.debug("[CACHE] ✓ Saved %d entries to Redis", len(entries))
+                # MySQL 备份写入放到后台线程，不占用请求耗时；积压过多时同步写入
+                rows = _serialize_entries(entries)
+                if not _submit_mysql_write_behind(rows, ttl_hours):
+                    _write_to_mysql(db, rows, ttl_hours)
                 return True
             except Exception as e:
                 logger.warning(f"[CACHE] Redis save failed: {e}, falling back to MySQL")
                 # Fall through to MySQL
 
         # 使用 MySQL 作为降级方案
-        try:
-            expires_at = datetime.now() + timedelta(hours=ttl_hours)
-            sql = """
-            INSERT INTO vision_feature_cache 
-            (trace_id, brand_code, scene, vision_features_json, created_at, expires_at)
-            VALUES 
-            (:trace_id, :brand_code, :scene, :vision_features_json, NOW(), :expires_at)
-            ON DUPLICATE KEY UPDATE
-                brand_code = VALUES(brand_code),
-                scene = VALUES(scene),
-                vision_features_json = VALUES(vision_features_json),
-                created_at = NOW(),
-                expires_at = VALUES(expires_at)
-            """
-            db.execute(
-                text(sql),
-                {
-                    "trace_id": trace_id,
-                    "brand_code": brand_code,
-                    "scene": scene,
-                    "vision_features_json": json.dumps(vision_features, ensure_ascii=False),
-                    "expires_at": expires_at,
-                },
-            )
-            db.commit()
-            logger.info(f"[CACHE] ✓ Saved to MySQL: {trace_id}")
-            return True
-        except Exception as e:
-            logger.error(f"[CACHE] ✗ MySQL save failed: {e}", exc_info=True)
-            db.rollback()
-            return False
+        return _write_to_mysql(db, _serialize_entries(entries), ttl_hours)
 
     @staticmethod
     def get(
@@ -173,17 +296,17 @@ class VisionFeatureCacheRepository:
             Dict with keys: brand_code, scene, vision_features
             None if not found or expired
         """
-        logger.info(f"[CACHE] Getting trace_id={trace_id}")
+        logger.debug("[CACHE] Getting trace_id=%s", trace_id)
 
         # 尝试从 Redis 获取
-        redis_client = _get_redis_client()
+        redis_client = get_redis_client()
         if redis_client:
             try:
                 redis_key = f"vision_feature:{trace_id}"
                 cached_data = redis_client.get(redis_key)
                 if cached_data:
-                    data = json.loads(cached_data)
-                    logger.info(f"[CACHE] ✓ Retrieved from Redis: {trace_id}")
+                    data = orjson.loads(cached_data)
+                    logger.debug("[CACHE] ✓ Retrieved from Redis: %s", trace_id)
                     return data
             except Exception as e:
                 logger.warning(f"[CACHE] Redis get failed: {e}, falling back to MySQL")
@@ -191,24 +314,20 @@ class VisionFeatureCacheRepository:
 
         # 从 MySQL 获取
         try:
-            sql = """
-            SELECT brand_code, scene, vision_features_json, expires_at
-            FROM vision_feature_cache
-            WHERE trace_id = :trace_id AND expires_at > NOW()
-            """
-            result = db.execute(text(sql), {"trace_id": trace_id})
-            row = result.fetchone()
+            # 单条只读查询直接在会话当前连接上执行（Core 层），不经过 Session.execute
+            # 的 ORM 执行流程；复用同一连接，不额外占用连接池
+            row = db.connection().execute(_GET_SQL, {"trace_id": trace_id}).fetchone()
             if row:
                 data = {
                     "brand_code": row[0],
                     "scene": row[1],
-                    "vision_features": json.loads(row[2]),
+                    "vision_features": orjson.loads(row[2]),
                     "created_at": row[3].isoformat() if hasattr(row[3], "isoformat") else str(row[3]),
                 }
-                logger.info(f"[CACHE] ✓ Retrieved from MySQL: {trace_id}")
+                logger.debug("[CACHE] ✓ Retrieved from MySQL: %s", trace_id)
                 return data
             else:
-                logger.warning(f"[CACHE] ✗ Trace ID not found or expired: {trace_id}")
+                logger.warning("[CACHE] ✗ Trace ID not found or expired: %s", trace_id)
                 return None
         except Exception as e:
             logger.error(f"[CACHE] ✗ MySQL get failed: {e}", exc_info=True)
@@ -226,24 +345,24 @@ class VisionFeatureCacheRepository:
         Returns:
             True if successful, False otherwise
         """
-        logger.info(f"[CACHE] Deleting trace_id={trace_id}")
+        logger.debug("[CACHE] Deleting trace_id=%s", trace_id)
 
         # 尝试从 Redis 删除
-        redis_client = _get_redis_client()
+        redis_client = get_redis_client()
         if redis_client:
             try:
                 redis_key = f"vision_feature:{trace_id}"
                 redis_client.delete(redis_key)
-                logger.info(f"[CACHE] ✓ Deleted from Redis: {trace_id}")
+                logger.debug("[CACHE] ✓ Deleted from Redis: %s", trace_id)
             except Exception as e:
                 logger.warning(f"[CACHE] Redis delete failed: {e}")
 
-        # 从 MySQL 删除
+        # 从 MySQL 删除（先取消 / 等待该 trace_id 的后台写入）
+        _drop_pending_writes(trace_id)
         try:
-            sql = "DELETE FROM vision_feature_cache WHERE trace_id = :trace_id"
-            db.execute(text(sql), {"trace_id": trace_id})
+            db.execute(_DELETE_SQL, {"trace_id": trace_id})
             db.commit()
-            logger.info(f"[CACHE] ✓ Deleted from MySQL: {trace_id}")
+            logger.debug("[CACHE] ✓ Deleted from MySQL: %s", trace_id)
             return True
         except Exception as e:
             logger.error(f"[CACHE] ✗ MySQL delete failed: {e}", exc_info=True)
@@ -1,9 +1,9 @@
 """Similar SKUs search API schemas (V6.0.0+)."""
 from __future__ import annotations
 
-from typing import List, Optional
+from typing import List, Literal, Optional
 
-from pydantic import BaseModel, Field, model_validator
+from pydantic import BaseModel, Field, field_validator, model_validator
 
 
 class VisionFeatures(BaseModel):
@@ -15,12 +15,27 @@ class VisionFeatures(BaseModel):
         description="风格（如：['休闲', '日常']）",
     )
     color: Optional[str] = Field(None, description="颜色（如：黑色）")
+    colors: List[str] = Field(
+        default_factory=list,
+        description="颜色列表（如：['黑色', '白色']）",
+    )
     season: Optional[str] = Field(None, description="季节（如：四季）")
     keywords: Optional[List[str]] = Field(
         default_factory=list,
         description="关键词（如：['百搭', '轻便']）",
     )
 
+    def to_service_dict(self) -> dict:
+        """转换为 SimilarSKUsService 使用的特征字典。"""
+        return {
+            "category": self.category,
+            "style": self.style or [],
+            "color": self.color,
+            "colors": self.colors or [],
+            "season": self.season,
+            "keywords": self.keywords or [],
+        }
+
 
 class SimilarSKUsRequest(BaseModel):
     """Similar SKUs search request schema."""
@@ -28,9 +43,7 @@ class SimilarSKUsRequest(BaseModel):
     brand_code: str = Field(..., description="品牌编码", examples=["BL"])
     top_k: int = Field(
         default=5,
-        ge=1,
-        le=5,
-        description="返回结果数量（最多5个）",
+        description="返回结果数量（1~5，超出范围自动截断）",
     )
     vision_features: Optional[VisionFeatures] = Field(
         None, description="视觉特征（来自Step 1，与 trace_id 二选一）"
@@ -38,11 +51,17 @@ class SimilarSKUsRequest(BaseModel):
     trace_id: Optional[str] = Field(
         None, description="追踪ID（来自Step 1，与 vision_features 二选一）"
     )
-    mode: str = Field(
+    mode: Literal["rule", "vector"] = Field(
         default="rule",
         description="检索模式：rule（规则检索）或 vector（向量检索）",
     )
 
+    @field_validator("top_k")
+    @classmethod
+    def clamp_top_k(cls, value: int) -> int:
+        """将 top_k 限制在 [1, 5] 范围内。"""
+        return max(1, min(value, 5))
+
     @model_validator(mode="after")
     def validate_inputs(self) -> "SimilarSKUsRequest":
         """验证 vision_features 和 trace_id 至少提供一个。"""
@@ -80,8 +80,8 @@ async def log_ai_task(
                 task_id=task_id,
                 guide_id=guide_id,
                 scene_type=scene_type,
-                input_data=json.dumps(input_data, ensure_ascii=False),
-                output_result=json.dumps(output_result, ensure_ascii=False) if output_result else None,
+                input_data=input_data,
+                output_result=output_result or None,
                 model_name=model_name,
                 latency_ms=latency_ms,
                 is_adopted=False,
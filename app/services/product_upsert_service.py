@@ -40,6 +40,7 @@ class ProductUpsertService:
         - Only update if data_version changed
         - Write change_log only if data_version changed
         - Use INSERT ... ON DUPLICATE KEY UPDATE (via repository)
+        - Does NOT commit: the caller owns the transaction
         
         Args:
             normalized_data: Normalized product data dictionary
@@ -121,6 +122,8 @@ class ProductUpsertService:
         Write change log entry (idempotent).
         
         Uses INSERT IGNORE or INSERT ... ON DUPLICATE KEY UPDATE to prevent duplicates.
+        The insert runs in a SAVEPOINT so a duplicate only rolls back the change log,
+        not the product upsert in the caller's transaction.
         
         Args:
             brand_code: Brand code
@@ -132,22 +135,23 @@ class ProductUpsertService:
         
         # Try to insert (will fail silently if duplicate due to unique constraint)
         try:
-            change_log = ProductChangeLog(
-                brand_code=brand_code,
-                sku=sku,
-                data_version=data_version,
-                status=ChangeStatus.PENDING.value,
-                change_type=change_type,
-            )
-            self.db.add(change_log)
-            self.db.commit()
+            with self.db.begin_nested():
+                self.db.add(
+                    ProductChangeLog(
+                        brand_code=brand_code,
+                        sku=sku,
+                        data_version=data_version,
+                        status=ChangeStatus.PENDING.value,
+                        change_type=change_type,
+                    )
+                )
             logger.debug(
                 f"[UPSERT_SERVICE] Change log written: "
                 f"brand_code={brand_code}, sku={sku}, version={data_version}"
             )
         except Exception as e:
-            # Unique constraint violation: already exists (idempotent)
-            self.db.rollback()
+            # Unique constraint violation: already exists (idempotent);
+            # the savepoint has already been rolled back
             logger.debug(
                 f"[UPSERT_SERVICE] Change log already exists (idempotent): "
                 f"brand_code={brand_code}, sku={sku}, version={data_version}, error={e}"
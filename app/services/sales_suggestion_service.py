@@ -68,7 +68,7 @@ INTENT_LOW = "low"
 INTENT_HESITATING = "hesitating"
 
 
-@dataclass
+@dataclass(slots=True)
 class MessageItem:
     """Message item in message pack."""
     
@@ -77,7 +77,7 @@ class MessageItem:
     message: str  # Message content
 
 
-@dataclass
+@dataclass(slots=True)
 class SendRecommendation:
     """Send recommendation with risk assessment (V5.6.0+)."""
     
@@ -88,7 +88,7 @@ class SendRecommendation:
     next_step: str  # What the guide should do after customer replies
 
 
-@dataclass
+@dataclass(slots=True)
 class FollowupPlaybookItem:
     """Follow-up playbook item for guides (V5.8.0+)."""
     
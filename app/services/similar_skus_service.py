@@ -7,12 +7,17 @@
 from __future__ import annotations
 
 import logging
-from typing import Dict, List, Optional, Tuple
+import time
+from typing import Dict, List, Literal, NamedTuple, Optional, Tuple
 
 from sqlalchemy.orm import Session
 
-from app.models.product import Product
-from app.repositories.product_repository import get_candidate_products_by_brand
+from app.core.cache_keys import key_for
+from app.repositories import product_cache_repository as product_cache
+from app.repositories.product_repository import (
+    CandidateProduct,
+    get_candidate_products_by_brand,
+)
 from app.repositories.vision_feature_cache_repository import (
     VisionFeatureCacheRepository,
 )
@@ -20,6 +25,19 @@ from app.services.vector_store import VectorStore
 
 logger = logging.getLogger(__name__)
 
+# 检索结果缓存 TTL（秒）
+# 缓存 key 包含 Redis 中的品牌版本号（向量同步提交后递增）；Redis 不可用时只依赖 TTL 过期
+RESULT_CACHE_TTL_SECONDS = 120
+# 检索结果缓存最大条目数
+RESULT_CACHE_MAX_ENTRIES = 1024
+
+class SearchOutcome(NamedTuple):
+    """相似SKU检索结果。"""
+
+    status: Literal["ok", "trace_miss"]  # trace_miss: trace_id 未找到或已过期
+    skus: List[str]
+    fallback: bool  # 是否从 vector 降级到 rule
+
 
 class SimilarSKUsService:
     """Service for finding similar SKUs based on vision features."""
@@ -32,6 +50,8 @@ class SimilarSKUsService:
             vector_store: Vector store instance (optional, will create if needed)
         """
         self.vector_store = vector_store
+        # key -> (skus, fallback_used, expires_at)
+        self._result_cache: Dict[bytes, Tuple[List[str], bool, float]] = {}
 
     async def search_similar_skus(
         self,
@@ -41,7 +61,7 @@ class SimilarSKUsService:
         trace_id: Optional[str] = None,
         top_k: int = 5,
         mode: str = "rule",
-    ) -> Tuple[List[str], bool]:
+    ) -> SearchOutcome:
         """
         搜索相似 SKU。
         
@@ -49,13 +69,18 @@ class SimilarSKUsService:
             db: Database session
             brand_code: Brand code
             vision_features: Vision features dict (category, style, color, season, keywords)
+            trace_id: Trace ID from Step 1 (used when vision_features is not provided)
             top_k: Maximum number of results (<=5)
             mode: Search mode ("rule" or "vector")
         
         Returns:
-            Tuple of (sku_list, fallback_used)
-            - sku_list: List of SKU strings (最多 top_k 个)
-            - fallback_used: Whether fallback to rule mode was used
+            SearchOutcome(status, skus, fallback)
+            - status: "ok"，或 "trace_miss"（trace_id 未找到或已过期，skus 为空）
+            - skus: List of SKU strings (最多 top_k 个)
+            - fallback: Whether fallback to rule mode was used
+        
+        Raises:
+            ValueError: 解析出的 vision_features 为空
         """
         logger.info("=" * 80)
         logger.info(
@@ -78,8 +103,8 @@ class SimilarSKUsService:
             )
             if resolution_failed:
                 logger.error("[SIMILAR_SKUS] ✗ Failed to resolve vision features (trace_id not found or expired)")
-                # Raise exception to signal API layer that trace_id resolution failed
-                raise ValueError(f"trace_id not found or expired: {trace_id}")
+                logger.info("=" * 80)
+                return SearchOutcome("trace_miss", [], False)
             if not resolved_features:
                 logger.error("[SIMILAR_SKUS] ✗ Failed to resolve vision features (empty features)")
                 raise ValueError("vision_features is empty")
@@ -88,6 +113,14 @@ class SimilarSKUsService:
             # 使用解析后的 brand_code（如果从 trace_id 获取）
             if resolved_brand_code:
                 brand_code = resolved_brand_code
+
+            # 相同 (brand_code, mode, top_k, vision_features) 直接返回缓存结果
+            cache_key = self._result_cache_key(brand_code, mode, top_k, resolved_features)
+            cached = self._get_cached_result(cache_key)
+            if cached is not None:
+                logger.info(f"[SIMILAR_SKUS] ✓ Result cache hit: {len(cached.skus)} SKUs")
+                return cached
+
             if mode == "vector":
                 logger.info("[SIMILAR_SKUS] Step 1: Attempting vector search...")
                 try:
@@ -96,7 +129,8 @@ class SimilarSKUsService:
                     )
                     if skus:
                         logger.info(f"[SIMILAR_SKUS] ✓ Vector search succeeded: {len(skus)} SKUs")
-                        return skus, fallback_used
+                        self._set_cached_result(cache_key, skus, fallback_used)
+                        return SearchOutcome("ok", skus, fallback_used)
                     else:
                         logger.warning("[SIMILAR_SKUS] Vector search returned no results, falling back to rule")
                         fallback_used = True
@@ -110,13 +144,54 @@ class SimilarSKUsService:
             logger.info(f"[SIMILAR_SKUS] ✓ Rule search completed: {len(skus)} SKUs")
             logger.info("=" * 80)
 
-            return skus, fallback_used
+            self._set_cached_result(cache_key, skus, fallback_used)
+            return SearchOutcome("ok", skus, fallback_used)
 
         except Exception as e:
             logger.error(f"[SIMILAR_SKUS] ✗ Search failed: {e}", exc_info=True)
             logger.info("=" * 80)
             raise
 
+    def _result_cache_key(
+        self,
+        brand_code: str,
+        mode: str,
+        top_k: int,
+        vision_features: Dict,
+    ) -> bytes:
+        """根据 (brand_code, mode, top_k, vision_features, 品牌版本号) 生成缓存 key。"""
+        return key_for(
+            "similar_skus",
+            brand_code,
+            mode,
+            top_k,
+            vision_features,
+            product_cache.get_brand_version(brand_code),
+        )
+
+    def _get_cached_result(self, cache_key: bytes) -> Optional[SearchOutcome]:
+        """获取未过期的缓存结果，不存在或已过期返回 None。"""
+        entry = self._result_cache.get(cache_key)
+        if entry is None:
+            return None
+        skus, fallback_used, expires_at = entry
+        if time.monotonic() >= expires_at:
+            del self._result_cache[cache_key]
+            return None
+        return SearchOutcome("ok", list(skus), fallback_used)
+
+    def _set_cached_result(
+        self, cache_key: bytes, skus: List[str], fallback_used: bool
+    ) -> None:
+        """写入缓存结果（超过最大条目数时淘汰最早写入的条目）。"""
+        if len(self._result_cache) >= RESULT_CACHE_MAX_ENTRIES:
+            self._result_cache.pop(next(iter(self._result_cache)))
+        self._result_cache[cache_key] = (
+            list(skus),
+            fallback_used,
+            time.monotonic() + RESULT_CACHE_TTL_SECONDS,
+        )
+
     async def _resolve_features(
         self,
         db: Session,
@@ -256,8 +331,8 @@ class SimilarSKUsService:
         return skus
 
     def _score_candidates(
-        self, candidates: List[Product], vision_features: Dict
-    ) -> List[Tuple[Product, float]]:
+        self, candidates: List[CandidateProduct], vision_features: Dict
+    ) -> List[Tuple[CandidateProduct, float]]:
         """
         对候选商品打分。
         
@@ -371,7 +446,7 @@ class SimilarSKUsService:
                    f"min score: {scored[-1][1] if scored else 0:.1f}")
         return scored
 
-    def _extract_category(self, product: Product) -> Optional[str]:
+    def _extract_category(self, product: CandidateProduct) -> Optional[str]:
         """提取商品类型（优先级：category列 > attributes["category"] > attributes["类目"]）。"""
         if hasattr(product, "category") and product.category:
             return str(product.category)
@@ -379,7 +454,7 @@ class SimilarSKUsService:
             return product.attributes.get("category") or product.attributes.get("类目")
         return None
 
-    def _extract_colors(self, product: Product) -> List[str]:
+    def _extract_colors(self, product: CandidateProduct) -> List[str]:
         """提取颜色（优先级：attributes["colors"] 或 attributes["颜色"]）。"""
         if product.attributes:
             colors = product.attributes.get("colors") or product.attributes.get("颜色")
@@ -390,7 +465,7 @@ class SimilarSKUsService:
                     return [c.strip() for c in colors.split(",") if c.strip()]
         return []
 
-    def _extract_style(self, product: Product) -> set:
+    def _extract_style(self, product: CandidateProduct) -> set:
         """提取风格（从 tags 或 attributes）。"""
         style_set = set()
         if product.tags:
@@ -406,20 +481,20 @@ class SimilarSKUsService:
                     style_set.add(style)
         return style_set
 
-    def _extract_season(self, product: Product) -> Optional[str]:
+    def _extract_season(self, product: CandidateProduct) -> Optional[str]:
         """提取季节（从 attributes）。"""
         if product.attributes:
             return product.attributes.get("season") or product.attributes.get("季节")
         return None
 
-    def _extract_material(self, product: Product) -> Optional[str]:
+    def _extract_material(self, product: CandidateProduct) -> Optional[str]:
         """提取材质（从 attributes，仅明确标注的）。"""
         if product.attributes:
             return product.attributes.get("material") or product.attributes.get("材质")
         return None
 
     def _dedupe_and_limit(
-        self, scored_products: List[Tuple[Product, float]], top_k: int
+        self, scored_products: List[Tuple[CandidateProduct, float]], top_k: int
     ) -> List[str]:
         """
         去重并限制数量。
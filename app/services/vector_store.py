@@ -3,17 +3,85 @@ from __future__ import annotations
 
 import asyncio
 import logging
+import math
+import os
 import pickle
+import re
+import threading
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 
 import faiss
 import numpy as np
 
+from app.core.cache_keys import key_for
 from app.services.embedding_client import get_embedding_client
 
 logger = logging.getLogger(__name__)
 
+# 向量数低于该阈值时使用精确检索（IndexFlatL2），否则构建 IVF 近似索引
+ANN_MIN_VECTORS = 10_000
+# IVF 检索时探查的聚类数，越大召回越高、越慢
+IVF_NPROBE = 16
+
+# chunk 末尾的 SKU 标识，格式：`... [SKU:8WZ76CM6]`（见 init_vector_store.chunk_product_texts）
+_SKU_MARKER_PATTERN = re.compile(r"\[SKU:([^\]\s]+)\]")
+
+# 只读索引（legacy index / base index）以 mmap 方式加载：按需换页，多 worker 共享页缓存。
+# mmap 加载的索引不可再 add（FAISS 会直接 abort），delta index 需要增量写入，仍完整读入内存。
+_MMAP_READ_FLAGS = faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY
+
+# 查询向量缓存最大条目数（相同查询文本复用已归一化的向量，跳过 embedding API 调用）
+QUERY_EMBEDDING_CACHE_MAX_ENTRIES = 4096
+
+# key_for("query_embedding", model, query) -> 已归一化的查询向量 (1, dim)
+_query_embedding_cache: Dict[bytes, np.ndarray] = {}
+_query_embedding_cache_lock = threading.Lock()
+
+
+def configure_faiss_threads(threads: int) -> None:
+    """
+    设置 FAISS OpenMP 线程数（应用启动时调用一次）。
+    
+    threads <= 0 时保持 FAISS / OpenMP 默认值（通常为 CPU 核数）。
+    """
+    if threads <= 0:
+        return
+    faiss.omp_set_num_threads(threads)
+    logger.info("[VECTOR_STORE] FAISS OpenMP threads: %d", threads)
+
+
+def _write_index(index: faiss.Index, path: Path) -> None:
+    """
+    Write an index atomically (temp file + rename).
+
+    A loaded base index may be mmapped from the target file; rewriting
+    that file in place would corrupt the live mapping.
+    """
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    faiss.write_index(index, str(tmp_path))
+    os.replace(tmp_path, path)
+
+
+def _create_index(dimension: int, vectors: np.ndarray) -> faiss.Index:
+    """
+    按向量规模选择索引类型（未添加向量，调用方负责 add）。
+
+    - 小目录：IndexFlatL2 精确检索
+    - 大目录：IVF{nlist},Flat，已完成 train；保留原始 L2 距离，
+      下游基于距离的阈值判断不受影响
+    """
+    num_vectors = len(vectors)
+    if num_vectors < ANN_MIN_VECTORS:
+        return faiss.IndexFlatL2(dimension)
+
+    # FAISS 建议每个聚类至少 39 个训练样本
+    nlist = max(1, min(int(4 * math.sqrt(num_vectors)), num_vectors // 39))
+    index = faiss.index_factory(dimension, f"IVF{nlist},Flat")
+    index.train(vectors)
+    logger.info(f"[VECTOR_STORE] Trained IVF index: nlist={nlist}, vectors={num_vectors}")
+    return index
+
 
 def _run_async(coro):
     """
@@ -43,6 +111,32 @@ def _run_async(coro):
         return asyncio.run(coro)
 
 
+def _get_cached_query_vector(cache_key: bytes) -> np.ndarray | None:
+    """Return a copy of the cached query vector, or None on a miss."""
+    with _query_embedding_cache_lock:
+        cached = _query_embedding_cache.get(cache_key)
+    return None if cached is None else cached.copy()
+
+
+def _cache_query_vector(
+    cache_key: bytes, query_embeddings: List[List[float]]
+) -> np.ndarray | None:
+    """Normalize the raw query embedding, cache it and return it (None if empty)."""
+    if not query_embeddings:
+        return None
+
+    query_vector = np.array([query_embeddings[0]], dtype=np.float32)
+    # 强制归一化查询向量（L2 normalization）
+    # 确保查询向量和索引向量在同一个单位球面上
+    faiss.normalize_L2(query_vector)
+
+    with _query_embedding_cache_lock:
+        if len(_query_embedding_cache) >= QUERY_EMBEDDING_CACHE_MAX_ENTRIES:
+            _query_embedding_cache.pop(next(iter(_query_embedding_cache)))
+        _query_embedding_cache[cache_key] = query_vector.copy()
+    return query_vector
+
+
 class VectorStore:
     """
     FAISS-based vector store for semantic search.
@@ -56,6 +150,8 @@ class VectorStore:
         index_path: str = "./vector_store/faiss.index",
         chunk_metadata_path: str = "./vector_store/chunks.pkl",
         use_incremental: bool = True,
+        nprobe: int = IVF_NPROBE,
+        use_mmap: bool = True,
     ):
         """
         Initialize vector store.
@@ -64,14 +160,24 @@ class VectorStore:
             index_path: Path to save/load FAISS index (base index)
             chunk_metadata_path: Path to save/load chunk texts
             use_incremental: Whether to use base+delta incremental strategy
+            nprobe: Number of IVF clusters probed per query (ignored for flat indexes)
+            use_mmap: Memory-map the read-only legacy/base index on load instead of
+                reading it fully into RAM
         """
         self.index_path = Path(index_path)
         self.chunk_metadata_path = Path(chunk_metadata_path)
         self.use_incremental = use_incremental
+        self.nprobe = nprobe
+        self.use_mmap = use_mmap
         
         # Legacy single index (for backward compatibility)
         self.index: faiss.Index | None = None
         self.chunks: List[str] = []
+        # SKU -> chunk positions in self.chunks (built from `[SKU:xxx]` markers)
+        self.sku_to_chunk_ids: Dict[str, List[int]] = {}
+        # Lazily built contiguous copy of self.chunks for substring scans:
+        # ("\0"-joined text, start offset of each chunk)
+        self._chunk_buffer: Tuple[str, np.ndarray] | None = None
         
         # Incremental strategy: base + delta
         self.base_index: faiss.Index | None = None
@@ -148,19 +254,104 @@ class VectorStore:
                 f"(should be 1.0)"
             )
         
-        # Create FAISS index
-        # Using IndexFlatL2 for exact search (can be upgraded to IndexIVFFlat for large datasets)
-        self.index = faiss.IndexFlatL2(self.dimension)
+        # Create FAISS index (flat for small catalogs, IVF for large ones)
+        self.index = _create_index(self.dimension, embeddings_array)
+        self._apply_search_params(self.index)
         
         # Add vectors to index
         self.index.add(embeddings_array)
         self.chunks = chunks
+        self._build_sku_index()
         
         logger.info(
             f"[VECTOR_STORE] ✓ Index built: {self.index.ntotal} vectors, "
             f"dim={self.dimension}"
         )
 
+    def _build_sku_index(self) -> None:
+        """
+        Map each `[SKU:xxx]` marker to the positions of the chunks carrying it.
+
+        Called whenever self.chunks is replaced, so it also drops the stale
+        chunk buffer used by find_chunk_ids.
+        """
+        self._chunk_buffer = None
+        sku_to_chunk_ids: Dict[str, List[int]] = {}
+        for position, chunk in enumerate(self.chunks):
+            for sku in _SKU_MARKER_PATTERN.findall(chunk):
+                sku_to_chunk_ids.setdefault(sku, []).append(position)
+        self.sku_to_chunk_ids = sku_to_chunk_ids
+        logger.info(f"[VECTOR_STORE] Built SKU index: {len(sku_to_chunk_ids)} SKUs")
+
+    def find_chunk_ids(self, needle: str, limit: int) -> List[int]:
+        """
+        Positions of chunks containing needle, in order, at most limit.
+
+        Scans one contiguous "\0"-joined buffer with str.find instead of
+        testing every chunk string, and maps hits back to chunk positions
+        with a binary search over the chunk start offsets.
+        """
+        if not needle or limit <= 0 or not self.chunks:
+            return []
+        if self._chunk_buffer is None:
+            lengths = np.fromiter((len(chunk) + 1 for chunk in self.chunks), dtype=np.int64)
+            offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+            self._chunk_buffer = ("\0".join(self.chunks), offsets)
+        buffer, offsets = self._chunk_buffer
+
+        chunk_ids: List[int] = []
+        pos = buffer.find(needle)
+        while pos != -1 and len(chunk_ids) < limit:
+            chunk_id = int(np.searchsorted(offsets, pos, side="right")) - 1
+            chunk_ids.append(chunk_id)
+            if chunk_id + 1 >= len(offsets):
+                break
+            # Continue from the next chunk so each chunk is reported once
+            pos = buffer.find(needle, int(offsets[chunk_id + 1]))
+        return chunk_ids
+
+    def _apply_search_params(self, index: faiss.Index | None) -> None:
+        """Apply query-time tunables (nprobe) to IVF indexes; no-op for flat indexes."""
+        if index is None:
+            return
+        ivf = faiss.try_extract_index_ivf(index)
+        if ivf is not None:
+            ivf.nprobe = min(self.nprobe, ivf.nlist)
+
+    def embed_query(self, query: str) -> np.ndarray | None:
+        """
+        Get the L2-normalized query vector, shape (1, dim).
+
+        Vectors are cached per (embedding model, query text), so repeated
+        queries skip the embedding API round-trip.
+        """
+        embedding_client = get_embedding_client()
+        cache_key = key_for("query_embedding", embedding_client.model, query)
+        cached = _get_cached_query_vector(cache_key)
+        if cached is not None:
+            logger.debug(f"[VECTOR_STORE] Query embedding cache hit: '{query[:50]}'")
+            return cached
+
+        query_embeddings = _run_async(embedding_client.embed_texts([query]))
+        return _cache_query_vector(cache_key, query_embeddings)
+
+    async def aembed_query(self, query: str) -> np.ndarray | None:
+        """
+        Async variant of embed_query for use inside request handlers.
+
+        Awaits the embedding API on the running event loop instead of
+        spinning up a helper thread with its own loop.
+        """
+        embedding_client = get_embedding_client()
+        cache_key = key_for("query_embedding", embedding_client.model, query)
+        cached = _get_cached_query_vector(cache_key)
+        if cached is not None:
+            logger.debug(f"[VECTOR_STORE] Query embedding cache hit: '{query[:50]}'")
+            return cached
+
+        query_embeddings = await embedding_client.embed_texts([query])
+        return _cache_query_vector(cache_key, query_embeddings)
+
     def search(self, query: str, top_k: int = 5) -> List[Tuple[str, float]]:
         """
         Search for similar chunks.
@@ -179,49 +370,58 @@ class VectorStore:
         if not query or not query.strip():
             return []
         
-        # Use incremental search if enabled
-        if self.use_incremental:
-            return self._search_incremental(query, top_k)
-        
-        # Legacy single index search
-        if self.index is None or len(self.chunks) == 0:
+        # Legacy mode: skip the embedding call when there is nothing to search
+        if not self.use_incremental and (self.index is None or len(self.chunks) == 0):
             logger.warning("Index not loaded, returning empty results")
             return []
         
         logger.info(f"[VECTOR_STORE] Searching for: '{query[:50]}...' (top_k={top_k})")
         
-        # Get query embedding
-        embedding_client = get_embedding_client()
-        query_embeddings = _run_async(embedding_client.embed_texts([query]))
+        # Get normalized query embedding (cached per query text)
+        query_vector = self.embed_query(query)
         
-        if not query_embeddings:
+        if query_vector is None:
             logger.warning("Failed to generate query embedding")
             return []
         
-        query_vector = np.array([query_embeddings[0]], dtype=np.float32)
+        return self.search_by_embedding(query_vector, top_k)
+
+    async def asearch_by_embedding(
+        self, query_vector: np.ndarray, top_k: int = 5
+    ) -> List[Tuple[str, float]]:
+        """
+        Async variant of search_by_embedding.
+
+        Runs the FAISS lookup in a worker thread (FAISS releases the GIL),
+        so the event loop keeps serving other requests meanwhile.
+        """
+        return await asyncio.to_thread(self.search_by_embedding, query_vector, top_k)
+
+    def search_by_embedding(
+        self, query_vector: np.ndarray, top_k: int = 5
+    ) -> List[Tuple[str, float]]:
+        """
+        Search for similar chunks with a precomputed query vector.
         
-        # 验证归一化前的查询向量模长（调试用）
-        query_norm_before = np.linalg.norm(query_vector[0])
-        logger.info(
-            f"[VECTOR_STORE] Query vector norm before normalization: {query_norm_before:.4f}"
-        )
+        Lets callers embed a query once (see embed_query) and reuse the
+        vector across several lookups.
         
-        # 强制归一化查询向量（L2 normalization）
-        # 确保查询向量和索引向量在同一个单位球面上
-        faiss.normalize_L2(query_vector)
+        Args:
+            query_vector: L2-normalized query vector, shape (1, dim)
+            top_k: Number of results to return
         
-        # 验证归一化后的查询向量模长（应该是1.0）
-        query_norm_after = np.linalg.norm(query_vector[0])
-        if abs(query_norm_after - 1.0) > 0.01:
-            logger.warning(
-                f"[VECTOR_STORE] ⚠️ Query vector normalization may have failed! "
-                f"Expected norm=1.0, got {query_norm_after:.4f}"
-            )
-        else:
-            logger.info(
-                f"[VECTOR_STORE] ✓ Query vector normalized, norm={query_norm_after:.4f} "
-                f"(should be 1.0)"
-            )
+        Returns:
+            List of (chunk_text, similarity_score) tuples
+            Lower score means more similar (L2 distance)
+        """
+        # Use incremental search if enabled
+        if self.use_incremental:
+            return self._search_incremental(query_vector, top_k)
+        
+        # Legacy single index search
+        if self.index is None or len(self.chunks) == 0:
+            logger.warning("Index not loaded, returning empty results")
+            return []
         
         # Search
         distances, indices = self.index.search(query_vector, min(top_k, self.index.ntotal))
@@ -239,8 +439,9 @@ class VectorStore:
         
         # Build results
         results: List[Tuple[str, float]] = []
+        # IVF 探查的聚类内向量不足 k 个时，FAISS 用 -1 填充结果
         for i, (idx, dist) in enumerate(zip(indices[0], distances[0])):
-            if idx < len(self.chunks):
+            if 0 <= idx < len(self.chunks):
                 results.append((self.chunks[idx], float(dist)))
         
         logger.info(
@@ -250,20 +451,11 @@ class VectorStore:
         
         return results
 
-    def _search_incremental(self, query: str, top_k: int) -> List[Tuple[str, float]]:
+    def _search_incremental(
+        self, query_vector: np.ndarray, top_k: int
+    ) -> List[Tuple[str, float]]:
         """Search using base+delta incremental strategy."""
-        logger.info(f"[VECTOR_STORE] Incremental search: '{query[:50]}...' (top_k={top_k})")
-        
-        # Get query embedding
-        embedding_client = get_embedding_client()
-        query_embeddings = _run_async(embedding_client.embed_texts([query]))
-        
-        if not query_embeddings:
-            logger.warning("Failed to generate query embedding")
-            return []
-        
-        query_vector = np.array([query_embeddings[0]], dtype=np.float32)
-        faiss.normalize_L2(query_vector)
+        logger.info(f"[VECTOR_STORE] Incremental search (top_k={top_k})")
         
         # Search base index
         base_results: List[Tuple[str, float, str]] = []  # (text, distance, document_id)
@@ -272,7 +464,7 @@ class VectorStore:
             distances, indices = self.base_index.search(query_vector, base_top_k)
             
             for idx, dist in zip(indices[0], distances[0]):
-                if idx < len(self.base_chunks) and idx < len(self.base_document_ids):
+                if 0 <= idx < len(self.base_chunks) and idx < len(self.base_document_ids):
                     doc_id = self.base_document_ids[idx]
                     # Skip if migrated to delta
                     if doc_id not in self.document_id_to_base_index:
@@ -286,7 +478,7 @@ class VectorStore:
             distances, indices = self.delta_index.search(query_vector, delta_top_k)
             
             for idx, dist in zip(indices[0], distances[0]):
-                if idx < len(self.delta_chunks) and idx < len(self.delta_document_ids):
+                if 0 <= idx < len(self.delta_chunks) and idx < len(self.delta_document_ids):
                     doc_id = self.delta_document_ids[idx]
                     delta_results.append((self.delta_chunks[idx], float(dist), doc_id))
         
@@ -331,7 +523,7 @@ class VectorStore:
             return
         
         # Save FAISS index
-        faiss.write_index(self.index, str(self.index_path))
+        _write_index(self.index, self.index_path)
         logger.info(f"[VECTOR_STORE] Saved index to {self.index_path}")
         
         # Save chunk metadata
@@ -348,7 +540,7 @@ class VectorStore:
         
         # Save base index
         if self.base_index:
-            faiss.write_index(self.base_index, str(base_path))
+            _write_index(self.base_index, base_path)
             logger.info(f"[VECTOR_STORE] Saved base index: {self.base_index.ntotal} vectors")
             
             # Save base metadata
@@ -365,7 +557,7 @@ class VectorStore:
         
         # Save delta index
         if self.delta_index:
-            faiss.write_index(self.delta_index, str(delta_path))
+            _write_index(self.delta_index, delta_path)
             logger.info(f"[VECTOR_STORE] Saved delta index: {self.delta_index.ntotal} vectors")
             
             # Save delta metadata
@@ -392,6 +584,12 @@ class VectorStore:
         else:
             return self._load_legacy()
 
+    def _read_readonly_index(self, path: Path) -> faiss.Index:
+        """Read an index that is only searched after loading (mmap when enabled)."""
+        if self.use_mmap:
+            return faiss.read_index(str(path), _MMAP_READ_FLAGS)
+        return faiss.read_index(str(path))
+
     def _load_legacy(self) -> bool:
         """Load legacy single index."""
         if not self.index_path.exists() or not self.chunk_metadata_path.exists():
@@ -402,8 +600,9 @@ class VectorStore:
         
         try:
             # Load FAISS index
-            self.index = faiss.read_index(str(self.index_path))
+            self.index = self._read_readonly_index(self.index_path)
             self.dimension = self.index.d
+            self._apply_search_params(self.index)
             logger.info(
                 f"[VECTOR_STORE] Loaded index: {self.index.ntotal} vectors, "
                 f"dim={self.dimension}"
@@ -413,6 +612,7 @@ class VectorStore:
             with open(self.chunk_metadata_path, 'rb') as f:
                 self.chunks = pickle.load(f)
             logger.info(f"[VECTOR_STORE] Loaded {len(self.chunks)} chunks")
+            self._build_sku_index()
             
             if len(self.chunks) != self.index.ntotal:
                 logger.warning(
@@ -436,8 +636,9 @@ class VectorStore:
         # Load base index
         if base_path.exists() and metadata_path.exists():
             try:
-                self.base_index = faiss.read_index(str(base_path))
+                self.base_index = self._read_readonly_index(base_path)
                 self.dimension = self.base_index.d
+                self._apply_search_params(self.base_index)
                 
                 with open(metadata_path, 'rb') as f:
                     base_metadata = pickle.load(f)
@@ -7,7 +7,11 @@ from typing import List, Optional, Tuple
 from sqlalchemy.orm import Session
 
 from app.models.product_change_log import ChangeStatus, ChangeType, ProductChangeLog
-from app.repositories.product_repository import get_product_by_brand_and_sku
+from app.repositories import product_cache_repository as product_cache
+from app.repositories.product_repository import (
+    get_product_by_brand_and_sku,
+    refresh_candidate_rollup,
+)
 from app.services.product_vector_text_builder import ProductVectorTextBuilder
 from app.services.vector_store import VectorStore
 
@@ -208,6 +212,14 @@ class VectorSyncService:
         # Save vector store
         self.vector_store.save()
         
+        # Refresh candidate rollup for brands touched by this batch, then drop
+        # their shared (Redis) caches: changes are committed at this point
+        processed_logs = upsert_logs + delete_logs
+        self._refresh_candidate_rollups(processed_logs)
+        product_cache.invalidate_cached_candidates(log.brand_code for log in processed_logs)
+        # API 进程的相似SKU结果缓存 key 包含品牌版本号，递增后旧结果不再命中
+        product_cache.bump_brand_versions(log.brand_code for log in processed_logs)
+        
         logger.info(
             f"[VECTOR_SYNC] Batch sync completed: "
             f"success={stats['success']}, failed={stats['failed']}, skipped={stats['skipped']}"
@@ -215,6 +227,24 @@ class VectorSyncService:
         
         return stats
 
+    def _refresh_candidate_rollups(self, change_logs: List[ProductChangeLog]) -> None:
+        """
+        Rebuild product_candidates_by_brand for each brand in the change logs.
+        
+        Failures are logged and do not fail the sync; readers fall back to the
+        products table when a brand's rollup is missing.
+        
+        Args:
+            change_logs: Processed ProductChangeLog records
+        """
+        for brand_code in sorted({log.brand_code for log in change_logs}):
+            try:
+                refresh_candidate_rollup(self.db, brand_code)
+            except Exception as e:
+                logger.warning(
+                    f"[VECTOR_SYNC] Candidate rollup refresh failed: brand_code={brand_code}, error={e}"
+                )
+
     def _mark_failed(self, change_log: ProductChangeLog, error_msg: str) -> None:
         """
         Mark change log as failed and increment retry count.
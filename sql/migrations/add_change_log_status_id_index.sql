@@ -0,0 +1,26 @@
+-- Migration: Add (status, id) index to product_change_log
+-- Purpose: fetch_pending_changes 查询
+--   WHERE status = 'PENDING' AND id > :last_id ORDER BY id ASC LIMIT :limit
+-- 走联合索引范围扫描，扫描行数约等于 limit，无需 filesort
+
+-- Step 1: Add idx_pcl_status_id (if not exists)
+SET @idx_exists = (
+    SELECT COUNT(*)
+    FROM information_schema.STATISTICS
+    WHERE TABLE_SCHEMA = 'belle_ai'
+      AND TABLE_NAME = 'product_change_log'
+      AND INDEX_NAME = 'idx_pcl_status_id'
+);
+
+SET @sql = IF(@idx_exists = 0,
+    'ALTER TABLE belle_ai.product_change_log ADD INDEX idx_pcl_status_id (status, id)',
+    'SELECT ''Index idx_pcl_status_id already exists'' AS message'
+);
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+-- Step 2: Verify (key 应为 idx_pcl_status_id，Extra 中无 Using filesort)
+SHOW INDEX FROM belle_ai.product_change_log WHERE Key_name = 'idx_pcl_status_id';
+EXPLAIN SELECT * FROM belle_ai.product_change_log
+WHERE status = 'PENDING' AND id > 0 ORDER BY id ASC LIMIT 1000;
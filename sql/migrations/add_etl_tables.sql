@@ -30,6 +30,7 @@ CREATE TABLE IF NOT EXISTS product_change_log (
     UNIQUE KEY uq_change_log_brand_sku_version (brand_code, sku, data_version),
     INDEX idx_change_log_brand_sku (brand_code, sku),
     INDEX idx_change_log_status (status),
+    INDEX idx_pcl_status_id (status, id),
     INDEX idx_change_log_created (created_at)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='商品变更日志表，记录数据版本变更';
 
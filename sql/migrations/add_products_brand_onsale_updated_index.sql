@@ -0,0 +1,38 @@
+-- Migration: Add (brand_code, on_sale, updated_at) index to products (MySQL 8.0+)
+-- Purpose: get_candidate_products_by_brand 回退查询（物化表无数据时）
+--   WHERE brand_code = ? AND on_sale = 1 ORDER BY updated_at DESC LIMIT 300
+--   等值列在前、排序列在后，MySQL 反向扫描索引即可满足 ORDER BY DESC，无需 filesort
+-- 仅在 products 表存在 on_sale 列时创建
+
+-- Step 1: Add index (if on_sale exists and index not exists)
+SET @col_exists = (
+    SELECT COUNT(*)
+    FROM information_schema.COLUMNS
+    WHERE TABLE_SCHEMA = 'belle_ai'
+      AND TABLE_NAME = 'products'
+      AND COLUMN_NAME = 'on_sale'
+);
+
+SET @idx_exists = (
+    SELECT COUNT(*)
+    FROM information_schema.STATISTICS
+    WHERE TABLE_SCHEMA = 'belle_ai'
+      AND TABLE_NAME = 'products'
+      AND INDEX_NAME = 'idx_products_brand_onsale_updated'
+);
+
+SET @sql = IF(@col_exists = 0,
+    'SELECT ''Column on_sale not found, skipping idx_products_brand_onsale_updated'' AS message',
+    IF(@idx_exists = 0,
+        'ALTER TABLE belle_ai.products ADD INDEX idx_products_brand_onsale_updated (brand_code, on_sale, updated_at)',
+        'SELECT ''Index idx_products_brand_onsale_updated already exists'' AS message'
+    )
+);
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+-- Step 2: Verify (expect key=idx_products_brand_onsale_updated, no "Using filesort")
+SHOW INDEX FROM belle_ai.products WHERE Key_name = 'idx_products_brand_onsale_updated';
+-- EXPLAIN SELECT id FROM belle_ai.products
+--   WHERE brand_code = 'BL' AND on_sale = 1 ORDER BY updated_at DESC LIMIT 300;
@@ -0,0 +1,42 @@
+-- Migration: Add generated category column and candidate index to products (MySQL 5.7+)
+-- Purpose: get_candidate_products_by_brand 的 category 过滤下推到数据库
+--   WHERE brand_code = ? AND category = ? [AND on_sale = 1] ORDER BY updated_at DESC LIMIT 300
+-- category 由 attributes 派生（优先 $.category，其次 $."类目"），写入时自动维护，应用代码无需写该列
+
+-- Step 1: Add generated column (if not exists)
+SET @col_exists = (
+    SELECT COUNT(*)
+    FROM information_schema.COLUMNS
+    WHERE TABLE_SCHEMA = 'belle_ai'
+      AND TABLE_NAME = 'products'
+      AND COLUMN_NAME = 'category'
+);
+
+SET @sql = IF(@col_exists = 0,
+    'ALTER TABLE belle_ai.products ADD COLUMN category VARCHAR(64) GENERATED ALWAYS AS (COALESCE(JSON_UNQUOTE(JSON_EXTRACT(attributes, ''$.category'')), JSON_UNQUOTE(JSON_EXTRACT(attributes, ''$."类目"'')))) STORED COMMENT ''商品类目（由 attributes 派生）''',
+    'SELECT ''Column category already exists'' AS message'
+);
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+-- Step 2: Add candidate index (if not exists)
+SET @idx_exists = (
+    SELECT COUNT(*)
+    FROM information_schema.STATISTICS
+    WHERE TABLE_SCHEMA = 'belle_ai'
+      AND TABLE_NAME = 'products'
+      AND INDEX_NAME = 'idx_products_brand_category'
+);
+
+SET @sql = IF(@idx_exists = 0,
+    'ALTER TABLE belle_ai.products ADD INDEX idx_products_brand_category (brand_code, category, updated_at)',
+    'SELECT ''Index idx_products_brand_category already exists'' AS message'
+);
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+-- Step 3: Verify
+SHOW COLUMNS FROM belle_ai.products LIKE 'category';
+SHOW INDEX FROM belle_ai.products WHERE Key_name = 'idx_products_brand_category';
@@ -0,0 +1,40 @@
+-- Migration: Add (src_updated_at, style_brand_no, style_no) index to products_staging (MySQL 8.0+)
+-- Purpose: ETL 按水位分批读取
+--   WHERE src_updated_at > ? OR (src_updated_at = ? AND (style_brand_no, style_no) > (?, ?))
+--   ORDER BY src_updated_at, style_brand_no, style_no LIMIT 1000
+--   索引列顺序与 ORDER BY 一致，每批为索引范围扫描，无需全表扫描和 filesort
+-- 仅在 products_staging 表存在时创建
+
+-- Step 1: Add index (if table exists and index not exists)
+SET @tbl_exists = (
+    SELECT COUNT(*)
+    FROM information_schema.TABLES
+    WHERE TABLE_SCHEMA = 'belle_ai'
+      AND TABLE_NAME = 'products_staging'
+);
+
+SET @idx_exists = (
+    SELECT COUNT(*)
+    FROM information_schema.STATISTICS
+    WHERE TABLE_SCHEMA = 'belle_ai'
+      AND TABLE_NAME = 'products_staging'
+      AND INDEX_NAME = 'idx_staging_watermark'
+);
+
+SET @sql = IF(@tbl_exists = 0,
+    'SELECT ''Table products_staging not found, skipping idx_staging_watermark'' AS message',
+    IF(@idx_exists = 0,
+        'ALTER TABLE belle_ai.products_staging ADD INDEX idx_staging_watermark (src_updated_at, style_brand_no, style_no)',
+        'SELECT ''Index idx_staging_watermark already exists'' AS message'
+    )
+);
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+-- Step 2: Verify (expect key=idx_staging_watermark, no "Using filesort")
+SHOW INDEX FROM belle_ai.products_staging WHERE Key_name = 'idx_staging_watermark';
+-- EXPLAIN SELECT style_brand_no, style_no, src_updated_at FROM belle_ai.products_staging
+--   WHERE src_updated_at > '2024-01-01 00:00:00'
+--      OR (src_updated_at = '2024-01-01 00:00:00' AND (style_brand_no, style_no) > ('BL', 'S001'))
+--   ORDER BY src_updated_at, style_brand_no, style_no LIMIT 1000;
@@ -0,0 +1,21 @@
+-- ============================================
+-- AI Task Log JSON Columns & Guide Index Migration
+-- ============================================
+-- 说明：
+-- 1. input_data / output_result 从 TEXT 改为 JSON，支持 JSON_EXTRACT 服务端查询
+-- 2. 新增 (guide_id, created_at) 联合索引，匹配“查询导购最近任务”的访问模式
+-- 执行前必须：
+-- 1. 确认 MySQL 版本 >= 5.7
+-- 2. 确认已有数据都是合法 JSON（否则 MODIFY COLUMN 会失败）：
+--    SELECT COUNT(*) FROM ai_task_log
+--    WHERE JSON_VALID(input_data) = 0
+--       OR (output_result IS NOT NULL AND JSON_VALID(output_result) = 0);
+-- ============================================
+
+ALTER TABLE ai_task_log
+    MODIFY COLUMN input_data JSON NOT NULL COMMENT '输入数据（JSON格式）',
+    MODIFY COLUMN output_result JSON NULL COMMENT '输出结果（JSON格式）',
+    ADD INDEX idx_ai_log_guide_time (guide_id, created_at) COMMENT '导购-时间索引';
+
+-- 验证
+-- SHOW INDEX FROM ai_task_log WHERE Key_name = 'idx_ai_log_guide_time';
@@ -0,0 +1,14 @@
+-- Migration: Rebuild idx_ubl_user_sku with occurred_at DESC (MySQL 8+)
+-- Purpose: get_recent_behavior 查询
+--   WHERE user_id = ? AND sku = ? ORDER BY occurred_at DESC LIMIT 50
+-- 使用降序索引正向扫描，替代对升序索引的反向扫描
+
+-- Step 1: Rebuild index in one statement (no window without the index)
+ALTER TABLE belle_ai.user_behavior_logs
+    DROP INDEX idx_ubl_user_sku,
+    ADD INDEX idx_ubl_user_sku (user_id, sku, occurred_at DESC) COMMENT '用户-商品-时间复合索引';
+
+-- Step 2: Verify (key 应为 idx_ubl_user_sku，Extra 中无 Using filesort / Backward index scan)
+EXPLAIN SELECT * FROM belle_ai.user_behavior_logs
+WHERE user_id = 'user_001' AND sku = '8WZ01CM1'
+ORDER BY occurred_at DESC LIMIT 50;
@@ -0,0 +1,39 @@
+-- Migration: Create product_candidates_by_brand rollup table (MySQL 8.0+)
+-- Purpose: 物化每个品牌的候选商品（在售、按 updated_at desc 前 300 条），
+--   get_candidate_products_by_brand 按 (brand_code, candidate_rank) 主键顺序读取，
+--   不再对 products 做范围扫描 + 排序
+-- 刷新：向量同步任务处理完一批 product_change_log 后按品牌重建（refresh_candidate_rollup）
+
+-- Step 1: Create table
+CREATE TABLE IF NOT EXISTS belle_ai.`product_candidates_by_brand` (
+    `brand_code` VARCHAR(64) NOT NULL COMMENT '品牌代码',
+    `candidate_rank` SMALLINT UNSIGNED NOT NULL COMMENT '候选排名（1 为最近更新）',
+    `product_id` BIGINT NOT NULL COMMENT '商品主键ID（products.id）',
+    PRIMARY KEY (`brand_code`, `candidate_rank`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='品牌候选商品物化表';
+
+-- Step 2: Initial fill (on_sale = 1 only if products has the on_sale column)
+SET @on_sale_exists = (
+    SELECT COUNT(*)
+    FROM information_schema.COLUMNS
+    WHERE TABLE_SCHEMA = 'belle_ai'
+      AND TABLE_NAME = 'products'
+      AND COLUMN_NAME = 'on_sale'
+);
+
+DELETE FROM belle_ai.product_candidates_by_brand;
+
+SET @sql = CONCAT(
+    'INSERT INTO belle_ai.product_candidates_by_brand (brand_code, candidate_rank, product_id) ',
+    'SELECT brand_code, candidate_rank, id FROM (',
+    'SELECT brand_code, id, ROW_NUMBER() OVER (PARTITION BY brand_code ORDER BY updated_at DESC, id DESC) AS candidate_rank ',
+    'FROM belle_ai.products',
+    IF(@on_sale_exists = 0, '', ' WHERE on_sale = 1'),
+    ') ranked WHERE candidate_rank <= 300'
+);
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+-- Step 3: Verify
+SELECT brand_code, COUNT(*) AS candidates FROM belle_ai.product_candidates_by_brand GROUP BY brand_code;
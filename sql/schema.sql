@@ -26,7 +26,7 @@ CREATE TABLE user_behavior_logs (
     event_type VARCHAR(32) NOT NULL COMMENT '事件类型：browse-浏览, enter_buy_page-进入购买页, click_size_chart-点击尺码表, favorite-收藏, share-分享',
     stay_seconds INT NOT NULL DEFAULT 0 COMMENT '停留时长（秒）',
     occurred_at DATETIME NOT NULL COMMENT '事件发生时间',
-    INDEX idx_ubl_user_sku (user_id, sku, occurred_at) COMMENT '用户-商品-时间复合索引',
+    INDEX idx_ubl_user_sku (user_id, sku, occurred_at DESC) COMMENT '用户-商品-时间复合索引',
     INDEX idx_ubl_event_time (event_type, occurred_at) COMMENT '事件类型-时间索引'
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='用户行为日志表';
 
@@ -35,13 +35,14 @@ CREATE TABLE ai_task_log (
     task_id VARCHAR(64) PRIMARY KEY COMMENT '任务ID，唯一标识',
     guide_id VARCHAR(64) NULL COMMENT '导购ID',
     scene_type VARCHAR(32) NOT NULL COMMENT '场景类型：copy-文案生成, product_analyze-商品分析, intent-意图分析',
-    input_data TEXT NOT NULL COMMENT '输入数据（JSON格式）',
-    output_result TEXT NULL COMMENT '输出结果（JSON格式）',
+    input_data JSON NOT NULL COMMENT '输入数据（JSON格式）',
+    output_result JSON NULL COMMENT '输出结果（JSON格式）',
     model_name VARCHAR(64) NULL COMMENT '使用的模型名称',
     latency_ms INT NULL COMMENT '请求耗时（毫秒）',
     is_adopted TINYINT(1) NOT NULL DEFAULT 0 COMMENT '是否被采用：0-未采用, 1-已采用',
     created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
-    INDEX idx_ai_log_scene_time (scene_type, created_at) COMMENT '场景类型-时间索引'
+    INDEX idx_ai_log_scene_time (scene_type, created_at) COMMENT '场景类型-时间索引',
+    INDEX idx_ai_log_guide_time (guide_id, created_at) COMMENT '导购-时间索引'
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='AI调用任务日志表';
 
 -- 4. 导购表 (guides)
@@ -0,0 +1,54 @@
+"""Tests for user behavior repository."""
+from __future__ import annotations
+
+import threading
+from unittest.mock import MagicMock
+
+import pytest
+
+from app.repositories.behavior_repository import get_recent_behavior, get_recent_behavior_bulk
+
+
+@pytest.mark.asyncio
+async def test_recent_behavior_query_runs_off_event_loop():
+    """测试：同步 Session 查询在工作线程中执行，结果按原样返回。"""
+    logs = [MagicMock(event_type="view"), MagicMock(event_type="favorite")]
+    query_threads = []
+    db = MagicMock()
+
+    def execute(stmt):
+        query_threads.append(threading.current_thread())
+        return MagicMock(**{"scalars.return_value.all.return_value": logs})
+
+    db.execute.side_effect = execute
+
+    result = await get_recent_behavior(db, user_id="u1", sku="8WZ01CM1", limit=10)
+
+    assert result == logs
+    assert query_threads and query_threads[0] is not threading.main_thread()
+    assert "LIMIT" in str(db.execute.call_args.args[0])
+
+
+@pytest.mark.asyncio
+async def test_recent_behavior_bulk_groups_logs_by_sku_in_one_query():
+    """测试：多个 SKU 一次查询（窗口函数），结果按 SKU 分组，无日志的 SKU 返回空列表。"""
+    logs = [MagicMock(sku="A1"), MagicMock(sku="A1"), MagicMock(sku="B2")]
+    db = MagicMock()
+    db.execute.return_value.scalars.return_value.all.return_value = logs
+
+    result = await get_recent_behavior_bulk(db, "u1", ["A1", "B2", "C3"], per_sku_limit=2)
+
+    assert result == {"A1": logs[:2], "B2": logs[2:], "C3": []}
+    db.execute.assert_called_once()
+    sql = str(db.execute.call_args.args[0])
+    assert "row_number() OVER (PARTITION BY user_behavior_logs.sku" in sql
+    assert "IN (__[POSTCOMPILE_sku_1])" in sql
+
+
+@pytest.mark.asyncio
+async def test_recent_behavior_bulk_without_skus_skips_query():
+    """测试：SKU 列表为空时不访问数据库。"""
+    db = MagicMock()
+
+    assert await get_recent_behavior_bulk(db, "u1", []) == {}
+    db.execute.assert_not_called()
@@ -0,0 +1,38 @@
+"""Tests for database helpers."""
+from __future__ import annotations
+
+from unittest.mock import patch
+
+from sqlalchemy import create_engine, text
+
+from app.core import database
+from app.core.database import get_table_columns, invalidate_table_columns
+
+
+def test_table_columns_reflected_once_per_table():
+    """测试：表结构每个数据库每张表只反射一次，表不存在时返回空集合。"""
+    engine = create_engine("sqlite://")
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE products (id INTEGER, sku TEXT, on_sale INTEGER)"))
+
+    with patch.object(database, "inspect", wraps=database.inspect) as inspect:
+        assert get_table_columns(engine, "products") == {"id", "sku", "on_sale"}
+        assert get_table_columns(engine, "products") == {"id", "sku", "on_sale"}
+        assert get_table_columns(engine, "product_candidates_by_brand") == frozenset()
+
+    assert inspect.call_count == 2
+
+
+def test_invalidate_table_columns_forces_reflection():
+    """测试：清除某表缓存后重新反射，能看到迁移新增的字段。"""
+    engine = create_engine("sqlite://")
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE products_staging (style_no TEXT)"))
+    assert get_table_columns(engine, "products_staging") == {"style_no"}
+
+    with engine.begin() as connection:
+        connection.execute(text("ALTER TABLE products_staging ADD COLUMN on_sale INTEGER"))
+    assert get_table_columns(engine, "products_staging") == {"style_no"}
+
+    invalidate_table_columns("products_staging")
+    assert get_table_columns(engine, "products_staging") == {"style_no", "on_sale"}
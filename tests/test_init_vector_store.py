@@ -0,0 +1,100 @@
+"""Tests for product text preparation in vector store initialization."""
+from __future__ import annotations
+
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from app.db.init_vector_store import (
+    PRODUCT_BATCH_SIZE,
+    _product_to_natural_language,
+    chunk_product_texts,
+    load_products_from_db,
+)
+
+
+def _make_product(**overrides) -> SimpleNamespace:
+    fields = {
+        "sku": "8WZ01CM1",
+        "name": "舒适跑鞋",
+        "attributes": None,
+        "tags": None,
+        "description": None,
+        "price": None,
+    }
+    fields.update(overrides)
+    return SimpleNamespace(**fields)
+
+
+class TestProductToNaturalLanguage:
+    """Test cases for _product_to_natural_language."""
+
+    def test_type_keyword_follows_priority_order(self):
+        """测试：名称包含多个类型词时按关键词表顺序取第一个（马丁靴子 -> 靴子）。"""
+        text = _product_to_natural_language(_make_product(name="经典马丁靴子"))
+
+        assert text.startswith("这是一款靴子，")
+
+    def test_full_description(self):
+        """测试：颜色、类型、名称、标签、场景季节、材质、价格和SKU按顺序组合。"""
+        product = _make_product(
+            name="女款运动鞋",
+            attributes={"color": "白色", "scene": "通勤", "season": "春季", "material": "网面"},
+            tags=["舒适", "未知", "透气"],
+            description="软底设计",
+            price=398,
+        )
+
+        assert _product_to_natural_language(product) == (
+            "这是一款白色的运动鞋，商品名称：女款运动鞋，具有舒适、透气的特点，"
+            "适合春季通勤穿着，材质为网面，软底设计，价格为398元。商品编号：8WZ01CM1。"
+        )
+
+
+def test_load_products_streams_in_batches():
+    """测试：商品按批流式读取，并在结束后关闭会话。"""
+    db = MagicMock()
+    db.__enter__.return_value = db
+    db.query.return_value.yield_per.return_value = iter(
+        [_make_product(sku="A1", name="跑鞋"), _make_product(sku="B2", name="凉鞋")]
+    )
+
+    with patch("app.db.init_vector_store.SessionLocal", return_value=db):
+        product_data = load_products_from_db()
+
+    db.query.return_value.yield_per.assert_called_once_with(PRODUCT_BATCH_SIZE)
+    assert [item["sku"] for item in product_data] == ["A1", "B2"]
+    db.__exit__.assert_called_once()
+
+
+def test_load_products_parallel_matches_serial():
+    """测试：多进程转换与串行转换结果一致。"""
+    products = [_make_product(sku=f"SKU{i}", name=f"第{i}款马丁靴") for i in range(4)]
+
+    def load(min_products):
+        db = MagicMock()
+        db.__enter__.return_value = db
+        db.query.return_value.yield_per.return_value = iter(products)
+        with patch("app.db.init_vector_store.SessionLocal", return_value=db), patch(
+            "app.db.init_vector_store.PARALLEL_MIN_PRODUCTS", min_products
+        ):
+            return load_products_from_db()
+
+    assert load(min_products=1) == load(min_products=100)
+
+
+def test_chunk_product_texts_appends_sku_marker():
+    """测试：每个chunk末尾带 SKU 标识且保持商品顺序，空输入不报错。"""
+    product_data = [
+        {"sku": "A1", "text": "短文本"},
+        {"sku": "", "text": "无SKU"},
+        {"sku": "B2", "text": "长" * 400},
+        {"sku": "C3", "text": "末尾"},
+    ]
+
+    chunks = chunk_product_texts(product_data, chunk_size=300, overlap=50)
+
+    assert chunks[:2] == ["短文本 [SKU:A1]", "无SKU"]
+    assert len(chunks) > 4
+    assert all(chunk.endswith(" [SKU:B2]") for chunk in chunks[2:-1])
+    assert chunks[-1] == "末尾 [SKU:C3]"
+    assert chunk_product_texts([]) == []
@@ -0,0 +1,75 @@
+"""Tests for TraceIdMiddleware."""
+from __future__ import annotations
+
+import logging
+
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from app.core.middleware import TraceIdMiddleware
+from app.core.trace_context import get_trace_id
+
+
+def _make_client(**middleware_options) -> TestClient:
+    app = FastAPI()
+    app.add_middleware(TraceIdMiddleware, **{"sample_rate": 1.0, **middleware_options})
+
+    @app.get("/health")
+    async def health() -> dict:
+        return {"status": "ok"}
+
+    @app.get("/trace")
+    async def trace() -> dict:
+        return {"trace_id": get_trace_id()}
+
+    @app.get("/missing")
+    async def missing() -> dict:
+        raise HTTPException(status_code=404)
+
+    return TestClient(app)
+
+
+def test_request_trace_id_is_propagated():
+    """测试：请求头中的 trace_id 设置到上下文并在响应头返回。"""
+    response = _make_client().get("/trace", headers={"X-Trace-Id": "abc123"})
+
+    assert response.status_code == 200
+    assert response.json() == {"trace_id": "abc123"}
+    assert response.headers["x-trace-id"] == "abc123"
+
+
+def test_missing_trace_id_is_generated():
+    """测试：无 trace_id 请求头时生成新的 trace_id。"""
+    response = _make_client().get("/trace")
+
+    trace_id = response.headers["x-trace-id"]
+    assert len(trace_id) == 22
+    assert response.json() == {"trace_id": trace_id}
+
+
+def test_trace_id_header_is_case_insensitive():
+    """测试：请求头名大小写不影响 trace_id 提取。"""
+    response = _make_client().get("/trace", headers={"x-TRACE-id": "lower123"})
+
+    assert response.json() == {"trace_id": "lower123"}
+
+
+def test_health_access_log_is_debug(caplog):
+    """测试：探活路径的 access log 为 DEBUG，业务路径为 INFO。"""
+    client = _make_client()
+    with caplog.at_level(logging.DEBUG, logger="app.core.middleware"):
+        client.get("/health")
+        client.get("/trace")
+
+    levels = {record.getMessage().split()[2]: record.levelno for record in caplog.records}
+    assert levels == {"/health": logging.DEBUG, "/trace": logging.INFO}
+
+
+def test_fast_success_is_sampled_but_errors_always_logged(caplog):
+    """测试：采样率为0时快速成功请求不记录，错误请求仍记录。"""
+    client = _make_client(sample_rate=0.0, slow_ms=60_000)
+    with caplog.at_level(logging.INFO, logger="app.core.middleware"):
+        client.get("/trace")
+        client.get("/missing")
+
+    assert [record.getMessage().split()[2] for record in caplog.records] == ["/missing"]
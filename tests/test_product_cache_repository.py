@@ -0,0 +1,93 @@
+"""Tests for the Redis candidate products cache."""
+from __future__ import annotations
+
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.repositories import product_cache_repository
+from app.repositories.product_repository import (
+    CandidateProduct,
+    get_candidate_products_by_brand,
+)
+
+
+class FakeRedis:
+    """最小的内存版 Redis（仅实现本缓存用到的命令）。"""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def setex(self, key, ttl, value):
+        self.data[key] = value
+
+    def sadd(self, key, member):
+        self.data.setdefault(key, set()).add(member)
+
+    def smembers(self, key):
+        return set(self.data.get(key, set()))
+
+    def expire(self, key, ttl):
+        pass
+
+    def incr(self, key):
+        self.data[key] = str(int(self.data.get(key, b"0")) + 1).encode()
+        return int(self.data[key])
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    def pipeline(self):
+        return self
+
+    def execute(self):
+        pass
+
+
+@pytest.fixture
+def fake_redis():
+    client = FakeRedis()
+    with patch.object(product_cache_repository, "get_redis_client", return_value=client):
+        yield client
+
+
+def test_candidates_cached_and_invalidated_by_brand(fake_redis):
+    """测试：候选列表按参数缓存，按品牌 tag 集合整体失效。"""
+    db = MagicMock()
+    updated_at = datetime(2024, 5, 1, 12, 30)
+    rows = [(1, "BL", "SKU1", "商品1", ["舒适"], {"color": "黑色"}, updated_at)]
+    with patch(
+        "app.repositories.product_repository._query_candidate_products",
+        return_value=[CandidateProduct._make(row) for row in rows],
+    ) as query:
+        first = get_candidate_products_by_brand(db, "BL")
+        cached = get_candidate_products_by_brand(db, "BL")
+        assert query.call_count == 1
+        assert cached == first and cached[0].updated_at == updated_at
+
+        product_cache_repository.invalidate_cached_candidates(["BL"])
+        get_candidate_products_by_brand(db, "BL")
+        assert query.call_count == 2
+
+
+def test_brand_version_bumped_once_per_brand(fake_redis):
+    """测试：品牌版本号按品牌递增（同批次重复品牌只递增一次），未设置时为 0。"""
+    assert product_cache_repository.get_brand_version("BL") == 0
+
+    product_cache_repository.bump_brand_versions(["BL", "BL", "HP"])
+
+    assert product_cache_repository.get_brand_version("BL") == 1
+    assert product_cache_repository.get_brand_version("HP") == 1
+    assert product_cache_repository.get_brand_version("XX") == 0
+
+
+def test_brand_version_zero_without_redis():
+    """测试：Redis 不可用时版本号恒为 0，递增静默跳过。"""
+    with patch.object(product_cache_repository, "get_redis_client", return_value=None):
+        product_cache_repository.bump_brand_versions(["BL"])
+        assert product_cache_repository.get_brand_version("BL") == 0
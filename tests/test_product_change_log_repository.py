@@ -0,0 +1,35 @@
+"""Tests for product change log repository."""
+from __future__ import annotations
+
+from unittest.mock import MagicMock
+
+from app.repositories.product_change_log_repository import ProductChangeLogRepository
+
+
+def test_iter_pending_changes_streams_with_yield_per():
+    """测试：流式读取使用 yield_per，过滤和分页条件与批量读取一致。"""
+    logs = [MagicMock(id=11), MagicMock(id=12)]
+    db = MagicMock()
+    db.execute.return_value.scalars.return_value = iter(logs)
+    repo = ProductChangeLogRepository(db)
+
+    assert list(repo.iter_pending_changes(limit=100, last_id=10, yield_per=50)) == logs
+
+    stmt = db.execute.call_args.args[0]
+    assert stmt.get_execution_options()["yield_per"] == 50
+    sql = str(stmt)
+    assert "product_change_log.id > :id_1" in sql
+    assert "ORDER BY product_change_log.id ASC" in sql
+
+
+def test_fetch_pending_changes_returns_list_without_streaming():
+    """测试：批量读取返回列表，不开启服务端游标。"""
+    db = MagicMock()
+    db.execute.return_value.scalars.return_value = iter([MagicMock(id=1)])
+
+    records = ProductChangeLogRepository(db).fetch_pending_changes(limit=10)
+
+    assert [record.id for record in records] == [1]
+    stmt = db.execute.call_args.args[0]
+    assert "yield_per" not in stmt.get_execution_options()
+    assert "product_change_log.id >" not in str(stmt)
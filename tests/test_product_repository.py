@@ -0,0 +1,177 @@
+"""Tests for product repository upserts."""
+from __future__ import annotations
+
+from unittest.mock import MagicMock, patch
+
+import pytest
+from sqlalchemy import select
+
+from app.models.product import Product
+from app.repositories.product_repository import (
+    CandidateProduct,
+    get_candidate_products_by_brand,
+    get_product_by_brand_and_sku,
+    refresh_candidate_rollup,
+    upsert_product_by_brand_and_sku,
+    upsert_products_bulk,
+)
+
+
+# 表名 -> 字段名集合（代替数据库反射；空集合表示表不存在）
+_TABLES: dict[str, frozenset[str]] = {}
+
+
+@pytest.fixture(autouse=True)
+def table_columns():
+    _TABLES.clear()
+    _TABLES["product_candidates_by_brand"] = frozenset()
+    with patch(
+        "app.repositories.product_repository.get_table_columns",
+        side_effect=lambda bind, table_name: _TABLES[table_name],
+    ):
+        yield
+
+
+def _make_db(columns=("id", "brand_code", "sku", "on_sale")) -> MagicMock:
+    """Mock session: products has `columns`, every INSERT reports rowcount=1."""
+    _TABLES["products"] = frozenset(columns)
+    db = MagicMock()
+    db.execute.return_value = MagicMock(rowcount=1, lastrowid=42)
+    return db
+
+
+def _row(i: int, **extra) -> dict:
+    return {
+        "brand_code": "BL",
+        "sku": f"SKU{i}",
+        "name": f"商品{i}",
+        "price": "199.00",
+        "tags": ["舒适"],
+        "attributes": {"color": "黑色"},
+        **extra,
+    }
+
+
+def test_bulk_upsert_chunks_rows_and_commits_once():
+    """测试：按 chunk_size 拆分为多行 INSERT，只提交一次。"""
+    db = _make_db()
+
+    affected_rows = upsert_products_bulk(db, [_row(i) for i in range(5)], chunk_size=2)
+
+    assert affected_rows == 3
+    inserts = [call.args for call in db.execute.call_args_list]
+    assert [len({key.rsplit("_", 1)[1] for key in params}) for _, params in inserts] == [2, 2, 1]
+    sql, params = inserts[0]
+    assert "ON DUPLICATE KEY UPDATE" in str(sql)
+    assert "on_sale" not in str(sql), "on_sale is only written when every row provides it"
+    assert params["tags_0"] == '["舒适"]'
+    assert params["attributes_1"] == '{"color":"黑色"}'
+    db.commit.assert_called_once()
+
+
+def test_json_string_values_passed_through_unparsed():
+    """测试：已是 JSON 字符串的 tags / attributes 原样写入，不在仓储层重复解析。"""
+    db = _make_db()
+
+    upsert_products_bulk(db, [_row(0, tags='["舒适"]', attributes="{not json")])
+
+    params = db.execute.call_args.args[1]
+    assert (params["tags_0"], params["attributes_0"]) == ('["舒适"]', "{not json")
+
+
+def test_bulk_upsert_empty_rows_is_noop():
+    """测试：空输入不访问数据库。"""
+    db = _make_db()
+
+    assert upsert_products_bulk(db, []) == 0
+    db.execute.assert_not_called()
+    db.commit.assert_not_called()
+
+
+def test_single_upsert_returns_row_id_without_fetch_back():
+    """测试：单条 upsert 通过 LAST_INSERT_ID(id) 拿到行 id，不回查商品，也不提交事务。"""
+    db = _make_db(columns=("id", "brand_code", "sku"))
+
+    product = upsert_product_by_brand_and_sku(db, _row(7))
+
+    assert (product.id, product.brand_code, product.sku, product.name) == (42, "BL", "SKU7", "商品7")
+    sql = str(db.execute.call_args.args[0])
+    assert "id = LAST_INSERT_ID(id)" in sql
+    db.query.assert_not_called()
+    db.commit.assert_not_called()
+
+
+def test_category_filtered_in_database_when_column_exists():
+    """测试：表中有生成列 category 时在数据库侧过滤，不在 Python 中过滤。"""
+    db = _make_db(columns=("id", "brand_code", "sku", "category"))
+    db.execute.return_value = [(1, "BL", "SKU1", "商品1", None, {"category": "其他"}, None)]
+
+    products = get_candidate_products_by_brand(db, "BL", category="运动鞋", check_on_sale=False)
+
+    assert products == [CandidateProduct(1, "BL", "SKU1", "商品1", None, {"category": "其他"}, None)]
+    sql = str(db.execute.call_args.args[0])
+    assert sql.startswith("SELECT products.id, products.brand_code")
+    assert "category = :category" in sql
+    assert db.execute.call_args.args[0].compile().params["category"] == "运动鞋"
+
+
+def test_category_filtered_in_python_without_column():
+    """测试：无 category 列时按 COALESCE(category, 类目) 精确匹配，与生成列语义一致。"""
+    db = _make_db(columns=("id", "brand_code", "sku"))
+    rows = [
+        (1, "BL", "SKU1", "商品1", None, {"category": "运动鞋"}, None),
+        (2, "BL", "SKU2", "商品2", None, {"类目": "凉鞋"}, None),
+        (3, "BL", "SKU3", "商品3", None, {"category": "休闲凉鞋"}, None),
+        (4, "BL", "SKU4", "商品4", None, {"category": "运动鞋", "类目": "凉鞋"}, None),
+    ]
+    db.execute.return_value = rows
+
+    products = get_candidate_products_by_brand(db, "BL", category="凉鞋")
+
+    assert [product.sku for product in products] == ["SKU2"]
+    assert "category" not in str(db.execute.call_args.args[0])
+
+
+def test_lookup_by_brand_and_sku_defers_description():
+    """测试：按业务主键查询只加载常用字段，description 延迟加载。"""
+    db = MagicMock()
+
+    get_product_by_brand_and_sku(db, "BL", "SKU1")
+
+    options = db.query.return_value.options.call_args.args
+    sql = str(select(Product).options(*options))
+    assert "products.attributes" in sql and "products.image_url" in sql
+    assert "products.description" not in sql
+
+
+def test_candidates_read_from_rollup_when_available():
+    """测试：物化表存在且有数据时按 candidate_rank 读取，不查询 products 排序。"""
+    db = _make_db()
+    db.execute.return_value = [(1, "BL", "SKU1", "商品1", None, None, None)]
+    _TABLES["product_candidates_by_brand"] = frozenset({"brand_code", "candidate_rank", "product_id"})
+
+    products = get_candidate_products_by_brand(db, "BL")
+
+    assert [product.sku for product in products] == ["SKU1"]
+    sql = str(db.execute.call_args.args[0])
+    assert "FROM product_candidates_by_brand JOIN products" in sql
+    assert "ORDER BY product_candidates_by_brand.candidate_rank" in sql
+    db.execute.assert_called_once()
+
+
+def test_refresh_candidate_rollup_rebuilds_brand_in_one_transaction():
+    """测试：刷新物化表先删除旧排名再写入，只提交一次；物化表不存在时不执行。"""
+    db = _make_db(columns=("id", "brand_code", "sku", "on_sale"))
+    _TABLES["product_candidates_by_brand"] = frozenset({"brand_code", "candidate_rank", "product_id"})
+
+    assert refresh_candidate_rollup(db, "BL") == 1
+
+    statements = [str(call.args[0]) for call in db.execute.call_args_list]
+    assert statements[-2].startswith("DELETE FROM product_candidates_by_brand")
+    assert "ROW_NUMBER() OVER" in statements[-1] and "on_sale = 1" in statements[-1]
+    db.commit.assert_called_once()
+
+    _TABLES["product_candidates_by_brand"] = frozenset()
+    db.reset_mock()
+    assert refresh_candidate_rollup(db, "BL") == 0
+    db.execute.assert_not_called()
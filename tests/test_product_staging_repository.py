@@ -0,0 +1,131 @@
+"""Tests for product staging repository batch fetching."""
+from __future__ import annotations
+
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.repositories.product_staging_repository import (
+    STAGING_YIELD_PER,
+    ProductStagingRepository,
+    _resolve_field_aliases,
+)
+
+_COLUMNS = frozenset({"style_brand_no", "style_no", "src_updated_at", "commodity_name", "price"})
+
+
+@pytest.fixture
+def repo():
+    db = MagicMock()
+    db.execute.return_value.partitions.return_value = []
+    with patch(
+        "app.repositories.product_staging_repository.get_table_columns",
+        return_value=_COLUMNS,
+    ):
+        yield ProductStagingRepository(db)
+
+
+def test_field_aliases_resolved_once_per_schema(repo):
+    """测试：字段映射按表结构缓存，多批次只解析一次。"""
+    _resolve_field_aliases.cache_clear()
+
+    for _ in range(3):
+        repo.fetch_batch_by_watermark("products_staging", None, None, limit=10)
+
+    assert _resolve_field_aliases.cache_info().misses == 1
+    _, field_aliases = _resolve_field_aliases(_COLUMNS)
+    assert field_aliases["name"] == "commodity_name"
+    assert field_aliases["on_sale"] is None
+
+
+def test_missing_required_fields_raises(repo):
+    """测试：缺少水位必需字段时报错。"""
+    with patch(
+        "app.repositories.product_staging_repository.get_table_columns",
+        return_value=frozenset({"style_no"}),
+    ), pytest.raises(ValueError, match="Missing required fields"):
+        repo.fetch_batch_by_watermark("products_staging", None, None)
+
+
+def test_incremental_fetch_uses_row_value_watermark(repo):
+    """测试：增量读取按 (style_brand_no, style_no) 行值比较，不拼接 key。"""
+    repo.fetch_batch_by_watermark(
+        "products_staging", datetime(2024, 1, 1), "BL#S001", limit=10
+    )
+
+    sql, params = repo.db.execute.call_args.args
+    assert "(style_brand_no, style_no) > (:last_brand, :last_style)" in str(sql)
+    assert "CONCAT" not in str(sql)
+    assert (params["last_brand"], params["last_style"]) == ("BL", "S001")
+
+
+def test_batch_streamed_with_server_side_cursor(repo):
+    """测试：按水位读取使用服务端游标按 yield_per 分块拉取，list 形式与生成器结果一致。"""
+    # 行按 SELECT 字段顺序：style_brand_no, style_no, src_updated_at, commodity_name, price
+    rows = [("BL", "S001", datetime(2024, 1, 1), "跑鞋", 199)]
+    repo.db.execute.return_value.partitions.side_effect = lambda: iter([rows])
+
+    records = repo.fetch_batch_by_watermark("products_staging", None, None, limit=10)
+
+    options = repo.db.execute.call_args.args[0].get_execution_options()
+    assert options["stream_results"] is True and options["yield_per"] == STAGING_YIELD_PER
+    assert [(r["style_no"], r["name"], r["price"], r["on_sale"]) for r in records] == [
+        ("S001", "跑鞋", 199, None)
+    ]
+    assert list(repo.iter_batch_by_watermark("products_staging", None, None)) == records
+
+
+def test_columnar_fetch_matches_records(repo):
+    """测试：列式读取按块转置为字段列表，与逐行记录一致，未映射字段为 None 列。"""
+    rows = [
+        ("BL", "S001", datetime(2024, 1, 1), "跑鞋", 199),
+        ("BL", "S002", datetime(2024, 1, 2), "凉鞋", 99),
+    ]
+    repo.db.execute.return_value.partitions.side_effect = lambda: iter([rows[:1], rows[1:]])
+
+    columns = repo.fetch_batch_columnar("products_staging", None, None)
+    records = repo.fetch_batch_by_watermark("products_staging", None, None)
+
+    assert columns["style_no"] == ["S001", "S002"]
+    assert columns["on_sale"] == [None, None]
+    assert [dict(zip(columns, values)) for values in zip(*columns.values())] == records
+
+
+def test_watermark_is_last_record_of_ordered_batch(repo):
+    """测试：有序批次的水位取最后一条记录，与逐条求最大值结果一致。"""
+    rows = [
+        ("BL", "S002", datetime(2024, 1, 1), "跑鞋", 199),
+        ("BL", "S001", datetime(2024, 1, 2), "凉鞋", 99),
+        ("BL", "S003", datetime(2024, 1, 2), "靴子", 299),
+    ]
+    repo.db.execute.return_value.partitions.side_effect = lambda: iter([rows])
+
+    records, watermark = repo.fetch_batch_with_watermark("products_staging", None, None)
+
+    assert watermark == (datetime(2024, 1, 2), "BL#S003")
+    assert repo.get_max_updated_at_and_key(records) == watermark
+    assert repo.get_max_updated_at_and_key(records[::-1]) == watermark
+    assert repo.get_max_updated_at_and_key([]) == (None, None)
+
+
+def test_batch_statement_built_once_per_shape(repo):
+    """测试：相同表结构与水位形态的批次复用同一个预编译语句。"""
+    for key in ("BL#S001", "BL#S002"):
+        repo.fetch_batch_by_watermark("products_staging", datetime(2024, 1, 1), key)
+    first, second = (call.args[0] for call in repo.db.execute.call_args_list)
+
+    assert first is second
+
+
+def test_known_columns_skip_schema_reflection():
+    """测试：传入已知字段时不反射表结构，按已知字段规划查询。"""
+    db = MagicMock()
+    db.execute.return_value.partitions.return_value = []
+    repo = ProductStagingRepository(db, known_columns=["style_brand_no", "style_no", "src_updated_at", "on_sale"])
+
+    with patch("app.repositories.product_staging_repository.get_table_columns") as get_table_columns:
+        repo.fetch_batch_by_watermark("products_staging", None, None)
+
+    get_table_columns.assert_not_called()
+    assert "SELECT style_brand_no, style_no, src_updated_at, on_sale" in str(db.execute.call_args.args[0])
@@ -0,0 +1,26 @@
+"""Tests for product upsert service."""
+from __future__ import annotations
+
+from unittest.mock import MagicMock, patch
+
+from app.services.product_upsert_service import ProductUpsertService
+
+
+def test_upsert_leaves_commit_to_caller():
+    """测试：新商品 upsert 与变更日志在调用方事务内执行，变更日志写入使用 SAVEPOINT。"""
+    db = MagicMock()
+    data = {"brand_code": "BL", "sku": "SKU1", "name": "商品", "price": "199.00"}
+
+    with patch(
+        "app.services.product_upsert_service.get_product_by_brand_and_sku", return_value=None
+    ) as lookup, patch("app.services.product_upsert_service.upsert_product_by_brand_and_sku") as upsert:
+        changed, data_version = ProductUpsertService(db).upsert_product(data)
+
+    assert changed is True and data_version
+    lookup.assert_called_once_with(db, "BL", "SKU1")
+    upsert.assert_called_once_with(db, data)
+    db.begin_nested.assert_called_once()
+    db.add.assert_called_once()
+    db.commit.assert_not_called()
+    db.rollback.assert_not_called()
+
@@ -0,0 +1,54 @@
+"""Tests for the shared Redis client."""
+from __future__ import annotations
+
+import sys
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.core import redis_client
+from app.core.redis_client import REDIS_MAX_CONNECTIONS, get_redis_client
+from app.repositories import product_cache_repository, vision_feature_cache_repository
+
+
+@pytest.fixture
+def redis_module():
+    """替换 redis 模块并重置懒加载的客户端。"""
+    module = MagicMock()
+    with patch.dict(sys.modules, {"redis": module}), patch.object(
+        redis_client, "_redis_client", None
+    ), patch.object(redis_client, "_redis_retry_at", 0.0), patch.object(
+        redis_client,
+        "get_settings",
+        return_value=SimpleNamespace(redis_url="redis://cache:6380/2"),
+    ):
+        yield module
+
+
+def test_redis_client_uses_bounded_connection_pool(redis_module):
+    """测试：Redis 客户端基于显式连接池创建，且只创建一次。"""
+    client = get_redis_client()
+
+    assert get_redis_client() is client
+    from_url = redis_module.ConnectionPool.from_url
+    from_url.assert_called_once()
+    assert from_url.call_args.args == ("redis://cache:6380/2",)
+    assert from_url.call_args.kwargs["max_connections"] == REDIS_MAX_CONNECTIONS
+    redis_module.Redis.assert_called_once_with(connection_pool=from_url.return_value)
+
+
+def test_redis_failure_not_retried_during_cooldown(redis_module):
+    """测试：Redis 连接失败后冷却期内直接返回 None，不再重连。"""
+    redis_module.Redis.return_value.ping.side_effect = ConnectionError("refused")
+
+    assert get_redis_client() is None
+    assert get_redis_client() is None
+
+    redis_module.Redis.return_value.ping.assert_called_once()
+
+
+def test_caches_share_one_client():
+    """测试：商品缓存与视觉特征缓存使用同一个客户端。"""
+    assert product_cache_repository.get_redis_client is redis_client.get_redis_client
+    assert vision_feature_cache_repository.get_redis_client is redis_client.get_redis_client
@@ -416,3 +416,49 @@ class TestActionKeywords:
                 break
         assert found, "No message contains scene keywords"
 
+
+
+@pytest.mark.asyncio
+async def test_suggestion_schema_validates_from_attributes(sample_product, behavior_summary_high):
+    """测试：建议包按属性一次校验为 schema，结果与逐字段构造一致。"""
+    from app.schemas.sales_graph_schemas import (
+        FollowupPlaybookItemSchema,
+        MessageItemSchema,
+        SalesSuggestionSchema,
+        SendRecommendationSchema,
+    )
+
+    context = AgentContext(
+        user_id="user_001",
+        sku="TEST001",
+        product=sample_product,
+        intent_level="high",
+        behavior_summary=behavior_summary_high,
+        extra={"intent_reason": "用户已查看尺码表", "allowed": True},
+    )
+    suggestion = await build_suggestion_pack(context)
+
+    expected = SalesSuggestionSchema(
+        intent_level=suggestion.intent_level,
+        confidence=suggestion.confidence,
+        why_now=suggestion.why_now,
+        recommended_action=suggestion.recommended_action,
+        action_explanation=suggestion.action_explanation,
+        message_pack=[
+            MessageItemSchema(type=msg.type, strategy=msg.strategy, message=msg.message)
+            for msg in suggestion.message_pack
+        ],
+        send_recommendation=SendRecommendationSchema(
+            suggested=suggestion.send_recommendation.suggested,
+            best_timing=suggestion.send_recommendation.best_timing,
+            note=suggestion.send_recommendation.note,
+            risk_level=suggestion.send_recommendation.risk_level,
+            next_step=suggestion.send_recommendation.next_step,
+        ),
+        followup_playbook=[
+            FollowupPlaybookItemSchema(condition=item.condition, reply=item.reply)
+            for item in suggestion.followup_playbook
+        ],
+    )
+
+    assert SalesSuggestionSchema.model_validate(suggestion, from_attributes=True) == expected
@@ -63,7 +63,7 @@ class TestSimilarSKUsService:
                 "keywords": ["百搭"],
             }
             
-            skus, fallback_used = await service.search_similar_skus(
+            status, skus, fallback_used = await service.search_similar_skus(
                 db=mock_db,
                 brand_code="BL",
                 vision_features=vision_features,
@@ -115,7 +115,7 @@ class TestSimilarSKUsService:
                 "keywords": [],
             }
             
-            skus, fallback_used = await service.search_similar_skus(
+            status, skus, fallback_used = await service.search_similar_skus(
                 db=mock_db,
                 brand_code="BL",
                 vision_features=vision_features,
@@ -148,7 +148,7 @@ class TestSimilarSKUsService:
                 "keywords": [],
             }
             
-            skus, fallback_used = await service.search_similar_skus(
+            status, skus, fallback_used = await service.search_similar_skus(
                 db=mock_db,
                 brand_code="BL",
                 vision_features=vision_features,
@@ -189,7 +189,7 @@ class TestSimilarSKUsService:
                 "keywords": [],
             }
             
-            skus, _ = await service.search_similar_skus(
+            _, skus, _ = await service.search_similar_skus(
                 db=mock_db,
                 brand_code="BL",
                 vision_features=vision_features,
@@ -201,3 +201,37 @@ class TestSimilarSKUsService:
             # (This is a basic test - actual ranking depends on full scoring logic)
             assert len(skus) > 0, "Should return at least one SKU"
 
+    @pytest.mark.asyncio
+    async def test_identical_request_served_from_result_cache(self, mock_db, mock_products):
+        """测试：相同 vision_features 的重复请求命中结果缓存，品牌版本号递增后失效。"""
+        service = SimilarSKUsService()
+        vision_features = {
+            "category": "运动鞋",
+            "style": ["休闲"],
+            "color": "黑色",
+            "season": "四季",
+            "keywords": [],
+        }
+
+        with patch(
+            "app.services.similar_skus_service.get_candidate_products_by_brand",
+            return_value=mock_products,
+        ) as mock_get_candidates, patch(
+            "app.services.similar_skus_service.product_cache.get_brand_version",
+            return_value=3,
+        ) as mock_get_version:
+            _, first, _ = await service.search_similar_skus(
+                db=mock_db, brand_code="BL", vision_features=vision_features, top_k=5
+            )
+            _, second, _ = await service.search_similar_skus(
+                db=mock_db, brand_code="BL", vision_features=vision_features, top_k=5
+            )
+
+            assert first == second
+            assert mock_get_candidates.call_count == 1, "Repeated request should hit cache"
+
+            mock_get_version.return_value = 4  # 其他进程的向量同步提交后递增
+            await service.search_similar_skus(
+                db=mock_db, brand_code="BL", vision_features=vision_features, top_k=5
+            )
+            assert mock_get_candidates.call_count == 2, "Brand invalidation should bypass cache"
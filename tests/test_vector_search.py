@@ -0,0 +1,162 @@
+"""Tests for vector search helpers and vector store dependency."""
+from __future__ import annotations
+
+import asyncio
+from unittest.mock import patch
+
+import pytest
+
+from app.api.v1 import vector_search
+from app.api.v1.vector_search import (
+    exact_sku_search,
+    extract_keywords_from_query,
+    extract_sku_from_query,
+    keyword_match_score,
+    keyword_match_scores,
+)
+from app.services.vector_store import VectorStore
+
+
+class TestExtractKeywords:
+    """Test cases for extract_keywords_from_query."""
+
+    def test_extracts_each_category_once(self):
+        """测试：各类关键词按关键词表顺序提取且去重。"""
+        keywords = extract_keywords_from_query("白色舒适的运动鞋，黑色白色都可以，舒适最重要")
+
+        assert keywords == {
+            "colors": ["白色", "黑色"],
+            "types": ["运动鞋"],
+            "attributes": ["舒适"],
+        }
+
+    def test_longer_type_wins_on_overlap(self):
+        """测试：重叠时取更长的类型词（马丁靴子 -> 马丁靴，而非靴子）。"""
+        keywords = extract_keywords_from_query("想买一双马丁靴子")
+
+        assert keywords["types"] == ["马丁靴"]
+
+    def test_overlapping_types_follow_keyword_list_priority(self):
+        """测试：重叠的类型词按关键词表优先级取词（短靴子 -> 靴子，而非短靴）。"""
+        assert extract_keywords_from_query("短靴子")["types"] == ["靴子"]
+        assert extract_keywords_from_query("切尔西靴子")["types"] == ["切尔西靴"]
+        # 类型在去掉颜色词后的查询上匹配
+        assert extract_keywords_from_query("短靴棕色子")["types"] == ["靴子"]
+
+    def test_types_ordered_by_keyword_list_not_position(self):
+        """测试：结果按关键词表顺序排列，而非在查询中出现的位置。"""
+        keywords = extract_keywords_from_query("黑色白色靴子和运动鞋")
+
+        assert keywords["colors"] == ["白色", "黑色"]
+        assert keywords["types"] == ["运动鞋", "靴子"]
+
+    def test_cached_result_is_not_shared(self):
+        """测试：缓存命中时返回的列表可安全修改。"""
+        first = extract_keywords_from_query("红色高跟鞋")
+        first["colors"].append("蓝色")
+
+        assert extract_keywords_from_query("红色高跟鞋")["colors"] == ["红色"]
+
+
+class TestKeywordMatchScores:
+    """Test cases for keyword scoring."""
+
+    def test_batch_scores_follow_weights(self):
+        """测试：类型+10/缺失-10，颜色+5/缺失-1，属性+2。"""
+        keywords = {"types": ["运动鞋"], "colors": ["白色"], "attributes": ["舒适", "轻便"]}
+        chunks = [
+            "白色运动鞋，舒适轻便",
+            "黑色运动鞋",
+            "白色高跟鞋，舒适",
+        ]
+
+        scores = keyword_match_scores(chunks, keywords)
+
+        assert scores.tolist() == [19.0, 9.0, -3.0]
+        assert [keyword_match_score(chunk, keywords) for chunk in chunks] == scores.tolist()
+
+    def test_overlapping_keywords_all_counted(self):
+        """测试：重叠关键词（短靴/靴子）在同一chunk中都计入命中。"""
+        keywords = {"types": ["短靴", "靴子"], "colors": ["白色"], "attributes": []}
+
+        scores = keyword_match_scores(["短靴子", "白色靴子"], keywords)
+
+        assert scores.tolist() == [19.0, 15.0]
+
+    def test_keyword_outside_vocabulary_scored_by_scan(self):
+        """测试：关键词不在关键词表时走扫描路径，结果与位图路径一致。"""
+        chunks = ["白色运动鞋，舒适轻便", "黑色运动鞋"]
+        in_vocabulary = {"types": ["运动鞋"], "colors": ["白色"], "attributes": []}
+        out_of_vocabulary = {"types": ["运动鞋"], "colors": ["白色"], "attributes": ["小众词"]}
+
+        assert keyword_match_scores(chunks, in_vocabulary).tolist() == [15.0, 9.0]
+        assert keyword_match_scores(chunks, out_of_vocabulary).tolist() == [15.0, 9.0]
+
+    def test_no_keywords_scores_zero(self):
+        """测试：无关键词时分数为0。"""
+        scores = keyword_match_scores(["任意文本"], {"types": [], "colors": [], "attributes": []})
+
+        assert scores.tolist() == [0.0]
+
+
+class TestSkuHelpers:
+    """Test cases for SKU extraction and exact SKU search."""
+
+    def test_extract_sku_standard_and_keyword_formats(self):
+        """测试：支持标准格式和 "SKU：" 前缀格式。"""
+        assert extract_sku_from_query("搜索商品SKU：8wz76cm6") == "8WZ76CM6"
+        assert extract_sku_from_query("SKU: abc123") == "ABC123"
+        assert extract_sku_from_query("舒适的运动鞋") is None
+        assert extract_sku_from_query("找一下 8wz76cm6 这款") == "8WZ76CM6"
+
+    def test_exact_sku_search_scans_without_sku_index(self, tmp_path):
+        """测试：无 SKU 索引时按原始顺序扫描包含SKU的块，并限制数量。"""
+        store = _make_store(tmp_path, [
+            "商品A SKU：8WZ76CM6，8WZ76CM6",
+            "商品B SKU：8WZ01CM1",
+            "商品编号：8WZ76CM6",
+            "8WZ76CM6 直接包含",
+        ])
+
+        assert exact_sku_search("8WZ76CM6", store, top_k=2) == [
+            ("商品A SKU：8WZ76CM6，8WZ76CM6", 0.0),
+            ("商品编号：8WZ76CM6", 0.0),
+        ]
+        assert exact_sku_search("8WZ76CM6", store, top_k=5)[-1] == ("8WZ76CM6 直接包含", 0.0)
+        assert exact_sku_search("8WZ99CM9", store, top_k=5) == []
+
+    def test_exact_sku_search_uses_sku_index(self, tmp_path):
+        """测试：chunk 带 `[SKU:xxx]` 标识时通过 SKU 索引查表。"""
+        store = _make_store(
+            tmp_path,
+            ["商品A [SKU:8WZ76CM6]", "商品B [SKU:8WZ01CM1]", "商品A续 [SKU:8WZ76CM6]"],
+        )
+        store._build_sku_index()
+
+        assert exact_sku_search("8WZ76CM6", store, top_k=5) == [
+            ("商品A [SKU:8WZ76CM6]", 0.0),
+            ("商品A续 [SKU:8WZ76CM6]", 0.0),
+        ]
+        assert exact_sku_search("8WZ99CM9", store, top_k=5) == []
+
+
+@pytest.mark.asyncio
+async def test_get_vector_store_loads_once_under_concurrency():
+    """测试：冷启动时并发获取向量存储只加载一次索引。"""
+    with patch.object(vector_search, "_vector_store", None), patch.object(
+        VectorStore, "load", return_value=True
+    ) as mock_load:
+        stores = await asyncio.gather(*(vector_search.get_vector_store() for _ in range(5)))
+
+    assert mock_load.call_count == 1
+    assert all(store is stores[0] for store in stores)
+
+
+def _make_store(tmp_path, chunks):
+    store = VectorStore(
+        index_path=str(tmp_path / "faiss.index"),
+        chunk_metadata_path=str(tmp_path / "chunks.pkl"),
+        use_incremental=False,
+    )
+    store.chunks = chunks
+    return store
@@ -0,0 +1,206 @@
+"""Tests for VectorStore index selection, query embedding cache and SKU index."""
+from __future__ import annotations
+
+import pickle
+
+import faiss
+import numpy as np
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app.services.vector_store import (
+    VectorStore,
+    _create_index,
+    _query_embedding_cache,
+)
+
+
+def _random_vectors(n: int, dim: int = 16) -> np.ndarray:
+    vectors = np.random.default_rng(0).random((n, dim), dtype=np.float32)
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def test_small_catalog_uses_flat_index():
+    """测试：小目录使用精确检索。"""
+    index = _create_index(16, _random_vectors(100))
+    assert isinstance(index, faiss.IndexFlatL2)
+
+
+def test_large_catalog_uses_ivf_index_with_nprobe(tmp_path):
+    """测试：超过阈值时构建 IVF 索引，并应用 nprobe，检索结果可命中自身。"""
+    vectors = _random_vectors(2000)
+    with patch("app.services.vector_store.ANN_MIN_VECTORS", 1000):
+        index = _create_index(16, vectors)
+
+    ivf = faiss.try_extract_index_ivf(index)
+    assert ivf is not None
+    assert index.is_trained
+
+    store = VectorStore(
+        index_path=str(tmp_path / "faiss.index"),
+        chunk_metadata_path=str(tmp_path / "chunks.pkl"),
+        nprobe=8,
+    )
+    store._apply_search_params(index)
+    assert ivf.nprobe == 8
+
+    index.add(vectors)
+    _, indices = index.search(vectors[:1], 1)
+    assert indices[0][0] == 0
+
+
+def test_ivf_padding_labels_are_skipped(tmp_path):
+    """测试：探查的聚类内向量不足 top_k 时，FAISS 填充的 -1 不会被当作最后一个 chunk 返回。"""
+    vectors = _random_vectors(2000)
+    with patch("app.services.vector_store.ANN_MIN_VECTORS", 1000):
+        index = _create_index(16, vectors)
+    index.add(vectors)
+    chunks = [f"chunk {i}" for i in range(2000)]
+
+    store = VectorStore(
+        index_path=str(tmp_path / "faiss.index"),
+        chunk_metadata_path=str(tmp_path / "chunks.pkl"),
+        use_incremental=False,
+        nprobe=1,
+    )
+    store._apply_search_params(index)
+    store.index = index
+    store.chunks = chunks
+    results = store.search_by_embedding(vectors[:1], top_k=200)
+
+    assert 0 < len(results) < 200
+    assert len({text for text, _ in results}) == len(results)
+
+    incremental = VectorStore(
+        index_path=str(tmp_path / "faiss.index"),
+        chunk_metadata_path=str(tmp_path / "chunks.pkl"),
+        nprobe=1,
+    )
+    incremental.base_index = index
+    incremental.base_chunks = chunks
+    incremental.base_document_ids = [f"doc{i}" for i in range(2000)]
+    incremental.document_id_to_base_index = {doc_id: i for i, doc_id in enumerate(incremental.base_document_ids)}
+    incremental.delta_index = None
+    incremental_results = incremental._search_incremental(vectors[:1], top_k=200)
+
+    assert 0 < len(incremental_results) < 200
+    assert len({text for text, _ in incremental_results}) == len(incremental_results)
+
+
+def test_repeated_query_reuses_cached_embedding(tmp_path):
+    """测试：相同查询文本只调用一次 embedding API。"""
+    vectors = _random_vectors(10)
+    store = VectorStore(
+        index_path=str(tmp_path / "faiss.index"),
+        chunk_metadata_path=str(tmp_path / "chunks.pkl"),
+        use_incremental=False,
+    )
+    store.index = faiss.IndexFlatL2(16)
+    store.index.add(vectors)
+    store.chunks = [f"chunk {i}" for i in range(10)]
+
+    client = MagicMock()
+    client.model = "test-embedding-model"
+    client.embed_texts = AsyncMock(return_value=[vectors[3].tolist()])
+    _query_embedding_cache.clear()
+
+    with patch("app.services.vector_store.get_embedding_client", return_value=client):
+        first = store.search("舒适的运动鞋", top_k=1)
+        second = store.search("舒适的运动鞋", top_k=1)
+
+    assert first == second
+    assert first[0][0] == "chunk 3"
+    assert client.embed_texts.await_count == 1
+
+
+def test_search_by_embedding_matches_search(tmp_path):
+    """测试：预先计算的查询向量与 search 返回相同结果。"""
+    vectors = _random_vectors(10)
+    store = VectorStore(
+        index_path=str(tmp_path / "faiss.index"),
+        chunk_metadata_path=str(tmp_path / "chunks.pkl"),
+        use_incremental=False,
+    )
+    store.index = faiss.IndexFlatL2(16)
+    store.index.add(vectors)
+    store.chunks = [f"chunk {i}" for i in range(10)]
+
+    client = MagicMock()
+    client.model = "test-embedding-model"
+    client.embed_texts = AsyncMock(return_value=[vectors[5].tolist()])
+    _query_embedding_cache.clear()
+
+    with patch("app.services.vector_store.get_embedding_client", return_value=client):
+        query_vector = store.embed_query("百搭的短靴")
+        assert store.search_by_embedding(query_vector, top_k=2) == store.search("百搭的短靴", top_k=2)
+
+    assert client.embed_texts.await_count == 1
+
+
+def test_build_sku_index_from_chunk_markers(tmp_path):
+    """测试：根据 `[SKU:xxx]` 标识构建 SKU -> chunk 位置索引。"""
+    store = VectorStore(
+        index_path=str(tmp_path / "faiss.index"),
+        chunk_metadata_path=str(tmp_path / "chunks.pkl"),
+        use_incremental=False,
+    )
+    store.chunks = ["红色跑鞋 [SKU:8WZ01CM1]", "无标识文本", "红色跑鞋续 [SKU:8WZ01CM1]", "短靴 [SKU:8WZ02CM2]"]
+
+    store._build_sku_index()
+
+    assert store.sku_to_chunk_ids == {"8WZ01CM1": [0, 2], "8WZ02CM2": [3]}
+
+
+@pytest.mark.asyncio
+async def test_async_search_shares_embedding_cache(tmp_path):
+    """测试：异步检索与同步检索结果一致，且共用查询向量缓存。"""
+    vectors = _random_vectors(10)
+    store = VectorStore(
+        index_path=str(tmp_path / "faiss.index"),
+        chunk_metadata_path=str(tmp_path / "chunks.pkl"),
+        use_incremental=False,
+    )
+    store.index = faiss.IndexFlatL2(16)
+    store.index.add(vectors)
+    store.chunks = [f"chunk {i}" for i in range(10)]
+
+    client = MagicMock()
+    client.model = "test-embedding-model"
+    client.embed_texts = AsyncMock(return_value=[vectors[7].tolist()])
+    _query_embedding_cache.clear()
+
+    with patch("app.services.vector_store.get_embedding_client", return_value=client):
+        query_vector = await store.aembed_query("透气的凉鞋")
+        results = await store.asearch_by_embedding(query_vector, top_k=1)
+        assert store.embed_query("透气的凉鞋") is not None
+
+    assert results[0][0] == "chunk 7"
+    assert client.embed_texts.await_count == 1
+
+
+def test_mmap_loaded_index_survives_save_and_reload(tmp_path):
+    """测试：legacy 索引以 mmap 加载后仍可检索，并可原路径保存后再次加载。"""
+    vectors = _random_vectors(50)
+    index = faiss.IndexFlatL2(16)
+    index.add(vectors)
+    faiss.write_index(index, str(tmp_path / "faiss.index"))
+    with open(tmp_path / "chunks.pkl", "wb") as f:
+        pickle.dump([f"chunk {i}" for i in range(50)], f)
+
+    store = VectorStore(
+        index_path=str(tmp_path / "faiss.index"),
+        chunk_metadata_path=str(tmp_path / "chunks.pkl"),
+        use_incremental=False,
+    )
+    assert store.load()
+    store.save()
+
+    reloaded = VectorStore(
+        index_path=str(tmp_path / "faiss.index"),
+        chunk_metadata_path=str(tmp_path / "chunks.pkl"),
+        use_incremental=False,
+    )
+    assert reloaded.load()
+    for loaded in (store, reloaded):
+        assert loaded.search_by_embedding(vectors[9:10], top_k=1)[0][0] == "chunk 9"
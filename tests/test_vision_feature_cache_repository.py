@@ -0,0 +1,172 @@
+"""Tests for vision feature cache repository."""
+from __future__ import annotations
+
+import re
+import threading
+from unittest.mock import MagicMock, patch
+
+import orjson
+
+from app.repositories import vision_feature_cache_repository
+from app.repositories.vision_feature_cache_repository import VisionFeatureCacheRepository
+
+_FEATURES = {"color": "黑色", "style": "运动", "embedding": [0.1, 0.25]}
+
+
+class FakeRedis:
+    """最小的内存版 Redis（decode_responses=False，值为 bytes）。"""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def setex(self, key, ttl, value):
+        assert isinstance(value, bytes)
+        self.data[key] = value
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    def pipeline(self):
+        return self
+
+    def execute(self):
+        pass
+
+
+def test_generate_trace_id_format():
+    """测试：trace_id 为 vision_ + 16位hex + 秒级时间戳，且不重复。"""
+    trace_ids = {VisionFeatureCacheRepository.generate_trace_id() for _ in range(100)}
+
+    assert len(trace_ids) == 100
+    assert all(re.fullmatch(r"vision_[0-9a-f]{16}_\d{10}", trace_id) for trace_id in trace_ids)
+
+
+def test_redis_round_trip_preserves_features():
+    """测试：特征以 orjson bytes 写入 Redis，读取后内容不变（含中文与浮点数组）。"""
+    client = FakeRedis()
+    db = MagicMock()
+    with patch.object(vision_feature_cache_repository, "get_redis_client", return_value=client), patch.object(
+        vision_feature_cache_repository, "SessionLocal"
+    ):
+        assert VisionFeatureCacheRepository.save(db, "vision_t1", "BL", "guide_chat", _FEATURES)
+        data = VisionFeatureCacheRepository.get(db, "vision_t1")
+        vision_feature_cache_repository.wait_for_pending_writes()
+
+    assert (data["brand_code"], data["scene"], data["vision_features"]) == ("BL", "guide_chat", _FEATURES)
+    db.execute.assert_not_called()
+
+
+def test_mysql_backup_written_behind_redis():
+    """测试：Redis 写入成功后 MySQL 备份由后台会话写入；积压已满时改为同步写入。"""
+    db = MagicMock()
+    with patch.object(vision_feature_cache_repository, "get_redis_client", return_value=FakeRedis()), patch.object(
+        vision_feature_cache_repository, "SessionLocal"
+    ) as session_local:
+        VisionFeatureCacheRepository.save(db, "vision_t3", "BL", "guide_chat", _FEATURES)
+        vision_feature_cache_repository.wait_for_pending_writes()
+
+        background_db = session_local.return_value.__enter__.return_value
+        background_db.execute.assert_called_once()
+        background_db.commit.assert_called_once()
+        db.execute.assert_not_called()
+
+        with patch.object(vision_feature_cache_repository, "MYSQL_WRITE_BEHIND_MAX_PENDING", 0):
+            VisionFeatureCacheRepository.save(db, "vision_t4", "BL", "guide_chat", _FEATURES)
+
+        db.execute.assert_called_once()
+        db.commit.assert_called_once()
+
+
+def test_mysql_fallback_round_trip():
+    """测试：Redis 不可用时写入 MySQL 的 JSON 文本可被读取还原。"""
+    db = MagicMock()
+    with patch.object(vision_feature_cache_repository, "get_redis_client", return_value=None):
+        assert VisionFeatureCacheRepository.save(db, "vision_t2", "BL", "guide_chat", _FEATURES)
+        stored = db.execute.call_args.args[1]["vision_features_json_0"]
+        db.connection.return_value.execute.return_value.fetchone.return_value = (
+            "BL", "guide_chat", stored, None
+        )
+        data = VisionFeatureCacheRepository.get(db, "vision_t2")
+
+    assert isinstance(stored, str)
+    assert db.execute.call_args.args[1]["ttl_hours"] == 24
+    assert "DATE_ADD(NOW(), INTERVAL :ttl_hours HOUR)" in str(db.execute.call_args.args[0])
+    assert data["vision_features"] == _FEATURES
+    db.execute.assert_called_once()  # 读取不经过 Session.execute
+    db.commit.assert_called_once()
+
+
+def test_save_many_writes_mysql_once():
+    """测试：批量保存降级到 MySQL 时发送一条多行 INSERT（一次往返）、只提交一次。"""
+    db = MagicMock()
+    entries = [
+        {"trace_id": f"vision_t{i}", "brand_code": "BL", "scene": "guide_chat", "vision_features": _FEATURES}
+        for i in range(3)
+    ]
+    with patch.object(vision_feature_cache_repository, "get_redis_client", return_value=None):
+        assert VisionFeatureCacheRepository.save_many(db, entries)
+        assert VisionFeatureCacheRepository.save_many(db, [])
+
+    db.execute.assert_called_once()
+    statement, params = db.execute.call_args.args
+    # 单个参数 dict（非参数列表），驱动不会退化为逐行 executemany
+    assert isinstance(params, dict)
+    assert [params[f"trace_id_{i}"] for i in range(3)] == ["vision_t0", "vision_t1", "vision_t2"]
+    assert str(statement).count("DATE_ADD(NOW(), INTERVAL :ttl_hours HOUR))") == 3
+    assert ":trace_id_2" in str(statement)
+    db.commit.assert_called_once()
+
+
+def test_delete_cancels_queued_write_behind():
+    """测试：删除时尚未执行的后台写入被取消，不会在删除之后重新写回记录。"""
+    db = MagicMock()
+    release = threading.Event()
+    blockers = [
+        vision_feature_cache_repository._mysql_writer.submit(release.wait)
+        for _ in range(vision_feature_cache_repository._mysql_writer._max_workers)
+    ]
+    try:
+        with patch.object(vision_feature_cache_repository, "get_redis_client", return_value=FakeRedis()), patch.object(
+            vision_feature_cache_repository, "SessionLocal"
+        ) as session_local:
+            VisionFeatureCacheRepository.save(db, "vision_t5", "BL", "guide_chat", _FEATURES)
+            VisionFeatureCacheRepository.delete(db, "vision_t5")
+            release.set()
+            vision_feature_cache_repository.wait_for_pending_writes()
+
+            session_local.return_value.__enter__.return_value.execute.assert_not_called()
+        db.execute.assert_called_once()  # 仅 DELETE
+    finally:
+        release.set()
+        for blocker in blockers:
+            blocker.result()
+
+
+def test_features_serialized_before_write_behind():
+    """测试：save 返回后修改调用方的特征 dict 不影响后台写入的内容。"""
+    db = MagicMock()
+    features = dict(_FEATURES)
+    release = threading.Event()
+    blockers = [
+        vision_feature_cache_repository._mysql_writer.submit(release.wait)
+        for _ in range(vision_feature_cache_repository._mysql_writer._max_workers)
+    ]
+    try:
+        with patch.object(vision_feature_cache_repository, "get_redis_client", return_value=FakeRedis()), patch.object(
+            vision_feature_cache_repository, "SessionLocal"
+        ) as session_local:
+            VisionFeatureCacheRepository.save(db, "vision_t6", "BL", "guide_chat", features)
+            features["color"] = "白色"
+            release.set()
+            vision_feature_cache_repository.wait_for_pending_writes()
+
+            params = session_local.return_value.__enter__.return_value.execute.call_args.args[1]
+        assert orjson.loads(params["vision_features_json_0"]) == _FEATURES
+    finally:
+        release.set()
+        for blocker in blockers:
+            blocker.result()
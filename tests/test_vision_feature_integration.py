@@ -137,7 +137,7 @@ class TestSimilarSKUsWithTraceId:
             ):
                 service = SimilarSKUsService()
 
-                skus, fallback_used = await service.search_similar_skus(
+                status, skus, fallback_used = await service.search_similar_skus(
                     db=mock_db,
                     brand_code="BL",
                     trace_id="test_trace_id_123",
@@ -149,6 +149,7 @@ class TestSimilarSKUsWithTraceId:
                 assert len(skus) > 0, "Should return at least one SKU"
                 assert len(skus) <= 5, "Should respect top_k limit"
                 assert all(isinstance(sku, str) for sku in skus), "All items should be strings"
+                assert status == "ok"
                 assert not fallback_used, "Rule mode should not use fallback"
 
     @pytest.mark.asyncio
@@ -167,7 +168,7 @@ class TestSimilarSKUsWithTraceId:
         ):
             service = SimilarSKUsService()
 
-            resolved_features, resolved_brand_code = await service._resolve_features(
+            resolved_features, resolved_brand_code, resolution_failed = await service._resolve_features(
                 db=mock_db,
                 trace_id="invalid_trace_id",
                 vision_features=None,
@@ -177,9 +178,10 @@ class TestSimilarSKUsWithTraceId:
             # Assertions
             assert resolved_features is None, "Should return None when trace_id not found"
             assert resolved_brand_code is None, "Should return None for brand_code"
+            assert resolution_failed, "Should flag trace_id resolution failure"
 
-            # Test that search returns empty list when trace_id fails
-            skus, fallback_used = await service.search_similar_skus(
+            # Test that search returns trace_miss with empty list when trace_id fails
+            outcome = await service.search_similar_skus(
                 db=mock_db,
                 brand_code="BL",
                 trace_id="invalid_trace_id",
@@ -187,7 +189,8 @@ class TestSimilarSKUsWithTraceId:
                 mode="rule",
             )
 
-            assert skus == [], "Should return empty list when trace_id not found"
+            assert outcome.status == "trace_miss", "Should report trace_id miss"
+            assert outcome.skus == [], "Should return empty list when trace_id not found"
 
 
 @pytest.fixture